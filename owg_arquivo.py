@@ -0,0 +1,174 @@
+# Formato em disco dos jogadores treinados: knowledge em arrays e hiperparâmetros, num arquivo .npz versionado
+# ou num diretório de arquivos .npy que pode ser mapeado em memória
+
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+
+import owg_players
+from owg_conhecimento import conhecimento_denso
+from owg_tabela import tabela
+
+# Versão do formato; incrementar sempre que o conteúdo do arquivo mudar
+FORMATO = 1
+
+
+def salva_jogador(p, arquivo, comprimido = True):
+    '''
+    Grava o jogador p em arquivo (.npz). Só vão para o arquivo os hiperparâmetros (ver hiperparametros) e,
+    para as posições já visitadas, os arrays de knowledge: o istate de cada posição e uma linha de 9
+    casas por campo (alfa e beta como contagens acima da priori, em inteiros; rec em ponto flutuante).
+    O tabuleiro, a partida em andamento e o gerador de números aleatórios não são gravados.
+
+    @args
+
+    p -- jogador (objeto de uma classe de owg_players)
+    arquivo -- caminho do arquivo
+    comprimido -- se True usa np.savez_compressed
+    '''
+    meta = _meta(p)
+    arrays = {'meta' : np.array(json.dumps(meta))}
+    if meta['priores'] is not None:
+        store = _denso(p)
+        visitado = np.flatnonzero(store.visitado)
+        arrays['istates'] = tabela().decisao_istates[visitado].astype(np.int32)
+        for c, v in store.dados.items():
+            arrays[c] = v[visitado]
+    if comprimido:
+        np.savez_compressed(arquivo, **arrays)
+    else:
+        np.savez(arquivo, **arrays)
+
+
+def carrega_jogador(arquivo, denso = True, seed = None):
+    '''
+    Lê um jogador gravado por salva_jogador. O arquivo é lido sem pickle (allow_pickle = False).
+
+    @args
+
+    arquivo -- caminho do arquivo .npz
+    denso -- se True o knowledge vem num conhecimento_denso; se False, num dicionário comum
+    seed -- semente do gerador de números aleatórios do jogador
+
+    @returns
+
+    o jogador, um objeto da classe gravada
+    '''
+    with np.load(arquivo, allow_pickle = False) as npz:
+        meta = json.loads(str(npz['meta']))
+        p = _cria_jogador(meta, seed)
+        if meta['priores'] is not None:
+            store = conhecimento_denso(meta['priores'], p.chave_inteira)
+            ids = tabela().decisao_ids[npz['istates']]
+            if np.any(ids < 0):
+                raise ValueError("Erro! o arquivo tem posições que não são posições de decisão")
+            for c in store.dados:
+                store.dados[c][ids] = npz[c]
+            store.visitado[ids] = True
+            p.knowledge = store if denso else store.para_dict()
+    return p
+
+
+def _meta(p):
+    return {'formato' : FORMATO, 'classe' : type(p).__name__, 'nome' : getattr(p, 'nome', None),
+            'hiperparametros' : p.hiperparametros(), 'chave_inteira' : bool(p.chave_inteira),
+            'simetria' : bool(p.simetria), 'priores' : p.campos_conhecimento()}
+
+
+def _cria_jogador(meta, seed):
+    '''
+    Cria o jogador descrito por meta (ver _meta), ainda sem conhecimento
+    '''
+    if meta['formato'] != FORMATO:
+        raise ValueError("Erro! formato {} não suportado (esperado {})".format(meta['formato'], FORMATO))
+    classe = getattr(owg_players, meta['classe'], None)
+    if classe is None or not isinstance(classe, type):
+        raise ValueError("Erro! jogador desconhecido: {}".format(meta['classe']))
+    kwargs = dict(meta['hiperparametros'])
+    if meta['nome'] is not None:
+        kwargs['nome'] = meta['nome']
+    p = classe(seed = seed, **kwargs)
+    p.chave_inteira = meta['chave_inteira']
+    p.simetria = meta['simetria']
+    return p
+
+
+def _denso(p):
+    if isinstance(p.knowledge, conhecimento_denso):
+        return p.knowledge
+    return conhecimento_denso.de_dict(p.knowledge, p.campos_conhecimento(), p.chave_inteira)
+
+
+def salva_mapeado(p, diretorio):
+    '''
+    Grava o jogador p no diretório, num formato que pode ser mapeado em memória (ver carrega_mapeado):
+    meta.json com os hiperparâmetros, e um arquivo .npy por campo de knowledge, com a tabela densa inteira
+    (n_decisoes, 9), mais visitado.npy e istates.npy (o istate de cada linha, para conferir a tabela).
+    '''
+    os.makedirs(diretorio, exist_ok = True)
+    meta = _meta(p)
+    if meta['priores'] is not None:
+        store = _denso(p)
+        for c, v in store.dados.items():
+            np.save(os.path.join(diretorio, c + '.npy'), v)
+        np.save(os.path.join(diretorio, 'visitado.npy'), store.visitado)
+        np.save(os.path.join(diretorio, 'istates.npy'), tabela().decisao_istates.astype(np.int32))
+    with open(os.path.join(diretorio, 'meta.json'), 'w') as arq:
+        json.dump(meta, arq)
+
+
+def carrega_mapeado(diretorio, seed = None):
+    '''
+    Abre um jogador gravado por salva_mapeado com knowledge somente para leitura, mapeado em memória
+    (np.load com mmap_mode = 'r'): nada é copiado na abertura, e vários processos que abrem o mesmo
+    diretório compartilham as páginas pelo cache do sistema operacional. O jogador joga normalmente
+    (avalia_posicao, joga), mas não aprende.
+
+    @returns
+
+    o jogador, um objeto da classe gravada
+    '''
+    with open(os.path.join(diretorio, 'meta.json')) as arq:
+        meta = json.load(arq)
+    p = _cria_jogador(meta, seed)
+    if meta['priores'] is not None:
+        abre = lambda nome: np.load(os.path.join(diretorio, nome + '.npy'), mmap_mode = 'r', allow_pickle = False)
+        istates = abre('istates')
+        T = tabela()
+        if len(istates) != T.n_decisoes or np.any(istates != T.decisao_istates):
+            raise ValueError("Erro! {} foi gravado com outra tabela de posições".format(diretorio))
+        dados = {c : abre(c) for c in meta['priores']}
+        p.knowledge = conhecimento_denso.de_arrays(meta['priores'], dados, abre('visitado'), p.chave_inteira,
+                                                   somente_leitura = True)
+    return p
+
+
+def converte_pickle(antigo, novo, comprimido = True):
+    '''
+    Converte um jogador gravado com pickle (por exemplo cientista_1MM.pkl) para o formato .npz. O pickle é
+    lido normalmente, portanto só deve ser usado com arquivos confiáveis.
+
+    @returns
+
+    o jogador lido
+    '''
+    with open(antigo, 'rb') as arq:
+        p = pickle.load(arq)
+    salva_jogador(p, novo, comprimido)
+    return p
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Converte jogadores gravados com pickle para o formato .npz')
+    parser.add_argument('antigo', help = 'arquivo .pkl')
+    parser.add_argument('novo', help = 'arquivo .npz')
+    parser.add_argument('--sem-compressao', action = 'store_true')
+    args = parser.parse_args(argv)
+    converte_pickle(args.antigo, args.novo, not args.sem_compressao)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+# Benchmarks dos tabuleiros, e suíte de micro-benchmarks com linha de base
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import owg_players
+from owg_board import owg, owg_core
+from owg_bitboard import owg_bitboard
+from owg_negamax import perfeito
+from owg_tabela import istate_para_sstate, sstate_para_istate, tabela
+
+
+def _partidas(n, seed = 0):
+    '''
+    Sorteia n sequências de movimentos (permutações das nove casas) para reproduzir nos tabuleiros
+    '''
+    rng = np.random.default_rng(seed)
+    return [[(int(k) // 3, int(k) % 3) for k in rng.permutation(9)] for _ in range(n)]
+
+
+def _tempo(f, repeticoes):
+    '''
+    Executa f repeticoes vezes e retorna o tempo médio por chamada, em nanossegundos
+    '''
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        f()
+    return (time.perf_counter() - t0) / repeticoes * 1e9
+
+
+def bench_tabuleiro(classe, partidas):
+    '''
+    Mede o custo das operações básicas de uma classe de tabuleiro.
+
+    @args
+
+    classe -- classe com a interface de owg_core
+    partidas -- lista de sequências de movimentos, como gerada por _partidas
+
+    @returns
+
+    dicionário operação : ns por operação
+    '''
+    res = dict()
+    res['__init__'] = _tempo(classe, 20000)
+
+    # Joga cada partida até o fim, verificando o resultado após cada movimento (como fazem os jogadores)
+    tab = classe()
+    n_play = 0
+    n_check = 0
+    t_play = 0.
+    t_check = 0.
+    for seq in partidas:
+        tab.reset()
+        for movimento in seq:
+            t0 = time.perf_counter()
+            tab.play(None, movimento)
+            t1 = time.perf_counter()
+            r, _ = tab.check_result()
+            t2 = time.perf_counter()
+            t_play += t1 - t0
+            t_check += t2 - t1
+            n_play += 1
+            n_check += 1
+            if r is not None:
+                break
+    res['play'] = t_play / n_play * 1e9
+    res['check_result'] = t_check / n_check * 1e9
+    res['reset'] = _tempo(tab.reset, 20000)
+    return res
+
+
+def bench_tabuleiros(n_partidas = 2000, seed = 0):
+    '''
+    Compara owg_core e owg_bitboard nas mesmas partidas e imprime uma tabela com ns/op e o ganho relativo
+    '''
+    partidas = _partidas(n_partidas, seed)
+    # Carrega a tabela de posições antes de medir
+    tabela()
+    base = bench_tabuleiro(owg_core, partidas)
+    bit = bench_tabuleiro(owg_bitboard, partidas)
+
+    print("{:<14} {:>12} {:>14} {:>8}".format("operação", "owg_core", "owg_bitboard", "ganho"))
+    for op in base:
+        print("{:<14} {:>9.0f} ns {:>11.0f} ns {:>7.1f}x".format(op, base[op], bit[op], base[op] / bit[op]))
+    return base, bit
+
+
+
+##############################################################################################
+#    Suíte de micro-benchmarks: as operações que um treino executa milhões de vezes           #
+##############################################################################################
+
+# Jogadores medidos em joga: (nome, classe, parâmetros). cientista_mcts com menos simulações que o padrão,
+# para que a suíte rode em segundos
+JOGADORES = [(nome, getattr(owg_players, nome), dict()) for nome in
+             ['jb', 'miope', 'epsilon_edson', 'cientista_sovina', 'cientista', 'cientista_cauteloso',
+              'cientista_conciliador', 'cientista_esperto', 'cientista_previdente']]
+JOGADORES += [('cientista_mcts', owg_players.cientista_mcts, {'simulacoes' : 64}), ('perfeito', perfeito, dict())]
+
+TABULEIROS = {'owg_core' : owg_core, 'owg_bitboard' : owg_bitboard, 'owg' : owg}
+
+# Linha de base versionada junto com o código (gravada com --salva-base); a suíte compara com ela por padrão
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_base.json')
+
+
+def _laco(g, n):
+    # Operação que se mede chamando g n vezes
+    def f():
+        t0 = time.perf_counter()
+        for _ in range(n):
+            g()
+        return time.perf_counter() - t0, n
+    return f
+
+
+def _posicoes(n, seed = 0):
+    # n tabuleiros em posições de decisão sorteadas (owg_tabela)
+    T = tabela()
+    rng = np.random.default_rng(seed)
+    return T.decisao_istates[rng.integers(T.n_decisoes, size = n)].tolist()
+
+
+def _bench_tabuleiro(classe, n = 1000, seed = 0):
+    '''
+    Operações do tabuleiro classe: cada item é nome : f, onde f() executa um lote da operação e retorna
+    (segundos medidos, número de operações)
+    '''
+    istates = _posicoes(n, seed)
+    tabs = [classe() for _ in range(n)]
+    for tab, istate in zip(tabs, istates):
+        for k in range(9):
+            if istate // 3 ** (8 - k) % 3 != 2:
+                tab.play(None, (k // 3, k % 3))
+    partidas = _partidas(n // 9 + 1, seed)
+
+    def play():
+        tab = classe()
+        t = 0.
+        for seq in partidas:
+            tab.reset()
+            t0 = time.perf_counter()
+            for movimento in seq:
+                tab.play(None, movimento)
+            t += time.perf_counter() - t0
+        return t, 9 * len(partidas)
+
+    verifica = [tab.check_result for tab in tabs]
+    reseta = [tab.reset for tab in tabs]
+
+    def check_result():
+        t0 = time.perf_counter()
+        for m in verifica:
+            m()
+        return time.perf_counter() - t0, n
+
+    def sstate():
+        t0 = time.perf_counter()
+        for tab in tabs:
+            tab.sstate
+        return time.perf_counter() - t0, len(tabs)
+
+    def reset():
+        t0 = time.perf_counter()
+        for m in reseta:
+            m()
+        return time.perf_counter() - t0, n
+
+    return {'__init__' : _laco(classe, n), 'play' : play, 'check_result' : check_result, 'sstate' : sstate,
+            'reset' : reset}
+
+
+def _bench_conversao(n = 1000, seed = 0):
+    # Conversões entre as codificações da posição (inteiro istate e string sstate)
+    istates = _posicoes(n, seed)
+    sstates = [istate_para_sstate(i) for i in istates]
+
+    def para_sstate():
+        t0 = time.perf_counter()
+        for i in istates:
+            istate_para_sstate(i)
+        return time.perf_counter() - t0, n
+
+    def para_istate():
+        t0 = time.perf_counter()
+        for s in sstates:
+            sstate_para_istate(s)
+        return time.perf_counter() - t0, n
+
+    return {'istate_para_sstate' : para_sstate, 'sstate_para_istate' : para_istate}
+
+
+def _bench_joga(classe, parametros, partidas = 20, aquecimento = 200, seed = 0):
+    '''
+    joga do jogador: partidas completas entre dois jogadores da classe, como em owg_treino.partida
+    (alternando quem começa); mede só as chamadas a joga, inclusive a última de cada partida, em que o
+    jogador aprende.
+
+    Os jogadores são treinados antes com aquecimento partidas e guardados (pickle); f.prepara os restaura
+    antes de cada lote, de modo que todo lote joga as mesmas partidas a partir do mesmo knowledge (e do
+    mesmo estado dos geradores): o tempo e a memória medidos não dependem de quantos lotes já rodaram.
+    '''
+    jogadores = [classe(seed = seed, **parametros), classe(seed = seed + 1, **parametros)]
+
+    def joga(n_partidas):
+        p1, p2 = jogadores
+        t = 0.
+        n = 0
+        for k in range(n_partidas):
+            vez, outro = (p1, p2) if k % 2 == 0 else (p2, p1)
+            while True:
+                t0 = time.perf_counter()
+                movimento = vez.joga()
+                t += time.perf_counter() - t0
+                n += 1
+                if movimento is None:
+                    break
+                outro.comunica(movimento)
+                vez, outro = outro, vez
+            p1.reset()
+            p2.reset()
+        return t, n
+
+    joga(aquecimento)
+    estado = pickle.dumps(jogadores, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def f():
+        return joga(partidas)
+
+    def prepara():
+        jogadores[:] = pickle.loads(estado)
+
+    f.prepara = prepara
+    return f
+
+
+def _bench_calibracao(n = 1000):
+    # Referência dos tempos da suíte (ver mede): laço em Python puro, que não depende do código do jogo
+    dados = list(range(n))
+
+    def f():
+        t0 = time.perf_counter()
+        s = 0
+        for x in dados:
+            s += x * x % 7
+        return time.perf_counter() - t0, n
+    return f
+
+
+def operacoes(tabuleiros = None, jogadores = None):
+    '''
+    Dicionário nome : f de todas as operações da suíte (ver _bench_tabuleiro). Os nomes são
+    'tabuleiro.operacao', 'conversao.funcao' e 'joga.jogador'
+    '''
+    tabuleiros = list(TABULEIROS) if tabuleiros is None else tabuleiros
+    ops = dict()
+    for nome in tabuleiros:
+        for op, f in _bench_tabuleiro(TABULEIROS[nome]).items():
+            ops[nome + '.' + op] = f
+    for op, f in _bench_conversao().items():
+        ops['conversao.' + op] = f
+    for nome, classe, parametros in JOGADORES:
+        if jogadores is None or nome in jogadores:
+            ops['joga.' + nome] = _bench_joga(classe, parametros)
+    return ops
+
+
+def _rodada(f, prepara, tempo_min):
+    # ns por operação num lote de f de pelo menos tempo_min segundos
+    t = 0.
+    n = 0
+    while t < tempo_min:
+        prepara()
+        dt, dn = f()
+        t += dt
+        n += dn
+    return t / n * 1e9
+
+
+def mede(f, tempo_min = .2, rodadas = 5, referencia = None):
+    '''
+    Mede a operação f (ver _bench_tabuleiro). Se f tem o atributo prepara, ele é chamado antes de cada
+    lote, fora da medida (ver _bench_joga).
+
+    O tempo é o melhor de rodadas rodadas, cada uma com lotes de f até somar tempo_min segundos. Se
+    referencia (uma operação como f) é dada, cada rodada mede também um lote dela, e ns_referencia é o
+    melhor desses tempos: como é medido junto com f, ele acompanha as variações de velocidade da máquina
+    durante a medida de f (ver compara). A memória é medida em bytes, não em número de alocações (o CPython
+    não as conta), num lote à parte, com tracemalloc ligado e depois de um lote de aquecimento também com
+    ele ligado, para que os objetos substituídos pelo lote sejam contados ao serem liberados: bytes_pico é o
+    máximo de memória alocada acima do início do lote, e bytes_retidos é a memória que continua alocada ao
+    final, por operação (cresce com vazamentos e caches).
+
+    @returns
+
+    dicionário com ns (por operação), ns_referencia (se há referencia), bytes_pico e bytes_retidos (por
+    operação)
+    '''
+    prepara = getattr(f, 'prepara', lambda: None)
+    prepara()
+    f()
+    res = dict()
+    for _ in range(rodadas):
+        ns = _rodada(f, prepara, tempo_min)
+        res['ns'] = min(res.get('ns', ns), ns)
+        if referencia is not None:
+            ns = _rodada(referencia, lambda: None, tempo_min / 4)
+            res['ns_referencia'] = min(res.get('ns_referencia', ns), ns)
+
+    tracemalloc.start()
+    try:
+        prepara()
+        f()
+        prepara()
+        # O coletor de ciclos fica desligado durante o lote medido, para que o momento em que ele roda (que
+        # varia de uma execução para outra) não mude o pico; os ciclos são recolhidos antes e depois dele
+        gc.collect()
+        gc.disable()
+        inicio, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            _, n = f()
+        finally:
+            gc.enable()
+        _, pico = tracemalloc.get_traced_memory()
+        gc.collect()
+        atual, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    res['bytes_pico'] = pico - inicio
+    res['bytes_retidos'] = (atual - inicio) / n
+    return res
+
+
+def suite(tabuleiros = None, jogadores = None, tempo_min = .2, verbose = True, base = None, tolerancia = .25,
+          confirmacoes = 2):
+    '''
+    Roda a suíte de micro-benchmarks
+
+    @args
+
+    base -- linha de base (resultado de suite) ou None; se dada, o tempo de uma operação que passa do da
+            base (ver compara) é medido de novo até confirmacoes vezes, ficando a medida mais rápida em
+            relação à referência: uma regressão só é apontada se persiste, e não por uma variação de carga
+            da máquina durante uma das medidas
+
+    @returns
+
+    dicionário com o ambiente (versões do Python e do NumPy, sistema e máquina) e os resultados de cada
+    operação (ver mede)
+    '''
+    tabela()
+    referencia = _bench_calibracao()
+    resultados = dict()
+    if verbose:
+        print("{:<34} {:>15} {:>12} {:>12}".format("operação", "tempo", "bytes pico", "retidos/op"))
+    for nome, f in operacoes(tabuleiros, jogadores).items():
+        r = mede(f, tempo_min, referencia = referencia)
+        for _ in range(confirmacoes if base is not None else 0):
+            if all(medida != 'ns' for _, medida, _, _ in compara({'resultados' : {nome : r}}, base, tolerancia)):
+                break
+            novo = mede(f, tempo_min, referencia = referencia)
+            if novo['ns'] / novo['ns_referencia'] < r['ns'] / r['ns_referencia']:
+                r['ns'], r['ns_referencia'] = novo['ns'], novo['ns_referencia']
+        resultados[nome] = r
+        if verbose:
+            print("{:<34} {:>12.0f} ns {:>10} B {:>10.1f} B".format(nome, r['ns'], r['bytes_pico'],
+                                                                   r['bytes_retidos']), flush = True)
+    return {'ambiente' : {'python' : platform.python_version(), 'numpy' : np.__version__,
+                          'plataforma' : platform.platform(), 'maquina' : platform.node(),
+                          'processador' : platform.processor() or platform.machine()},
+            'resultados' : resultados}
+
+
+def compara(atual, base, tolerancia = .25, folga_memoria = 256):
+    '''
+    Compara os resultados de duas execuções da suíte (atual e a linha de base). Há regressão quando o tempo
+    passa da base em mais de tolerancia (fração), ou a memória (bytes_pico ou bytes_retidos) em mais de
+    tolerancia e de folga_memoria bytes. As operações e medidas que a base não tem são ignoradas.
+
+    Se as duas execuções mediram a referência (ns_referencia, ver mede), o tempo da base de cada operação é
+    antes multiplicado pela razão entre os tempos da referência medidos com ela na execução atual e na
+    base: o que se compara é o tempo de cada operação em relação ao de um laço de Python puro, de modo que a
+    comparação vale entre máquinas de velocidades diferentes, e com a máquina mais ou menos carregada. A
+    memória não depende da máquina (para as mesmas versões do Python e do NumPy).
+
+    @returns
+
+    lista de (operação, medida, base, atual) das regressões (no tempo, a base já multiplicada pela razão)
+    '''
+    regressoes = []
+    for nome, r in atual['resultados'].items():
+        b = base['resultados'].get(nome)
+        if b is None:
+            continue
+        escala = 1.
+        if 'ns_referencia' in r and 'ns_referencia' in b:
+            escala = r['ns_referencia'] / b['ns_referencia']
+        if r['ns'] > b['ns'] * escala * (1 + tolerancia):
+            regressoes.append((nome, 'ns', b['ns'] * escala, r['ns']))
+        for medida in ('bytes_pico', 'bytes_retidos'):
+            if medida in b and r[medida] > b[medida] * (1 + tolerancia) + folga_memoria:
+                regressoes.append((nome, medida, b[medida], r[medida]))
+    return regressoes
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks do jogo da velha')
+    parser.add_argument('--suite', action = 'store_true',
+                        help = 'roda a suíte de micro-benchmarks (sem esta opção, compara os tabuleiros)')
+    parser.add_argument('--tabuleiros', nargs = '+', choices = list(TABULEIROS))
+    parser.add_argument('--jogadores', nargs = '+', choices = [nome for nome, _, _ in JOGADORES])
+    parser.add_argument('--tempo', type = float, default = .2, help = 'segundos de medida por rodada')
+    parser.add_argument('--salva-base', help = 'grava os resultados como linha de base (JSON)')
+    parser.add_argument('--base', default = BASE,
+                        help = 'linha de base com que comparar os resultados (padrão: bench_base.json, versionada)')
+    parser.add_argument('--sem-base', action = 'store_true', help = 'não compara com nenhuma linha de base')
+    parser.add_argument('--tolerancia', type = float, default = .25,
+                        help = 'fração acima da base a partir da qual há regressão')
+    args = parser.parse_args(argv)
+
+    if not args.suite:
+        bench_tabuleiros()
+        return 0
+    # A base é lida antes de rodar a suíte, porque --salva-base pode sobrescrever o mesmo arquivo
+    base = None
+    if not args.sem_base:
+        if os.path.exists(args.base):
+            with open(args.base) as arq:
+                base = json.load(arq)
+        else:
+            print("Linha de base {} não encontrada: nada a comparar".format(args.base))
+    res = suite(args.tabuleiros, args.jogadores, args.tempo, base = base, tolerancia = args.tolerancia)
+    if args.salva_base:
+        with open(args.salva_base, 'w') as arq:
+            json.dump(res, arq, indent = 1)
+    if base is None:
+        return 0
+    if base.get('ambiente', dict()).get('maquina') != res['ambiente']['maquina']:
+        print("Linha de base gravada em outra máquina: os tempos são comparados em relação aos da referência")
+    regressoes = compara(res, base, args.tolerancia)
+    for nome, medida, b, r in regressoes:
+        print("REGRESSÃO {:<34} {:<13} base {:>12.1f} atual {:>12.1f} ({:+.0%})".format(
+            nome, medida, b, r, r / b - 1 if b else float('inf')))
+    if regressoes:
+        return 1
+    print("Sem regressões em relação a", args.base)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
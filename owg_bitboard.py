@@ -0,0 +1,142 @@
+# Tabuleiro em bitboard
+
+import numpy as np
+
+from owg_tabela import POT, VAZIO, VITORIAS, istate_para_sstate
+
+# Cada casa k = 3*linha + coluna corresponde ao bit 1 << k
+_CHEIO = 0b111111111
+
+
+def _primeira_vitoria(jogador):
+    '''
+    Para cada uma das 512 máscaras possíveis de um jogador, calcula a posição (na ordem de VITORIAS) da
+    primeira linha completa, ou None se não houver nenhuma
+    '''
+    tabela = [None] * 512
+    for m in range(512):
+        for ordem, (linha, jog, _, _) in enumerate(VITORIAS):
+            if jog == jogador and (m & linha) == linha:
+                tabela[m] = ordem
+                break
+    return tabela
+
+_PRIMEIRA = (_primeira_vitoria(0), _primeira_vitoria(1))
+
+
+class owg_bitboard:
+    '''
+    Classe owg_bitboard: mesmas regras e mesma interface de owg_core, mas guarda a posição como duas
+    máscaras de 9 bits (uma por jogador). O resultado do jogo sai de testes de máscara contra as 8 linhas
+    vencedoras, pré-calculados para as 512 máscaras possíveis.
+
+    Desde a tabela de posições (owg_tabela), o owg_core consulta o resultado diretamente pelo istate e é o
+    caminho rápido: a check_result daqui é mais lenta que a dele; o bitboard só é mais barato de construir,
+    reiniciar e jogar (ver owg_bench). Fica como alternativa com a mesma interface.
+    '''
+    def __init__(self):
+        self.masks = [0, 0]
+        self.cur = None
+        self.istate = VAZIO
+        self.starter = 0
+
+    def reset(self):
+        '''
+        Reseta o tabuleiro, para começar novo jogo
+        '''
+        self.masks = [0, 0]
+        self.istate = VAZIO
+        self.starter = 1 - self.starter
+        self.cur = None
+
+    @property
+    def state(self):
+        '''
+        Posição no formato de owg_core: matriz 3x3 com 0, 1 ou NaN (casa vazia)
+        '''
+        state = np.empty(shape = (3, 3))
+        state[:] = np.nan
+        for jogador in (0, 1):
+            m = self.masks[jogador]
+            for k in range(9):
+                if m >> k & 1:
+                    state[k // 3, k % 3] = jogador
+        return state
+
+    @property
+    def sstate(self):
+        '''
+        String de nove dígitos que representa a posição ('0', '1' ou '2' para casa vazia)
+        '''
+        return istate_para_sstate(self.istate)
+
+    def play(self, jogador, movimento):
+        '''
+        Jogador faz o movimento. Mesmo contrato de owg_core.play
+
+        @args
+
+        jogador -- 0, 1 ou None. Se None, o tabuleiro realiza a jogada para o próximo jogador.
+        movimento -- uma tupla (linha, coluna), linha \in [0,1,2] e coluna \in [0,1,2]
+
+        @returns
+
+        Retorna True se bem-sucedida
+
+        '''
+        i = movimento[0]
+        j = movimento[1]
+        k = 3*i + j
+        bit = 1 << k
+
+        if (self.masks[0] | self.masks[1]) & bit:
+            print("Erro! movimento ({},{}) não permitido".format(i,j))
+            return False
+
+        if jogador is None:
+            if self.cur is None:
+                self.cur = 0
+            jogador = self.cur
+
+        if jogador not in [0,1]:
+            raise ValueError("Erro! jogador deve ser 0 ou 1")
+
+        if self.cur is None:
+            self.cur = jogador
+        else:
+            if self.cur != jogador:
+                raise ValueError("Erro! Não é a vez do jogador {}".format(jogador))
+
+        self.masks[jogador] |= bit
+        self.istate += (jogador - 2) * POT[k]
+        self.cur = 1 - self.cur
+        return True
+
+    def check_result(self):
+        '''
+        Verifica se o jogo acabou. Mesmo contrato de owg_core.check_result
+
+        @returns
+
+        resultado, motivo -- resultado é None se o jogo não acabou ainda; 1 se o jogador 1 ganhou;
+                                -1 se o jogador 0 ganhou; 0 se foi empate.
+                             motivo é None se o jogo não acabou ainda, ou se foi empate. Caso contrário, dá
+                             as coordenadas da linha, coluna ou diagonal que causou o fim do jogo
+
+        '''
+        m0, m1 = self.masks
+        v0 = _PRIMEIRA[0][m0]
+        v1 = _PRIMEIRA[1][m1]
+        if v0 is not None or v1 is not None:
+            if v0 is None or (v1 is not None and v1 < v0):
+                _, _, r, motivo = VITORIAS[v1]
+            else:
+                _, _, r, motivo = VITORIAS[v0]
+            return r, motivo
+
+        if (m0 | m1) != _CHEIO:
+            # ainda não acabou
+            return None, None
+        else:
+            # empatou
+            return 0, None
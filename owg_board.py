@@ -1,41 +1,23 @@
 # Tabuleiro e interface gráfica
 
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 import numpy as np
 
-class owg:
+from owg_tabela import POT, VAZIO, istate_para_sstate, tabela
+
+
+class owg_core:
     '''
-    Classe owg: define o tabuleiro e as regras do jogo, aceita movimentos e mantém a posição atual do jogo
-    na memória.
+    Classe owg_core: define o tabuleiro e as regras do jogo, aceita movimentos e mantém a posição atual do jogo
+    na memória. Não desenha nada: é o tabuleiro usado pelos jogadores e pelos laços de treinamento, e por isso
+    deve ser barato de construir.
     
     '''
     def __init__(self):
         self.state = np.empty(shape = (3, 3))
         self.cur = None
         self.state[:] = np.nan
-        self.__convert_state()
+        self.istate = VAZIO
         self.starter = 0
-        self.a = None
-        
-        # Gera conjunto de pontos para as figuras
-                
-        # Número de pontos para desenhar o X
-        N = 2000
-        
-        # Número de pontos para desenharo O
-        Nbola = 10000
-        
-        # X
-        self.xx = np.random.normal(loc = 0, scale = 0.05, size = N)
-        self.yx1 = 2*self.xx + np.random.normal(scale = 0.1/3, size = N) 
-        self.yx2 = -2*self.xx + np.random.normal(scale = 0.1/3, size = N) 
-
-        # Bola
-        self.xb = np.random.normal(loc = 0, scale = 0.05, size = Nbola)
-        self.yb = np.random.normal(scale = 0.1, size = Nbola)         
-        self.s = np.random.normal(loc = 2, scale = 0.1, size = Nbola)
-        self.eps = np.random.normal(scale = 0.008/5)
 
     def reset(self):
         '''
@@ -43,7 +25,7 @@ class owg:
         '''
         self.state = np.empty(shape = (3, 3))
         self.state[:] = np.nan
-        self.__convert_state()
+        self.istate = VAZIO
         self.starter = 1 - self.starter
         self.cur = None
         
@@ -93,13 +75,15 @@ class owg:
                 raise ValueError("Erro! Não é a vez do jogador {}".format(jogador))
         
         self.state[i,j] = jogador
-        self.__convert_state()
+        # Atualiza a codificação: a casa passa de vazia (2) para o dígito do jogador
+        self.istate += (jogador - 2) * POT[3*i + j]
         self.cur = 1 - self.cur
         return True
         
     def check_result(self):
         '''
-        Método para verificar se o jogo acabou, usando a soma das colunas / linhas.        
+        Método para verificar se o jogo acabou. O resultado de cada posição vem pronto da tabela de posições
+        (owg_tabela), indexada pelo istate.
         
         @returns
         
@@ -109,62 +93,93 @@ class owg:
                              as coordenadas da linha, coluna ou diagonal que causou o fim do jogo
                                 
         ''' 
-        colsum = self.state.sum(axis = 1)
-        if np.any(colsum == 3):
-            # 1 ganhou
-            i = int(np.where(colsum == 3)[0])
-            return 1, (3,i)
-        elif np.any(colsum == 0):
-            # 0 ganhou
-            i = int(np.where(colsum == 0)[0])
-            return -1, (3,i)
-        rowsum = self.state.sum(axis= 0)
-        if np.any(rowsum == 3):
-            # 1 ganhou
-            i = int(np.where(rowsum == 3)[0])
-            return 1, (i,3)
-        elif np.any(rowsum == 0):
-            # 0 ganhou
-            i = int(np.where(rowsum == 0)[0])
-            return -1, (i,3)
-        # Diagonal
-        diag = self.state[0,0] + self.state[1,1] + self.state[2,2]
-        if diag == 0:
-            return -1, (-3,-3)
-        elif diag == 3:
-            return 1, (-3,-3)
-        
-        # Segunda diagonal
-        diag = self.state[0,2] + self.state[1,1] + self.state[2,0]
-        if diag == 0:
-            return -1, (3,3)
-        elif diag == 3:
-            return 1, (3, 3)
-        
-        
-        if np.any(np.isnan(self.state)):
-            # ainda não acabou
-            return None, None
-        else:
-            # empatou
-            return 0, None
+        return tabela().resultado[self.istate]
         
-    def __convert_state(self):
+    @property
+    def sstate(self):
         '''
-        Interna, para converter o estado do tabuleiro num inteiro em base 3
-        0 = O, 1 = X, None = empty position
+        String de nove dígitos que representa a posição, derivada de istate. Usada para exibição e
+        como chave de knowledge nos jogadores que não usam chaves inteiras
         '''
+        return istate_para_sstate(self.istate)
 
-        istate = 0
-        tmpstate = self.state.copy()
-        tmpstate[np.isnan(tmpstate)] = 2
-        tmpstate = tmpstate.flatten().astype(int)
 
-        sstate = np.array2string(tmpstate, separator = "", prefix= "")[1:-1]
-            
-        self.istate = int(sstate, 3)
-        self.sstate = sstate
+class owg_renderer:
+    '''
+    Classe owg_renderer: gera os conjuntos de pontos usados para desenhar o X e a O na interface gráfica.
+    
+    '''
+    def __init__(self):
+        # Número de pontos para desenhar o X
+        N = 2000
+        
+        # Número de pontos para desenharo O
+        Nbola = 10000
+        
+        # X
+        self.xx = np.random.normal(loc = 0, scale = 0.05, size = N)
+        self.yx1 = 2*self.xx + np.random.normal(scale = 0.1/3, size = N) 
+        self.yx2 = -2*self.xx + np.random.normal(scale = 0.1/3, size = N) 
+
+        # Bola
+        self.xb = np.random.normal(loc = 0, scale = 0.05, size = Nbola)
+        self.yb = np.random.normal(scale = 0.1, size = Nbola)         
+        self.s = np.random.normal(loc = 2, scale = 0.1, size = Nbola)
+        self.eps = np.random.normal(scale = 0.008/5)
+
+
+class owg(owg_core):
+    '''
+    Classe owg: tabuleiro com interface gráfica (pyplot). As regras vêm de owg_core; os pontos das figuras
+    só são gerados na primeira vez que o tabuleiro é desenhado.
+    
+    '''
+    def __init__(self):
+        owg_core.__init__(self)
+        self.a = None
+        self.renderer = None
+        self.lances = []
+
+    def __setstate__(self, estado):
+        # Tabuleiros gravados antes do registro de partidas (por exemplo nos .pkl pré-treinados) ganham a lista
+        self.__dict__.update(estado)
+        self.__dict__.setdefault('lances', [])
+
+    def reset(self):
+        owg_core.reset(self)
+        self.lances = []
+
+    def play(self, jogador, movimento):
+        '''
+        Como owg_core.play, e guarda a casa jogada em self.lances (para o registro de partidas)
+        '''
+        res = owg_core.play(self, jogador, movimento)
+        if res:
+            self.lances.append(3 * movimento[0] + movimento[1])
+        return res
 
+    def __registra(self, registro):
+        '''
+        Grava a partida que acabou de terminar em start no registro de partidas, do ponto de vista do
+        computador (o p1 do registro)
+        '''
+        if registro is None:
+            return
+        r, _ = self.check_result()
+        n = len(self.lances)
+        if r != 0:
+            # Quem fez o último lance venceu; o computador começa quando starter é 0
+            r = 1 if ((n - 1) % 2 == 0) == (self.starter == 0) else -1
+        registro.registra(self.lances, 0 if self.starter == 0 else 1, r)
+        registro.descarrega()
+
+    def __renderer(self):
+        '''
+        Retorna o owg_renderer do tabuleiro, criando-o na primeira chamada
+        '''
+        if getattr(self, 'renderer', None) is None:
+            self.renderer = owg_renderer()
+        return self.renderer
    
     def start_free(self, p1 = None):
         '''
@@ -173,6 +188,8 @@ class owg:
         para qualquer posição
         
         '''
+        import matplotlib.pyplot as plt
+        g = self.__renderer()
 
         # Reseta o tabuleiro atual
         self.reset()
@@ -242,19 +259,19 @@ class owg:
                                 yc = 0.5 + j 
                                 if self.cur:
                                     # Jogador anterior é o X
-                                    x = self.xx + xc
-                                    y = self.yx1 + yc
-                                    y2 = self.yx2 + yc                    
-                                    plt.scatter(x, y, s =  self.s, c = 'blue')
-                                    plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                                    x = g.xx + xc
+                                    y = g.yx1 + yc
+                                    y2 = g.yx2 + yc                    
+                                    plt.scatter(x, y, s =  g.s, c = 'blue')
+                                    plt.scatter(x, y2, s =  g.s, c = 'blue')    
                                 else:
                                     # Jogador anterior é o O
-                                    x = self.xb + xc
-                                    y = self.yb + yc
-                                    z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                                    x = g.xb + xc
+                                    y = g.yb + yc
+                                    z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                                     x = [zz[0] for zz in z]
                                     y = [zz[1] for zz in z]
-                                    plt.scatter(x, y, s =  self.s, c = 'orange')
+                                    plt.scatter(x, y, s =  g.s, c = 'orange')
 
 
                             # Verifica se o jogo acabou após esse movimento
@@ -330,15 +347,18 @@ class owg:
         plt.show()        
         
         
-    def start(self, p1):
+    def start(self, p1, registro = None):
         '''
         Tabuleiro para humano x computador (p1)
         
         @args
         
         p1 -- um objeto da classe owg_player
+        registro -- objeto owg_registro.gravador onde gravar cada partida (o computador é o p1 do registro)
         '''
-        
+        import matplotlib.pyplot as plt
+        g = self.__renderer()
+
         p1.reset()
 
         
@@ -378,18 +398,18 @@ class owg:
                                 xc = i/2 + .235
                                 yc = 0.5 + j 
                                 if self.cur:
-                                    x = self.xx + xc
-                                    y = self.yx1 + yc
-                                    y2 = self.yx2 + yc                    
-                                    plt.scatter(x, y, s =  self.s, c = 'blue')
-                                    plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                                    x = g.xx + xc
+                                    y = g.yx1 + yc
+                                    y2 = g.yx2 + yc                    
+                                    plt.scatter(x, y, s =  g.s, c = 'blue')
+                                    plt.scatter(x, y2, s =  g.s, c = 'blue')    
                                 else:
-                                    x = self.xb + xc
-                                    y = self.yb + yc
-                                    z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps]
+                                    x = g.xb + xc
+                                    y = g.yb + yc
+                                    z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps]
                                     x = [zz[0] for zz in z]
                                     y = [zz[1] for zz in z]
-                                    plt.scatter(x, y, s =  self.s, c = 'orange')                
+                                    plt.scatter(x, y, s =  g.s, c = 'orange')                
                 else:
                     # Jogo não acabou
                     # Processa as coordenadas do clique, se for movimento válido realiza o movimento
@@ -420,18 +440,18 @@ class owg:
                             xc = i/2 + .235
                             yc = 0.5 + j 
                             if self.cur:
-                                x = self.xx + xc
-                                y = self.yx1 + yc
-                                y2 = self.yx2 + yc                    
-                                plt.scatter(x, y, s =  self.s, c = 'blue')
-                                plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                                x = g.xx + xc
+                                y = g.yx1 + yc
+                                y2 = g.yx2 + yc                    
+                                plt.scatter(x, y, s =  g.s, c = 'blue')
+                                plt.scatter(x, y2, s =  g.s, c = 'blue')    
                             else:
-                                x = self.xb + xc
-                                y = self.yb + yc
-                                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                                x = g.xb + xc
+                                y = g.yb + yc
+                                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                                 x = [zz[0] for zz in z]
                                 y = [zz[1] for zz in z]
-                                plt.scatter(x, y, s =  self.s, c = 'orange')
+                                plt.scatter(x, y, s =  g.s, c = 'orange')
 
 
                         # Verifica o resultado após o movimento
@@ -439,6 +459,7 @@ class owg:
 
                         if r is not None:
                             # Acabou
+                            self.__registra(registro)
                             if r == 0:
                                 print("Empate")
                             elif r == 1:
@@ -507,24 +528,25 @@ class owg:
                             xc = i/2 + .235
                             yc = 0.5 + j 
                             if self.cur:
-                                x = self.xx + xc
-                                y = self.yx1 + yc
-                                y2 = self.yx2 + yc                    
-                                plt.scatter(x, y, s =  self.s, c = 'blue')
-                                plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                                x = g.xx + xc
+                                y = g.yx1 + yc
+                                y2 = g.yx2 + yc                    
+                                plt.scatter(x, y, s =  g.s, c = 'blue')
+                                plt.scatter(x, y2, s =  g.s, c = 'blue')    
                             else:
-                                x = self.xb + xc
-                                y = self.yb + yc
-                                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                                x = g.xb + xc
+                                y = g.yb + yc
+                                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                                 x = [zz[0] for zz in z]
                                 y = [zz[1] for zz in z]
-                                plt.scatter(x, y, s =  self.s, c = 'orange')
+                                plt.scatter(x, y, s =  g.s, c = 'orange')
 
 
                         # Verifica se o jogo acabou após movimento do robô
                         r, tipo = self.check_result()
 
                         if r is not None:
+                            self.__registra(registro)
                             if r == 0:
                                 print("Empate")
                             elif r == 1:
@@ -604,18 +626,18 @@ class owg:
                     xc = i/2 + .235
                     yc = 0.5 + j 
                     if self.cur:
-                        x = self.xx + xc
-                        y = self.yx1 + yc
-                        y2 = self.yx2 + yc                    
-                        plt.scatter(x, y, s = self.s, c = 'blue')
-                        plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                        x = g.xx + xc
+                        y = g.yx1 + yc
+                        y2 = g.yx2 + yc                    
+                        plt.scatter(x, y, s = g.s, c = 'blue')
+                        plt.scatter(x, y2, s =  g.s, c = 'blue')    
                     else:
-                        x = self.xb + xc
-                        y = self.yb + yc
-                        z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                        x = g.xb + xc
+                        y = g.yb + yc
+                        z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                         x = [zz[0] for zz in z]
                         y = [zz[1] for zz in z]
-                        plt.scatter(x, y, s =  self.s, c = 'orange')
+                        plt.scatter(x, y, s =  g.s, c = 'orange')
 
         cid = fig.canvas.mpl_connect('button_press_event', lambda l:onclick(self, l))
 
@@ -629,7 +651,8 @@ class owg:
         mostra os rewards associados com cada possível movimento (para o jogador X)
         
         '''
-
+        import matplotlib.pyplot as plt
+        g = self.__renderer()
 
         # Reseta o tabuleiro atual
         #self.reset()
@@ -642,19 +665,19 @@ class owg:
             yc = 0.5 + j 
             if cur:
                 # Jogador atual é o X
-                x = self.xx + xc
-                y = self.yx1 + yc
-                y2 = self.yx2 + yc                    
-                plt.scatter(x, y, s =  self.s, c = 'blue')
-                plt.scatter(x, y2, s =  self.s, c = 'blue')    
+                x = g.xx + xc
+                y = g.yx1 + yc
+                y2 = g.yx2 + yc                    
+                plt.scatter(x, y, s =  g.s, c = 'blue')
+                plt.scatter(x, y2, s =  g.s, c = 'blue')    
             else:
                 # Jogador atual é o O
-                x = self.xb + xc
-                y = self.yb + yc
-                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                x = g.xb + xc
+                y = g.yb + yc
+                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                 x = [zz[0] for zz in z]
                 y = [zz[1] for zz in z]
-                plt.scatter(x, y, s =  self.s, c = 'orange')     
+                plt.scatter(x, y, s =  g.s, c = 'orange')     
                 
                 
         def draw_alpha(i, j, cur, alpha, reward):
@@ -664,11 +687,11 @@ class owg:
             xc = i/2 + .235
             yc = 0.5 + j 
 
-            x = self.xx + xc
-            y = self.yx1 + yc
-            y2 = self.yx2 + yc                    
-            plt.scatter(x, y, s =  self.s, c = 'gray', alpha = alpha)
-            plt.scatter(x, y2, s =  self.s, c = 'gray', alpha = alpha)         
+            x = g.xx + xc
+            y = g.yx1 + yc
+            y2 = g.yx2 + yc                    
+            plt.scatter(x, y, s =  g.s, c = 'gray', alpha = alpha)
+            plt.scatter(x, y2, s =  g.s, c = 'gray', alpha = alpha)         
             plt.annotate("%5.2f" % reward, (xc-0.03, yc+0.3), color = 'black', fontsize = 16)
         
 
@@ -724,8 +747,9 @@ class owg:
         sem inicializar / desenhar o tabuleiro
         
         '''
+        import matplotlib.pyplot as plt
+        g = self.__renderer()
 
-                
         def draw_alpha(i, j, cur, alpha, reward):
             '''
             Desenha o símbolo X na casa (i,j), com transparência alpha
@@ -734,21 +758,21 @@ class owg:
             yc = 0.5 + j 
 
             if cur:
-                x = self.xx + xc
-                y = self.yx1 + yc
-                y2 = self.yx2 + yc                    
-                plt.scatter(x, y, s = self.s, c = 'gray', alpha = alpha)
-                plt.scatter(x, y2, s = self.s, c = 'gray', alpha = alpha)       
+                x = g.xx + xc
+                y = g.yx1 + yc
+                y2 = g.yx2 + yc                    
+                plt.scatter(x, y, s = g.s, c = 'gray', alpha = alpha)
+                plt.scatter(x, y2, s = g.s, c = 'gray', alpha = alpha)       
                 plt.annotate("%5.2f" % reward, (xc-0.03, yc+0.3), color = 'gray', fontsize = 16)      
 
             else:
                 # Jogador atual é o O
-                x = self.xb + xc
-                y = self.yb + yc
-                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + self.eps ]
+                x = g.xb + xc
+                y = g.yb + yc
+                z = [z for z in zip(x,y) if .25*(z[1]-yc)**2 + (z[0]-xc)**2 >= 0.008 + g.eps ]
                 x = [zz[0] for zz in z]
                 y = [zz[1] for zz in z]
-                plt.scatter(x, y, s =  self.s, c = 'gray', alpha = alpha)     
+                plt.scatter(x, y, s =  g.s, c = 'gray', alpha = alpha)     
                 plt.annotate("%5.2f" % reward, (xc-0.03, yc+0.4), color = 'gray', fontsize = 16)      
                 
 
@@ -0,0 +1,188 @@
+# Jogador congelado: a política de um jogador treinado compilada numa tabela
+
+import numpy as np
+
+from owg_player_base import owg_player
+from owg_negamax import solucao
+from owg_simetria import CANONICO, TRANSFORMACAO, PARA_REAL
+from owg_simulador import REGRAS, regras, conhecimento
+from owg_tabela import sstate_para_istate, tabela
+
+
+def congela(p, amostras = 256, seed = None, amostras_busca = 1):
+    '''
+    Compila a política atual do jogador p numa tabela indexada pelo id da posição de decisão (owg_tabela),
+    já no tabuleiro real (as simetrias, se o jogador as usa, e a varredura de um lance à frente, se ele
+    consulta, ficam embutidas na tabela).
+
+    Jogadores determinísticos (cientista_sovina, e epsilon_edson com epsilon = 0) viram um vetor com o lance
+    de cada posição. Os demais viram um conjunto de amostras por posição: amostras lances sorteados de
+    antemão com a regra do jogador (Thompson sampling para os cientistas, exploração com probabilidade
+    epsilon para epsilon_edson, sorteio entre os lances ótimos para perfeito, sorteio uniforme para jb e
+    miope); cada lance é uma das amostras, sorteada.
+
+    Os jogadores cuja regra não tem versão vetorizada (as buscas de cientista_previdente e cientista_mcts,
+    ver owg_simulador.REGRAS) são compilados posição a posição, com p.decide em cada posição de decisão,
+    amostras_busca vezes: o custo é de amostras_busca * n_decisoes buscas (com amostras_busca = 1, o padrão,
+    a tabela guarda um único sorteio de cada posição e o congelado fica determinístico).
+
+    @args
+
+    p -- jogador treinado
+    amostras -- número de amostras por posição, para os jogadores que sorteiam
+    seed -- semente usada para sortear as amostras
+    amostras_busca -- número de amostras por posição, para os jogadores sem regra vetorizada
+
+    @returns
+
+    um objeto congelado
+    '''
+    T = tabela()
+    rng = np.random.default_rng(seed)
+    if next((REGRAS[c] for c in type(p).__mro__ if c in REGRAS), ()) is None:
+        return _congela_busca(p, amostras_busca, seed)
+    decisao, tatica = regras(p)
+    istates = T.decisao_istates
+    n = T.n_decisoes
+
+    # Chave de knowledge de cada posição, e a transformação que leva o tabuleiro real até ela
+    if p.simetria:
+        ids = T.decisao_ids[CANONICO[istates]]
+        transf = TRANSFORMACAO[istates].astype(np.int64)
+    else:
+        ids = np.arange(n)
+        transf = np.zeros(n, dtype = np.int64)
+    legal = T.decisao_legal[ids]
+    denso = conhecimento(p)
+
+    deterministico = decisao == 'media' or (decisao == 'epsilon' and p.e == 0)
+    if deterministico:
+        if decisao == 'media':
+            alfa = denso.valores('alfa', ids)
+            valor = alfa / (alfa + denso.valores('beta', ids))
+        else:
+            valor = denso.valores('rec', ids).astype(np.float64)
+        valor[~legal] = -np.inf
+        acao = np.argmax(valor, axis = 1)[:, None]
+    else:
+        forma = (n, amostras, 9)
+        if decisao == 'thompson':
+            alfa = denso.valores('alfa', ids)[:, None, :]
+            beta = denso.valores('beta', ids)[:, None, :]
+            valor = rng.beta(alfa, beta, size = forma)
+        elif decisao == 'epsilon':
+            valor = np.broadcast_to(denso.valores('rec', ids)[:, None, :], forma).astype(np.float64)
+            explora = rng.random((n, amostras)) < p.e
+            valor[explora] = rng.random((explora.sum(), 9))
+        elif decisao == 'otimo':
+            valor = solucao().lances[ids][:, None, :] + rng.random(forma) / 2
+            explora = rng.random((n, amostras)) < p.erro
+            valor[explora] = rng.random((explora.sum(), 9))
+        else:
+            valor = rng.random(forma)
+        valor[~np.broadcast_to(legal[:, None, :], forma)] = -np.inf
+        acao = np.argmax(valor, axis = 2)
+
+    # Casas da chave de knowledge -> casas do tabuleiro real
+    acao = PARA_REAL[transf[:, None], acao]
+    if tatica:
+        t = T.tatica_array[istates]
+        acao = np.where(t[:, None] >= 0, t[:, None], acao)
+    acao = acao.astype(np.int8)
+    return congelado(acao[:, 0] if deterministico else acao, nome = getattr(p, 'nome', None), seed = seed)
+
+
+def _congela_busca(p, amostras, seed):
+    '''
+    Compila a política de p chamando p.decide_many em todas as posições de decisão, amostras vezes (ver
+    congela). O sorteio usa um gerador com a semente seed no lugar do de p, que fica como estava.
+    '''
+    T = tabela()
+    rng_p = p.rng
+    p.rng = np.random.default_rng(seed)
+    try:
+        acao = np.asarray(p.decide_many(np.tile(T.decisao_istates, amostras)), dtype = np.int8)
+    finally:
+        p.rng = rng_p
+    acao = acao.reshape(amostras, T.n_decisoes).T
+    return congelado(acao[:, 0] if amostras == 1 else acao, nome = getattr(p, 'nome', None), seed = seed)
+
+
+class congelado(owg_player):
+    '''
+    Classe congelado: jogador que joga com uma política compilada por congela. Cada lance é uma consulta à
+    tabela (e, para as políticas com amostras, o sorteio de uma delas). Não aprende e não altera knowledge
+    nem jogo.
+
+    @args
+
+    tabela_lances -- vetor (n_decisoes) com o lance de cada posição, ou array (n_decisoes, amostras) com
+                      as amostras de lances de cada posição
+    nome -- nome do jogador
+    seed -- semente do gerador de números aleatórios
+    '''
+    def __init__(self, tabela_lances, nome = None, seed = None):
+        self.lances = np.ascontiguousarray(tabela_lances)
+        self.nome = 'Congelado' if nome is None else nome + ' (congelado)'
+        owg_player.__init__(self, seed)
+
+    @property
+    def deterministico(self):
+        return self.lances.ndim == 1
+
+    def decide(self, istate):
+        '''
+        Retorna a casa a jogar na posição istate (do ponto de vista do jogador; string sstate ou inteiro
+        istate, como em owg_player.decide)
+        '''
+        istate = sstate_para_istate(istate) if isinstance(istate, str) else int(istate)
+        i = tabela().decisao_ids[istate]
+        if i < 0:
+            # Posição fora da tabela (por exemplo montada à mão em start_free): sorteia um lance
+            return int(self.rng.choice(tabela().legais[istate]))
+        if self.deterministico:
+            return int(self.lances[i])
+        return int(self.lances[i, self.rng.integers(self.lances.shape[1])])
+
+    def _decide(self, istate):
+        # Usado por sessao: não há chave de knowledge nem aprendizagem, a trajetória guarda a própria posição
+        istate = sstate_para_istate(istate) if isinstance(istate, str) else int(istate)
+        acao = self.decide(istate)
+        return istate, acao, acao
+
+    def decide_many(self, istates):
+        '''
+        Versão vetorizada de decide: retorna o array das casas a jogar em cada uma das posições istates
+        (strings ou inteiros, todas posições de decisão)
+        '''
+        if not isinstance(istates, np.ndarray):
+            istates = np.array([sstate_para_istate(p) if isinstance(p, str) else p for p in istates], dtype = np.int64)
+        ids = tabela().decisao_ids[istates]
+        if self.deterministico:
+            return self.lances[ids]
+        return self.lances[ids, self.rng.integers(self.lances.shape[1], size = len(ids))]
+
+    def avalia_posicao(self, strpos):
+        '''
+        Frequência de cada ação entre as amostras da posição (1 para o lance, nos determinísticos)
+        '''
+        istate = sstate_para_istate(strpos) if isinstance(strpos, str) else strpos
+        acoes = list(tabela().legais[istate])
+        i = tabela().decisao_ids[istate]
+        linha = np.atleast_1d(self.lances[i]) if i >= 0 else np.array([], dtype = np.int8)
+        rew = [float(np.mean(linha == a)) if len(linha) else 0. for a in acoes]
+        return acoes, rew
+
+    def joga(self, verbose = False):
+        '''
+        Dada a posição atual do tabuleiro, joga o lance da tabela
+        '''
+        r, _ = self.board.check_result()
+        if r is not None:
+            return None
+        acao = self.decide(self.board.istate)
+        movimento = (acao // 3, acao % 3)
+        if verbose:
+            print(self.board.sstate, movimento)
+        self.board.play(1, movimento)
+        return movimento
@@ -0,0 +1,200 @@
+# Conhecimento denso: knowledge em arrays contíguos
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from owg_tabela import istate_para_sstate, sstate_para_istate, tabela
+
+# Tipo de cada campo. alfa e beta são guardados como contagens (vitórias / derrotas) acima da priori,
+# em inteiros de 32 bits; as recompensas de epsilon_edson são somas descontadas, em ponto flutuante.
+_TIPOS = {'alfa' : np.uint32, 'beta' : np.uint32}
+
+
+class conhecimento_denso(MutableMapping):
+    '''
+    Classe conhecimento_denso: substituto do dicionário knowledge que guarda os parâmetros de cada posição em
+    arrays (n_decisoes, 9), indexados pelo id da posição de decisão (owg_tabela) e pela casa. As casas
+    ocupadas ficam fora da máscara legal e nunca aparecem nas entradas.
+
+    Para o código dos jogadores continua sendo um dicionário: store[pos] devolve a mesma tupla
+    (acoes, campo1, campo2, ...) de listas que o dicionário original guardaria, e store[pos] = tupla grava
+    de volta nos arrays. Só as posições já inicializadas (visitado) fazem parte do dicionário. Posições fora
+    do espaço de decisão (raras; por exemplo posições finais) ficam num dicionário comum, extra.
+
+    @args
+
+    priores -- dicionário campo : valor a priori, na ordem dos campos da tupla (por exemplo
+                {'alfa' : 1, 'beta' : 1} para os cientistas, {'rec' : 0.} para epsilon_edson)
+    chave_inteira -- se True as chaves são os istates; se False, as strings sstate
+
+    Um conhecimento somente para leitura (ver de_arrays, usado com arrays mapeados em memória) não aceita
+    gravações; nele todas as posições de decisão estão presentes, as que nunca foram visitadas com a priori.
+    '''
+    somente_leitura = False
+
+    def __init__(self, priores, chave_inteira = False):
+        T = tabela()
+        self.priores = dict(priores)
+        self.chave_inteira = chave_inteira
+        self.dados = {c : np.zeros((T.n_decisoes, 9), dtype = _TIPOS.get(c, np.float64)) for c in self.priores}
+        self.visitado = np.zeros(T.n_decisoes, dtype = bool)
+        self.extra = dict()
+
+    @classmethod
+    def de_dict(cls, knowledge, priores, chave_inteira = False):
+        '''
+        Cria um conhecimento_denso com o conteúdo de um dicionário knowledge no formato dos jogadores
+        '''
+        store = cls(priores, chave_inteira)
+        for pos, valor in knowledge.items():
+            store[pos] = valor
+        return store
+
+    @classmethod
+    def de_arrays(cls, priores, dados, visitado, chave_inteira = False, somente_leitura = False):
+        '''
+        Cria um conhecimento_denso sobre arrays já existentes (sem cópia), por exemplo arrays mapeados em
+        memória de um arquivo (ver owg_arquivo.carrega_mapeado)
+
+        @args
+
+        dados -- dicionário campo : array (n_decisoes, 9)
+        visitado -- vetor booleano (n_decisoes)
+        '''
+        store = cls.__new__(cls)
+        store.priores = dict(priores)
+        store.chave_inteira = chave_inteira
+        store.dados = dict(dados)
+        store.visitado = visitado
+        store.extra = dict()
+        store.somente_leitura = somente_leitura
+        return store
+
+    def para_dict(self):
+        '''
+        Retorna o conteúdo como um dicionário comum, no formato original de knowledge
+        '''
+        return {pos : valor for pos, valor in self.items()}
+
+    def copia(self):
+        '''
+        Cópia independente (arrays copiados), que aceita gravações mesmo se o original for somente para leitura
+        '''
+        novo = conhecimento_denso.__new__(conhecimento_denso)
+        novo.priores = dict(self.priores)
+        novo.chave_inteira = self.chave_inteira
+        novo.dados = {c : v.copy() for c, v in self.dados.items()}
+        novo.visitado = self.visitado.copy()
+        novo.extra = dict(self.extra)
+        return novo
+
+    @property
+    def legal(self):
+        '''
+        Máscara (n_decisoes, 9) das casas vazias de cada posição
+        '''
+        return tabela().decisao_legal
+
+    def id(self, pos):
+        '''
+        Id da posição de decisão correspondente a pos (string ou inteiro), ou -1
+        '''
+        if isinstance(pos, str):
+            pos = sstate_para_istate(pos)
+        return tabela().decisao_ids[pos]
+
+    def ids(self, posicoes):
+        '''
+        Ids das posições de decisão correspondentes a uma lista de posições (strings ou inteiros)
+        '''
+        istates = [sstate_para_istate(p) if isinstance(p, str) else p for p in posicoes]
+        return tabela().decisao_ids[np.array(istates, dtype = np.int64)]
+
+    def valores(self, campo, ids):
+        '''
+        Valores do campo (priori + dados) para as posições ids, em arrays (len(ids), 9)
+        '''
+        return self.priores[campo] + self.dados[campo][ids]
+
+    def soma(self, campo, ids, acoes, pesos = None):
+        '''
+        Soma pesos (1 por padrão) em campo nas entradas (ids, acoes), acumulando as repetições, e marca as
+        posições como visitadas
+        '''
+        self.__verifica_gravacao()
+        ids = np.asarray(ids)
+        acoes = np.asarray(acoes)
+        dados = self.dados[campo]
+        if len(ids) < 256:
+            # Poucas entradas (uma partida, por exemplo): soma direta, sem percorrer a tabela inteira
+            np.add.at(dados, (ids, acoes), 1 if pesos is None else np.asarray(pesos).astype(dados.dtype))
+        else:
+            n = len(self.visitado) * 9
+            soma = np.bincount(ids * 9 + acoes, weights = pesos, minlength = n).reshape(-1, 9)
+            dados += soma.astype(dados.dtype)
+        self.visitado[ids] = True
+
+    def nbytes(self):
+        '''
+        Memória ocupada pelos arrays, em bytes
+        '''
+        return sum(v.nbytes for v in self.dados.values()) + self.visitado.nbytes
+
+    def __verifica_gravacao(self):
+        if self.somente_leitura:
+            raise ValueError("Erro! conhecimento somente para leitura")
+
+    def __chave(self, istate):
+        return istate if self.chave_inteira else istate_para_sstate(istate)
+
+    def __getitem__(self, pos):
+        i = self.id(pos)
+        if i < 0:
+            return self.extra[pos]
+        if not self.visitado[i] and not self.somente_leitura:
+            raise KeyError(pos)
+        legal = tabela().decisao_legal[i]
+        acoes = np.flatnonzero(legal).tolist()
+        return tuple([acoes] + [(p + self.dados[c][i][legal]).tolist() for c, p in self.priores.items()])
+
+    def __setitem__(self, pos, valor):
+        self.__verifica_gravacao()
+        i = self.id(pos)
+        if i < 0:
+            self.extra[pos] = valor
+            return
+        acoes = list(valor[0])
+        for (c, p), v in zip(self.priores.items(), valor[1:]):
+            v = np.asarray(v, dtype = np.float64) - p
+            if self.dados[c].dtype.kind == 'u' and np.any((v < 0) | (v != np.round(v))):
+                raise ValueError("Erro! {} precisa ser a priori mais um número inteiro de observações".format(c))
+            self.dados[c][i, acoes] = v
+        self.visitado[i] = True
+
+    def __delitem__(self, pos):
+        self.__verifica_gravacao()
+        i = self.id(pos)
+        if i < 0:
+            del self.extra[pos]
+            return
+        if not self.visitado[i]:
+            raise KeyError(pos)
+        for c in self.dados:
+            self.dados[c][i] = 0
+        self.visitado[i] = False
+
+    def __contains__(self, pos):
+        i = self.id(pos)
+        if i < 0:
+            return pos in self.extra
+        return self.somente_leitura or bool(self.visitado[i])
+
+    def __iter__(self):
+        T = tabela()
+        for i in np.flatnonzero(self.visitado):
+            yield self.__chave(int(T.decisao_istates[i]))
+        yield from self.extra
+
+    def __len__(self):
+        return int(self.visitado.sum()) + len(self.extra)
@@ -0,0 +1,196 @@
+# Benchmark de convergência: quantas partidas (e quanto tempo) cada classe de jogador precisa para aprender
+
+import argparse
+import json
+import pickle
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+import owg_players
+from owg_estatisticas import estatisticas
+from owg_negamax import qualidade
+from owg_simulador import simulador
+
+# Classes avaliadas por padrão: as que aprendem e têm regra de decisão vetorizada (owg_simulador)
+CLASSES = ['epsilon_edson', 'cientista_sovina', 'cientista', 'cientista_cauteloso', 'cientista_conciliador',
+           'cientista_esperto']
+
+# Oponentes fixos: 'si' é o próprio jogador (self-learning, com o conhecimento compartilhado)
+OPONENTES = ['jb', 'miope', 'si']
+
+# Meta padrão de cada oponente: (medida, taxa). A medida é a fração de 'vitorias', de 'empates' ou de
+# partidas em que o jogador 'nao_perde', numa janela de partidas
+METAS = {
+    'jb' : ('vitorias', .9),
+    'miope' : ('nao_perde', .95),
+    'si' : ('empates', .9),
+}
+
+
+def _oponente(nome, p, seed):
+    if nome == 'si':
+        return p
+    classe = getattr(owg_players, nome, None)
+    if classe is None:
+        raise ValueError("Erro! oponente desconhecido: {}".format(nome))
+    return classe(seed = seed)
+
+
+MEDIDAS = ('vitorias', 'empates', 'nao_perde')
+
+
+def _taxa(medida, taxas):
+    # Taxa da medida a partir das taxas [vitórias, empates, derrotas]
+    if medida == 'vitorias':
+        return taxas[0]
+    if medida == 'empates':
+        return taxas[1]
+    return taxas[0] + taxas[1]
+
+
+def convergencia(classe, oponente, medida = None, alvo = None, max_jogos = 200000, janela = 4096, lote = 256,
+                 seed = 0, para_no_alvo = False):
+    '''
+    Treina um jogador da classe contra o oponente com o simulador vetorizado, com sementes fixas, e mede a
+    velocidade de aprendizagem. O simulador aprende ao fim de cada lote de lote partidas; depois de cada
+    lote, a taxa da medida é calculada nas últimas janela partidas (owg_estatisticas), e jogos_ate_alvo é o
+    número de partidas jogadas quando ela atinge o alvo pela primeira vez, com pelo menos janela partidas
+    jogadas (None se não atingir em max_jogos partidas). A resolução de jogos_ate_alvo é portanto de lote
+    partidas: lotes grandes atrasam o aprendizado e arredondam a medida para cima, favorecendo quem aprende
+    devagar.
+
+    A memória é medida com tracemalloc durante todo o treino (os tempos incluem o custo dele, o mesmo em
+    todas as execuções).
+
+    @args
+
+    classe -- nome da classe do jogador (owg_players)
+    oponente -- nome da classe do oponente, ou 'si' para o jogador contra si mesmo
+    medida, alvo -- meta; se None, a de METAS para o oponente
+    max_jogos -- número máximo de partidas
+    janela -- número de partidas da janela da taxa
+    lote -- número de partidas de cada lote do simulador (a resolução da medida)
+    seed -- semente do jogador (o oponente usa seed + 1 e o simulador seed + 2)
+    para_no_alvo -- se True, encerra o treino quando o alvo é atingido
+
+    @returns
+
+    dicionário com a configuração e os resultados da execução: jogos_ate_alvo, segundos_ate_alvo, jogos,
+    segundos, taxa_final (na última janela), pico_memoria (bytes), posicoes (posições em knowledge),
+    bytes_conhecimento (knowledge serializado com pickle), qualidade (owg_negamax) e curva (lista de
+    [jogos, vitorias, empates, derrotas] nas últimas janela partidas, em frações, em até 1000 pontos)
+    '''
+    padrao_medida, padrao_alvo = METAS.get(oponente, ('nao_perde', .9))
+    medida = padrao_medida if medida is None else medida
+    alvo = padrao_alvo if alvo is None else alvo
+    if medida not in MEDIDAS:
+        raise ValueError("Erro! medida desconhecida: {}".format(medida))
+    if lote > janela:
+        raise ValueError("Erro! o lote ({}) não pode ser maior que a janela ({})".format(lote, janela))
+
+    p = getattr(owg_players, classe)(seed = seed)
+    q = _oponente(oponente, p, seed + 1)
+
+    tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        sim = simulador(p, q, seed + 2)
+        est = estatisticas(janela = janela)
+        jogos_ate_alvo = None
+        segundos_ate_alvo = None
+        taxa = None
+        while sim.n_jogos < max_jogos:
+            est.registra_lote(sim.roda(min(lote, max_jogos - sim.n_jogos)))
+            taxa = _taxa(medida, est.taxas_janela())
+            if jogos_ate_alvo is None and sim.n_jogos >= janela and taxa >= alvo:
+                jogos_ate_alvo = sim.n_jogos
+                segundos_ate_alvo = time.perf_counter() - t0
+                if para_no_alvo:
+                    break
+        sim.exporta()
+        segundos = time.perf_counter() - t0
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    h = est.pontos_historico()
+
+    return {
+        'classe' : classe,
+        'oponente' : oponente,
+        'medida' : medida,
+        'alvo' : alvo,
+        'seed' : seed,
+        'janela' : janela,
+        'lote' : lote,
+        'jogos_ate_alvo' : jogos_ate_alvo,
+        'segundos_ate_alvo' : segundos_ate_alvo,
+        'jogos' : sim.n_jogos,
+        'segundos' : segundos,
+        'taxa_final' : taxa,
+        'pico_memoria' : pico,
+        'posicoes' : len(p.knowledge),
+        'bytes_conhecimento' : len(pickle.dumps(p.knowledge, protocol = pickle.HIGHEST_PROTOCOL)),
+        'qualidade' : qualidade(p),
+        'curva' : np.column_stack([h['jogos'], h['vitorias_janela'], h['empates_janela'],
+                                   h['derrotas_janela']]).tolist(),
+    }
+
+
+def bench_convergencia(classes = None, oponentes = None, max_jogos = 200000, janela = 4096, lote = 256, seed = 0,
+                       saida = None, verbose = True):
+    '''
+    Roda convergencia para cada classe contra cada oponente e grava o relatório em JSON (se saida não é
+    None), para comparar versões do código.
+
+    @returns
+
+    o relatório: dicionário com o ambiente (versões do Python e do NumPy), os parâmetros e a lista de
+    execuções
+    '''
+    classes = CLASSES if classes is None else classes
+    oponentes = OPONENTES if oponentes is None else oponentes
+    relatorio = {
+        'ambiente' : {'python' : platform.python_version(), 'numpy' : np.__version__,
+                      'plataforma' : platform.platform()},
+        'parametros' : {'max_jogos' : max_jogos, 'janela' : janela, 'lote' : lote, 'seed' : seed},
+        'execucoes' : [],
+    }
+    if verbose:
+        print("Partidas até a meta com resolução de {} partidas (lote do simulador), taxa em janelas de {}".format(
+            lote, janela))
+        print("{:<22} {:<8} {:>17} {:>10} {:>8} {:>8} {:>10} {:>8}".format(
+            "classe", "oponente", "meta", "jogos", "s", "final", "memória", "ótimos"))
+    for classe in classes:
+        for oponente in oponentes:
+            res = convergencia(classe, oponente, max_jogos = max_jogos, janela = janela, lote = lote, seed = seed)
+            relatorio['execucoes'].append(res)
+            if verbose:
+                print("{:<22} {:<8} {:>12} {:.2f} {:>10} {:>8.1f} {:>8.3f} {:>7.1f}MB {:>8.3f}".format(
+                    classe, oponente, res['medida'], res['alvo'],
+                    '-' if res['jogos_ate_alvo'] is None else res['jogos_ate_alvo'], res['segundos'],
+                    res['taxa_final'], res['pico_memoria'] / 2 ** 20, res['qualidade']), flush = True)
+    if saida is not None:
+        with open(saida, 'w') as arq:
+            json.dump(relatorio, arq, indent = 1)
+    return relatorio
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark de convergência dos jogadores do jogo da velha')
+    parser.add_argument('--classes', nargs = '+', default = CLASSES)
+    parser.add_argument('--oponentes', nargs = '+', default = OPONENTES)
+    parser.add_argument('-n', '--max-jogos', type = int, default = 200000)
+    parser.add_argument('--janela', type = int, default = 4096, help = 'partidas da janela da taxa')
+    parser.add_argument('--lote', type = int, default = 256,
+                        help = 'partidas de cada lote do simulador, que aprende ao fim de cada um (resolução da medida)')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--saida', default = 'convergencia.json', help = 'arquivo do relatório em JSON')
+    args = parser.parse_args(argv)
+    bench_convergencia(args.classes, args.oponentes, args.max_jogos, args.janela, args.lote, args.seed, args.saida)
+
+
+if __name__ == '__main__':
+    main()
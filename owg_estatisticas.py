@@ -0,0 +1,153 @@
+# Estatísticas dos resultados do treino com memória limitada: taxas acumuladas, numa janela, e histórico dizimado
+
+import numpy as np
+
+
+class estatisticas:
+    '''
+    Classe estatisticas: acompanha os resultados de uma sequência de partidas (do ponto de vista de p1) com
+    memória constante, qualquer que seja o número de partidas:
+
+    - taxas acumuladas de vitória, empate e derrota (três contadores)
+    - taxas nas últimas janela partidas (um buffer circular de janela bytes)
+    - histórico para os gráficos, com no máximo pontos pontos: um ponto a cada passo partidas; quando o
+      histórico enche, fica um ponto a cada dois e o passo dobra (dizimação), de modo que os pontos cobrem
+      sempre a sequência inteira
+
+    Substitui as listas pjog1, pempate e pjog2 do notebook, que guardavam três floats por partida.
+
+    @args
+
+    pontos -- número máximo de pontos do histórico (par)
+    janela -- número de partidas da janela
+    '''
+    # Colunas de cada ponto do histórico
+    COLUNAS = ('jogos', 'vitorias', 'empates', 'derrotas', 'vitorias_janela', 'empates_janela', 'derrotas_janela')
+
+    def __init__(self, pontos = 1000, janela = 10000):
+        if pontos < 2 or pontos % 2:
+            raise ValueError("Erro! o número de pontos do histórico deve ser par")
+        self.pontos = pontos
+        self.janela = janela
+        self.zera()
+
+    def zera(self):
+        '''
+        Descarta todos os resultados
+        '''
+        # contagem[r + 1]: derrotas, empates e vitórias, acumuladas e na janela
+        self.contagem = [0, 0, 0]
+        self.contagem_janela = [0, 0, 0]
+        self.buffer = bytearray(self.janela)
+        self.n = 0
+        self.passo = 1
+        self.historico = np.zeros((self.pontos, len(self.COLUNAS)))
+        self.n_pontos = 0
+
+    def registra(self, r):
+        '''
+        Registra o resultado r (1, 0 ou -1) de uma partida
+        '''
+        k = r + 1
+        self.contagem[k] += 1
+        i = self.n % self.janela
+        if self.n >= self.janela:
+            self.contagem_janela[self.buffer[i]] -= 1
+        self.buffer[i] = k
+        self.contagem_janela[k] += 1
+        self.n += 1
+        if self.n % self.passo == 0:
+            self.__ponto()
+
+    def registra_lote(self, resultados):
+        '''
+        Registra os resultados de um lote de partidas, na ordem (array de 1, 0 ou -1). Os pontos do histórico
+        que caem dentro do lote são calculados com as contagens exatas de cada um.
+        '''
+        r = np.asarray(resultados, dtype = np.int64) + 1
+        inicio = 0
+        while inicio < len(r):
+            # Até o próximo ponto do histórico (ou o fim do lote)
+            fim = min(len(r), inicio + self.passo - self.n % self.passo)
+            self.__soma(r[inicio:fim])
+            if self.n % self.passo == 0:
+                self.__ponto()
+            inicio = fim
+
+    def __soma(self, r):
+        # Acrescenta os resultados r (já somados de 1) às contagens e ao buffer circular
+        for k, c in enumerate(np.bincount(r, minlength = 3).tolist()):
+            self.contagem[k] += c
+        ultimos = r[-self.janela:]
+        pos = (self.n + len(r) - len(ultimos) + np.arange(len(ultimos))) % self.janela
+        buf = np.frombuffer(self.buffer, dtype = np.uint8)
+        # Saem da janela os resultados que ocupavam as posições sobrescritas (antes de o buffer dar a primeira
+        # volta, só as posições 0 a n - 1 estão ocupadas)
+        velhos = pos if self.n >= self.janela else pos[pos < self.n]
+        for k, c in enumerate(np.bincount(buf[velhos], minlength = 3).tolist()):
+            self.contagem_janela[k] -= c
+        buf[pos] = ultimos
+        for k, c in enumerate(np.bincount(ultimos, minlength = 3).tolist()):
+            self.contagem_janela[k] += c
+        self.n += len(r)
+
+    def __ponto(self):
+        if self.n_pontos == self.pontos:
+            # Histórico cheio: fica um ponto a cada dois, e o passo dobra
+            self.historico[:self.pontos // 2] = self.historico[1::2]
+            self.n_pontos = self.pontos // 2
+            self.passo *= 2
+            if self.n % self.passo:
+                return
+        self.historico[self.n_pontos] = [self.n] + self.taxas() + self.taxas_janela()
+        self.n_pontos += 1
+
+    def taxas(self):
+        '''
+        Taxas acumuladas [vitórias, empates, derrotas]
+        '''
+        if self.n == 0:
+            return [0., 0., 0.]
+        return [self.contagem[2] / self.n, self.contagem[1] / self.n, self.contagem[0] / self.n]
+
+    def taxas_janela(self):
+        '''
+        Taxas [vitórias, empates, derrotas] nas últimas janela partidas
+        '''
+        n = min(self.n, self.janela)
+        if n == 0:
+            return [0., 0., 0.]
+        c = self.contagem_janela
+        return [c[2] / n, c[1] / n, c[0] / n]
+
+    def pontos_historico(self):
+        '''
+        Retorna o histórico como um dicionário coluna : array (ver COLUNAS), terminado no estado atual
+        '''
+        h = self.historico[:self.n_pontos]
+        if self.n > 0 and (self.n_pontos == 0 or h[-1, 0] < self.n):
+            h = np.vstack([h, [self.n] + self.taxas() + self.taxas_janela()])
+        return {c : h[:, k] for k, c in enumerate(self.COLUNAS)}
+
+    def plota(self, nomes = ('Jogador 1', 'Jogador 2'), janela = False, ax = None):
+        '''
+        Gráfico das taxas ao longo das partidas, como no notebook: vitórias de cada jogador e empates,
+        acumuladas (ou na janela, com janela = True)
+
+        @returns
+
+        o eixo (matplotlib) do gráfico
+        '''
+        import matplotlib.pyplot as plt
+        if ax is None:
+            _, ax = plt.subplots(figsize = (20, 10))
+        h = self.pontos_historico()
+        sufixo = '_janela' if janela else ''
+        ax.plot(h['jogos'], h['vitorias' + sufixo], '-', label = nomes[0])
+        ax.plot(h['jogos'], h['empates' + sufixo], '-', label = 'Empate')
+        ax.plot(h['jogos'], h['derrotas' + sufixo], '-', label = nomes[1])
+        ax.set_ylim([0, 1])
+        ax.axhline(y = 0.5, linestyle = 'dashed')
+        ax.grid(True)
+        ax.legend()
+        return ax
@@ -0,0 +1,181 @@
+# Busca em árvore Monte Carlo (MCTS): estatísticas Beta nos nós e simulações aleatórias em lote
+
+import time
+
+import numpy as np
+
+from owg_negamax import INVERTE
+from owg_tabela import POT, LINHAS, tabela
+
+_LINHAS = np.array(LINHAS)
+_POT = np.array(POT, dtype = np.int64)
+
+
+def simula_aleatorio(istates, rng):
+    '''
+    Termina as partidas a partir das posições istates (todas em andamento, do ponto de vista de quem tem a
+    vez) com lances sorteados dos dois lados, todas ao mesmo tempo, em arrays (N, 9) como no simulador
+
+    @returns
+
+    array com o resultado de cada partida para quem tinha a vez (1, 0 ou -1)
+    '''
+    tab = np.asarray(istates, dtype = np.int64)[:, None] // _POT % 3
+    resultado = np.zeros(len(tab), dtype = np.int8)
+    ativo = np.ones(len(tab), dtype = bool)
+    marca = 1
+    for _ in range(9):
+        idx = np.flatnonzero(ativo)
+        if len(idx) == 0:
+            break
+        sub = tab[idx]
+        valor = rng.random(sub.shape)
+        valor[sub != 2] = -1
+        sub[np.arange(len(idx)), np.argmax(valor, axis = 1)] = marca
+        tab[idx] = sub
+        vence = (sub[:, _LINHAS] == marca).all(axis = 2).any(axis = 1)
+        cheio = ~(sub == 2).any(axis = 1)
+        resultado[idx[vence]] = 1 if marca == 1 else -1
+        ativo[idx[vence | cheio]] = False
+        marca = 1 - marca
+    return resultado
+
+
+class no:
+    '''
+    Nó da árvore: uma posição (istate) do ponto de vista de quem tem a vez, e as estatísticas de cada lance
+    (casa): n simulações, w vitórias de quem tem a vez (o empate vale 1/2) e a priori Beta (alfa, beta).
+    filhos guarda os nós já expandidos, indexados pela casa.
+    '''
+    __slots__ = ('istate', 'filhos', 'legal', 'alfa', 'beta', 'n', 'w', 'rodada', 'escolhas')
+
+    def __init__(self, istate, alfa, beta):
+        self.istate = istate
+        self.filhos = dict()
+        self.legal = (tabela().legais_mask[istate] >> np.arange(9)) & 1 == 1
+        self.alfa = alfa
+        self.beta = beta
+        self.n = np.zeros(9)
+        self.w = np.zeros(9)
+        self.rodada = -1
+        self.escolhas = None
+
+    def seleciona(self, rng, rodada, k, lote):
+        '''
+        Thompson sampling: retorna a casa com a maior probabilidade de vitória sorteada da Beta (priori +
+        simulações) para a k-ésima descida da rodada. Os sorteios de todas as descidas de uma rodada são
+        feitos de uma vez, na primeira passagem da rodada pelo nó (uma chamada ao gerador por nó e rodada,
+        em vez de uma por descida), com as estatísticas do início da rodada.
+        '''
+        if self.rodada != rodada:
+            theta = rng.beta(self.alfa + self.w, self.beta + self.n - self.w, size = (lote, 9))
+            theta[:, ~self.legal] = -1
+            self.escolhas = np.argmax(theta, axis = 1).tolist()
+            self.rodada = rodada
+        return self.escolhas[k]
+
+
+class arvore:
+    '''
+    Classe arvore: árvore de busca de um jogador. A raiz acompanha a partida: avanca desce para o filho do
+    lance jogado (próprio ou do oponente), de modo que a subárvore desse lance é aproveitada na próxima
+    busca.
+
+    Cada rodada da busca desce lote vezes da raiz até um nó ainda não expandido (ou até o fim do jogo),
+    escolhendo os lances por Thompson sampling com as estatísticas do início da rodada (ver no.seleciona);
+    as descidas do mesmo lote se espalham pelos sorteios independentes. As posições das folhas são
+    terminadas todas de uma vez com simula_aleatorio, e o resultado sobe pelo caminho.
+
+    @args
+
+    priori -- função istate -> (alfa, beta), arrays (9) da priori de cada casa para quem tem a vez
+    rng -- gerador de números aleatórios
+    lote -- número de simulações de cada rodada
+    '''
+    def __init__(self, priori, rng, lote = 64):
+        self.priori = priori
+        self.rng = rng
+        self.lote = lote
+        self.raiz = None
+        self.rodada = 0
+
+    def _no(self, istate):
+        alfa, beta = self.priori(istate)
+        return no(istate, alfa, beta)
+
+    def posiciona(self, istate):
+        '''
+        Coloca a raiz na posição istate, aproveitando a árvore se a raiz já está nela
+        '''
+        if self.raiz is None or self.raiz.istate != istate:
+            self.raiz = self._no(istate)
+
+    def avanca(self, casa):
+        '''
+        Desce a raiz para o filho do lance casa (ou descarta a árvore, se ele não foi expandido)
+        '''
+        if self.raiz is not None:
+            self.raiz = self.raiz.filhos.get(casa)
+
+    def busca(self, simulacoes = None, tempo = None):
+        '''
+        Roda simulações a partir da raiz até completar simulacoes ou até passar tempo segundos (o que vier
+        primeiro; ao menos um dos dois deve ser dado). Com tempo, uma rodada só começa se a anterior
+        couber no tempo que resta. Retorna o número de simulações feitas.
+        '''
+        if simulacoes is None and tempo is None:
+            raise ValueError("Erro! informe o número de simulações ou o tempo")
+        T = tabela()
+        fim = None if tempo is None else time.perf_counter() + tempo
+        feitas = 0
+        duracao = 0.
+        while (simulacoes is None or feitas < simulacoes) and (fim is None or time.perf_counter() + duracao < fim):
+            inicio = time.perf_counter()
+            lote = self.lote if simulacoes is None else min(self.lote, simulacoes - feitas)
+            caminhos = []
+            valores = []
+            folhas = []
+            self.rodada += 1
+            for k in range(lote):
+                caminho = []
+                atual = self.raiz
+                while True:
+                    casa = atual.seleciona(self.rng, self.rodada, k, lote)
+                    caminho.append((atual, casa))
+                    filho = atual.istate - POT[casa]
+                    r = T.resultado_array[filho]
+                    if r != 2:
+                        # O lance termina o jogo: valor exato para quem jogou
+                        valor = 1. if r == 1 else .5
+                        break
+                    proximo = atual.filhos.get(casa)
+                    if proximo is None:
+                        # Expande e guarda a folha para a simulação em lote
+                        proximo = atual.filhos[casa] = self._no(int(INVERTE[filho]))
+                        valor = None
+                        folhas.append((len(caminhos), proximo.istate))
+                        break
+                    atual = proximo
+                caminhos.append(caminho)
+                valores.append(valor)
+            if folhas:
+                r = simula_aleatorio([istate for _, istate in folhas], self.rng)
+                for (k, _), rr in zip(folhas, r.tolist()):
+                    # Resultado da folha é de quem tem a vez nela, o oponente de quem fez o último lance
+                    valores[k] = (1 - rr) / 2
+            for caminho, valor in zip(caminhos, valores):
+                for atual, casa in reversed(caminho):
+                    atual.n[casa] += 1
+                    atual.w[casa] += valor
+                    valor = 1. - valor
+            feitas += lote
+            duracao = time.perf_counter() - inicio
+        return feitas
+
+    def melhor(self):
+        '''
+        Casa mais simulada da raiz (empates decididos pela taxa de vitórias)
+        '''
+        r = self.raiz
+        criterio = np.where(r.legal, r.n + r.w / np.maximum(r.n, 1) / 2, -1)
+        return int(np.argmax(criterio))
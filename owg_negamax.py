@@ -0,0 +1,273 @@
+# Solução exata do jogo: negamax com poda alfa-beta e tabela de transposição, e o jogador perfeito
+
+import os
+
+import numpy as np
+
+from owg_player_base import owg_player
+from owg_simetria import CANONICO, TRANSFORMACAO, PARA_CANONICA
+from owg_tabela import POT, N_CODIGOS, diretorio_cache, grava_cache, le_cache, sstate_para_istate, tabela
+
+# Versão do arquivo de cache da solução; incrementar sempre que o conteúdo mudar
+VERSAO = 1
+
+
+def _inverte():
+    digitos = np.arange(N_CODIGOS)[:, None] // np.array(POT) % 3
+    trocados = np.where(digitos == 2, 2, 1 - digitos)
+    return (trocados @ np.array(POT)).astype(np.int32)
+
+
+# INVERTE[istate]: a mesma posição vista pelo oponente (marcas 0 e 1 trocadas)
+INVERTE = _inverte()
+
+
+def _valor_final(istates):
+    '''
+    Valor das posições finais istates para quem teria a vez: -(1 + casas vazias) se o oponente venceu (uma
+    vitória mais rápida vale mais), 0 no empate
+    '''
+    T = tabela()
+    vazias = np.array([bin(m).count('1') for m in T.legais_mask[istates].tolist()], dtype = np.int64)
+    return T.resultado_array[istates].astype(np.int64) * (1 + vazias)
+
+
+class resolvedor:
+    '''
+    Classe resolvedor: busca negamax com poda alfa-beta e tabela de transposição. Cada nó é uma posição do
+    ponto de vista de quem tem a vez (o jogador 1, como nos jogadores); o filho de um lance é a posição vista
+    pelo oponente (INVERTE). O valor é positivo se quem tem a vez vence com jogo perfeito dos dois lados,
+    negativo se perde e 0 se empata; o módulo é 1 + o número de casas vazias ao final, de modo que o
+    vencedor prefere vencer rápido e o perdedor, perder devagar.
+
+    A tabela de transposição guarda, para cada posição já buscada, o valor e se ele é exato ou um limite
+    inferior ou superior (cortes da poda).
+
+    @args
+
+    simetria -- se True a tabela de transposição é indexada pela posição canônica (owg_simetria): posições
+                equivalentes compartilham a entrada
+    '''
+    EXATO, INFERIOR, SUPERIOR = 0, 1, 2
+
+    def __init__(self, simetria = True):
+        self.simetria = simetria
+        self.tt = dict()
+        self.n_nos = 0
+
+    def valor(self, istate, alfa = -100, beta = 100):
+        '''
+        Valor negamax da posição istate: exato se estiver na janela (alfa, beta); senão, um limite
+        '''
+        T = tabela()
+        self.n_nos += 1
+        if T.resultado_array[istate] != 2:
+            return int(_valor_final(np.array([istate]))[0])
+        chave = int(CANONICO[istate]) if self.simetria else istate
+        entrada = self.tt.get(chave)
+        alfa_inicial = alfa
+        if entrada is not None:
+            v, tipo = entrada
+            if tipo == self.EXATO:
+                return v
+            if tipo == self.INFERIOR:
+                alfa = max(alfa, v)
+            else:
+                beta = min(beta, v)
+            if alfa >= beta:
+                return v
+        melhor = -100
+        for k in self.__ordem(istate):
+            v = -self.valor(int(INVERTE[istate - POT[k]]), -beta, -alfa)
+            if v > melhor:
+                melhor = v
+            if v > alfa:
+                alfa = v
+            if alfa >= beta:
+                break
+        if melhor <= alfa_inicial:
+            tipo = self.SUPERIOR
+        elif melhor >= beta:
+            tipo = self.INFERIOR
+        else:
+            tipo = self.EXATO
+        self.tt[chave] = (melhor, tipo)
+        return melhor
+
+    def __ordem(self, istate):
+        # Primeiro o lance da varredura de um lance à frente (vitória ou bloqueio), que costuma cortar mais
+        T = tabela()
+        acoes = list(T.legais[istate])
+        t = T.tatica[istate]
+        if t is not None:
+            acoes.remove(t)
+            acoes.insert(0, t)
+        return acoes
+
+    def resolve(self):
+        '''
+        Calcula o valor exato de todas as posições de decisão e finais (owg_tabela). Retorna o array
+        (N_CODIGOS) de valores, 0 nas demais posições
+        '''
+        T = tabela()
+        valor = np.zeros(N_CODIGOS, dtype = np.int8)
+        finais = T.istates[T.resultado_array[T.istates] != 2]
+        valor[finais] = _valor_final(finais)
+        for istate in T.decisao_istates.tolist():
+            valor[istate] = self.valor(istate)
+        return valor
+
+
+class tabela_negamax:
+    '''
+    Classe tabela_negamax: a solução do jogo, para consulta
+
+    valor -- array (N_CODIGOS) com o valor negamax de cada posição de decisão ou final (ver resolvedor)
+    lances -- array (n_decisoes, 9) com o valor de cada lance em cada posição de decisão (o valor do filho
+              com o sinal trocado), indexado pelo id da posição de decisão; -128 nas casas ocupadas
+    '''
+    def __init__(self, valor):
+        T = tabela()
+        self.valor = valor
+        ids, casas = np.nonzero(T.decisao_legal)
+        filhos = INVERTE[T.decisao_istates[ids] - np.array(POT)[casas]]
+        self.lances = np.full((T.n_decisoes, 9), -128, dtype = np.int8)
+        self.lances[ids, casas] = -valor[filhos]
+
+    def otimos(self, istate):
+        '''
+        Lista dos lances ótimos (casas) na posição de decisão istate
+        '''
+        linha = self.lances[tabela().decisao_ids[istate]]
+        return np.flatnonzero(linha == linha.max()).tolist()
+
+    def resultado(self, istate):
+        '''
+        Resultado da posição istate com jogo perfeito, do ponto de vista de quem tem a vez: 1, 0 ou -1
+        '''
+        return int(np.sign(self.valor[istate]))
+
+
+def carrega_solucao(arquivo = None, simetria = True):
+    '''
+    Carrega a solução do arquivo de cache; se o arquivo não existir (ou for de outra versão, ou estiver
+    corrompido), resolve o jogo (resolvedor) e tenta gravá-la (ver owg_tabela.grava_cache).
+
+    @args
+
+    arquivo -- caminho do arquivo .npz. Se None, usa negamax_v<VERSAO>.npz em diretorio_cache()
+    simetria -- usada pelo resolvedor, se for preciso resolver
+    '''
+    if arquivo is None:
+        arquivo = os.path.join(diretorio_cache(), 'negamax_v{}.npz'.format(VERSAO))
+    dados = le_cache(arquivo, VERSAO)
+    if dados is not None and 'valor' in dados:
+        valor = dados['valor']
+    else:
+        valor = resolvedor(simetria).resolve()
+        grava_cache(arquivo, versao = np.array(VERSAO), valor = valor)
+    return tabela_negamax(valor)
+
+
+_SOLUCAO = None
+
+def solucao():
+    '''
+    Retorna a solução do jogo do processo, carregando-a na primeira chamada
+    '''
+    global _SOLUCAO
+    if _SOLUCAO is None:
+        _SOLUCAO = carrega_solucao()
+    return _SOLUCAO
+
+
+def qualidade(p, amostras = 1):
+    '''
+    Fração das posições de decisão em que o jogador p escolhe um lance ótimo (com decide_many, sem alterar
+    o jogador). Os jogadores que sorteiam são avaliados amostras vezes em cada posição.
+    '''
+    T = tabela()
+    S = solucao()
+    istates = np.tile(T.decisao_istates, amostras)
+    casas = np.asarray(p.decide_many(istates))
+    lances = S.lances[T.decisao_ids[istates]]
+    return float(np.mean(lances[np.arange(len(casas)), casas] == lances.max(axis = 1)))
+
+
+##############################################################################################
+#    Perfeito - joga sempre um lance ótimo, pela solução exata do jogo (negamax)             #
+##############################################################################################
+class perfeito(owg_player):
+    '''
+    Perfeito: consulta a solução exata do jogo e joga um dos lances ótimos, sorteado entre eles; nunca perde.
+    Não aprende. Serve de oponente para o treino e de referência para a avaliação (ver qualidade).
+    '''
+    def __init__(self, erro = 0., nome = 'Perfeito', seed = None):
+        '''
+        @args
+
+        erro -- probabilidade de jogar um lance sorteado entre todos, em vez de um ótimo (um oponente
+                imperfeito, para o treino)
+        seed -- semente do gerador de números aleatórios do jogador
+        '''
+        self.erro = erro
+        self.nome = nome
+        owg_player.__init__(self, seed)
+
+    def hiperparametros(self):
+        return {'erro' : self.erro}
+
+    def avalia_posicao(self, strpos):
+        '''
+        Valor de cada lance possível (ver resolvedor)
+        '''
+        istate = sstate_para_istate(strpos) if isinstance(strpos, str) else strpos
+        acoes = list(tabela().legais[istate])
+        linha = solucao().lances[tabela().decisao_ids[istate]]
+        return acoes, [int(linha[a]) for a in acoes]
+
+    def _escolhe(self, chave, istate):
+        '''
+        Sorteia um dos lances ótimos (ou, com probabilidade erro, qualquer lance). A solução é consultada
+        no tabuleiro real; com simetria, a casa sorteada é levada para as casas da chave, como as ações de
+        knowledge (ver owg_player._movimento)
+        '''
+        if self.erro > 0 and self.rng.random() < self.erro:
+            acoes = tabela().legais[istate]
+        else:
+            acoes = solucao().otimos(istate)
+        casa = int(acoes[self.rng.integers(len(acoes))])
+        if self.simetria:
+            return int(PARA_CANONICA[TRANSFORMACAO[istate], casa])
+        return casa
+
+
+def confere(jogos = 2000, seed = 0):
+    '''
+    Confere o jogador perfeito jogando (joga, no modo objeto) contra jb e contra si mesmo, com e sem
+    simetria, começando e não começando: ele não pode perder nenhuma partida
+
+    @returns
+
+    dicionário (simetria, oponente) : contagens de train
+    '''
+    from owg_players import jb
+    from owg_treino import train
+    res = dict()
+    for simetria in (False, True):
+        for nome in ('jb', 'perfeito'):
+            p = perfeito(seed = seed)
+            p.usa_simetria(simetria)
+            q = jb(seed = seed + 1) if nome == 'jb' else perfeito(seed = seed + 1)
+            q.usa_simetria(simetria)
+            r = train(p, q, jogos, verbose = False)
+            if r['derrotas'] or (nome == 'perfeito' and r['vitorias']):
+                raise ValueError("Erro! perfeito perdeu (simetria = {}, oponente {}): {}".format(simetria, nome, r))
+            res[(simetria, nome)] = r
+    return res
+
+
+if __name__ == '__main__':
+    for (simetria, nome), r in confere().items():
+        print("simetria {:<5} contra {:<8} V {} E {} D {}".format(str(simetria), nome, r['vitorias'],
+                                                                 r['empates'], r['derrotas']))
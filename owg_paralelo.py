@@ -0,0 +1,123 @@
+# Treinamento em vários processos
+
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from owg_simulador import simulador, conhecimento, devolve_conhecimento
+
+
+def _leve(p):
+    '''
+    Cópia do jogador sem o knowledge, para mandar aos processos: o conhecimento vai separado, em arrays
+    (um knowledge denso vazio seria copiado inteiro, por isso é trocado por um dicionário)
+    '''
+    q = copy.copy(p)
+    q.knowledge = dict()
+    q.jogo = []
+    return q
+
+
+def _shard(p1, p2, densos, n_jogos, lote, seed):
+    '''
+    Executado em cada processo: joga n_jogos partidas a partir do conhecimento mestre densos e retorna
+    apenas o que mudou (deltas), junto com a contagem de resultados do ponto de vista de p1
+    '''
+    sim = simulador(p1, p2, seed)
+    sim.denso = [None if d is None else d.copia() for d in densos]
+    if p2 is p1:
+        sim.denso[1] = sim.denso[0]
+
+    contagem = np.zeros(3, dtype = np.int64)
+    feitos = 0
+    while feitos < n_jogos:
+        n = min(lote, n_jogos - feitos)
+        r = sim.roda(n)
+        contagem += np.bincount(r + 1, minlength = 3)
+        feitos += n
+
+    deltas = [None if d is None else delta(d, original) for d, original in zip(sim.denso, densos)]
+    return deltas, contagem
+
+
+def delta(denso, original):
+    '''
+    Diferença entre dois conhecimentos densos: soma para alfa, beta e rec, e as posições visitadas
+    '''
+    d = {campo : v - original.dados[campo] for campo, v in denso.dados.items()}
+    d['visitado'] = denso.visitado
+    return d
+
+
+def reduz(mestre, deltas):
+    '''
+    Soma os deltas dos processos no conhecimento mestre (in place). Vale para os parâmetros alfa/beta dos
+    cientistas e para as somas de recompensas de epsilon_edson, que são todos contagens aditivas.
+    '''
+    if mestre is None:
+        return mestre
+    for d in deltas:
+        for campo, v in d.items():
+            if campo == 'visitado':
+                mestre.visitado |= v
+            else:
+                mestre.dados[campo] += v
+    return mestre
+
+
+def treina_paralelo(p1, p2, n_jogos, n_processos = None, jogos_por_rodada = 200000, lote = 4096, seed = None):
+    '''
+    Treina p1 contra p2 por n_jogos partidas, dividindo o trabalho entre n_processos processos.
+
+    A cada rodada, cada processo recebe uma cópia do conhecimento mestre, joga sua parte das
+    jogos_por_rodada partidas com o simulador vetorizado e devolve os deltas; os deltas são somados no
+    mestre (ver reduz), que é enviado de novo na rodada seguinte. Ao final o conhecimento é escrito de
+    volta nos jogadores.
+
+    @args
+
+    p1, p2 -- jogadores (p2 pode ser o próprio p1, para self-play com conhecimento compartilhado)
+    n_jogos -- número total de partidas
+    n_processos -- número de processos; se None, usa o número de núcleos
+    jogos_por_rodada -- partidas entre duas sincronizações do conhecimento
+    lote -- partidas simultâneas em cada simulador
+    seed -- semente; cada processo, em cada rodada, recebe uma semente derivada dela
+
+    @returns
+
+    vitorias, empates, derrotas -- contagens do ponto de vista de p1
+    '''
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+
+    mestre = [conhecimento(p1)]
+    mestre.append(mestre[0] if p2 is p1 else conhecimento(p2))
+    l1 = _leve(p1)
+    l2 = l1 if p2 is p1 else _leve(p2)
+    sementes = np.random.SeedSequence(seed)
+    contagem = np.zeros(3, dtype = np.int64)
+
+    with ProcessPoolExecutor(max_workers = n_processos) as executor:
+        feitos = 0
+        while feitos < n_jogos:
+            rodada = min(jogos_por_rodada, n_jogos - feitos)
+            partes = [rodada // n_processos + (1 if i < rodada % n_processos else 0) for i in range(n_processos)]
+            partes = [n for n in partes if n > 0]
+            futuros = [executor.submit(_shard, l1, l2, mestre, n, lote, s)
+                       for n, s in zip(partes, sementes.spawn(len(partes)))]
+            resultados = [f.result() for f in futuros]
+
+            # Em self-play os dois lados atualizam o mesmo conhecimento, e o primeiro delta já inclui os dois
+            reduz(mestre[0], [deltas[0] for deltas, _ in resultados])
+            if p2 is not p1:
+                reduz(mestre[1], [deltas[1] for deltas, _ in resultados])
+            for _, c in resultados:
+                contagem += c
+            feitos += rodada
+
+    devolve_conhecimento(p1, mestre[0])
+    if p2 is not p1:
+        devolve_conhecimento(p2, mestre[1])
+    return int(contagem[2]), int(contagem[1]), int(contagem[0])
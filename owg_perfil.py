@@ -0,0 +1,120 @@
+# Perfil por fase de joga: tempo e número de chamadas de cada etapa do lance, por jogador
+
+import time
+
+# Fases medidas: fase : (objeto, método). 'jogador' é o próprio jogador e 'board' o seu tabuleiro
+FASES = {
+    'resultado' : ('board', 'check_result'),
+    'posicao' : ('jogador', '_posicao'),
+    'inicializa' : ('jogador', '_inicializa'),
+    'tatica' : ('jogador', '_tatica'),
+    'escolhe' : ('jogador', '_escolhe'),
+    'movimento' : ('jogador', '_movimento'),
+    'play' : ('board', 'play'),
+    'aprende' : ('jogador', 'aprende'),
+}
+
+
+class perfil:
+    '''
+    Classe perfil: acumula, para um jogador, o tempo e o número de chamadas de cada fase de joga (FASES). O
+    tempo de cada fase é exclusivo: não inclui o das fases chamadas dentro dela (por exemplo a tática
+    consultada dentro de _escolhe); o que sobra de joga fora das fases fica em 'outros'. Só contam as
+    chamadas feitas dentro de joga (comunica também chama board.play, mas não entra na conta).
+
+    Criado e ligado por owg_player.usa_perfil; os tempos incluem o custo da própria medição.
+    '''
+    def __init__(self):
+        self.zera()
+
+    def zera(self):
+        '''
+        Zera as contagens
+        '''
+        self.segundos = {fase : 0. for fase in list(FASES) + ['outros']}
+        self.chamadas = {fase : 0 for fase in FASES}
+        self.jogadas = 0
+        self.total = 0.
+        self.pilha = []
+
+    def instantaneo(self):
+        '''
+        Retorna as contagens num dicionário (para registrar, por exemplo em JSON, durante o treino):
+        jogadas (chamadas a joga), segundos (tempo total em joga) e, para cada fase, chamadas, segundos,
+        ns por chamada e fracao do tempo total
+        '''
+        fases = dict()
+        for fase, s in self.segundos.items():
+            n = self.chamadas.get(fase, self.jogadas)
+            fases[fase] = {'chamadas' : n, 'segundos' : s, 'ns_por_chamada' : s / n * 1e9 if n else 0.,
+                           'fracao' : s / self.total if self.total else 0.}
+        return {'jogadas' : self.jogadas, 'segundos' : self.total, 'fases' : fases}
+
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        estado['pilha'] = []
+        return estado
+
+
+class cronometro:
+    '''
+    Substitui o método de um objeto (instalado no __dict__ do objeto) e mede suas chamadas no perfil. Guarda
+    a função da classe, e não o método ligado, para que o jogador continue podendo ser gravado com pickle.
+    '''
+    __slots__ = ('perfil', 'fase', 'funcao', 'objeto')
+
+    def __init__(self, perfil, fase, funcao, objeto):
+        self.perfil = perfil
+        self.fase = fase
+        self.funcao = funcao
+        self.objeto = objeto
+
+    def __getstate__(self):
+        return (self.perfil, self.fase, self.funcao, self.objeto)
+
+    def __setstate__(self, estado):
+        self.perfil, self.fase, self.funcao, self.objeto = estado
+
+    def __call__(self, *args, **kwargs):
+        pilha = self.perfil.pilha
+        raiz = self.fase == 'joga'
+        if not pilha and not raiz:
+            # Fora de joga: não mede
+            return self.funcao(self.objeto, *args, **kwargs)
+        pilha.append(0.)
+        t0 = time.perf_counter()
+        try:
+            return self.funcao(self.objeto, *args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            dentro = pilha.pop()
+            p = self.perfil
+            if raiz:
+                p.jogadas += 1
+                p.total += dt
+                p.segundos['outros'] += dt - dentro
+            else:
+                p.chamadas[self.fase] += 1
+                p.segundos[self.fase] += dt - dentro
+            if pilha:
+                pilha[-1] += dt
+
+
+def instala(p, prf):
+    '''
+    Instala os cronometros do perfil prf nos métodos de joga e das fases do jogador p e do seu tabuleiro
+    '''
+    p.__dict__['joga'] = cronometro(prf, 'joga', type(p).joga, p)
+    for fase, (dono, metodo) in FASES.items():
+        objeto = p.board if dono == 'board' else p
+        objeto.__dict__[metodo] = cronometro(prf, fase, getattr(type(objeto), metodo), objeto)
+
+
+def remove(p):
+    '''
+    Remove os cronometros instalados por instala: os métodos voltam a ser os da classe, sem custo nenhum
+    '''
+    p.__dict__.pop('joga', None)
+    for dono, metodo in FASES.values():
+        objeto = p.board if dono == 'board' else p
+        objeto.__dict__.pop(metodo, None)
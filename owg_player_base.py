@@ -1,20 +1,57 @@
 # Classe base para os jogadores
 import numpy as np
-from owg_board import owg
+from owg_board import owg_core
+from owg_conhecimento import conhecimento_denso
+from owg_simetria import CANONICO, TRANSFORMACAO, PARA_CANONICA, PARA_REAL, canonica, imagens
+from owg_tabela import POT, VAZIO, istate_para_sstate, sstate_para_istate, tabela
 
 class owg_player:
     '''
     Classe para representar um jogador genérico. Implementa os métodos em comum.
     Os jogadores específicos com suas estratégias serão classes herdadas desta.
+    
+    O tabuleiro interno é criado a partir de board_class, que pode ser trocado por qualquer classe com a
+    interface de owg_core (por exemplo owg_bitboard).
+    
+    Por padrão as chaves de knowledge são as strings de nove dígitos (sstate). Com chave_inteira = True
+    (ver usa_chave_inteira) as chaves passam a ser os inteiros istate, mantidos pelo tabuleiro a cada
+    movimento sem nenhuma conversão.
+    
+    knowledge pode ainda ser guardado em arrays, num conhecimento_denso (ver usa_conhecimento_denso), que
+    continua sendo acessado como um dicionário.
+    
+    Com simetria = True (ver usa_simetria) as posições equivalentes por rotação ou reflexão do tabuleiro
+    compartilham uma única entrada de knowledge, a da posição canônica (owg_simetria). As ações em knowledge
+    e em jogo ficam nas casas da posição canônica, e são convertidas para o tabuleiro real só na hora de
+    jogar (ver _movimento).
     '''
-    def __init__(self):
+    board_class = owg_core
+    chave_inteira = False
+    simetria = False
+    perfil = None
+    
+    def __init__(self, seed = None):
         # board é um objeto owg
         # knowledge é um dicionário 'posicao' : [probabilidades], que atribui probabilidades a cada movimento na posição posicao
         # jogo é uma lista de pares ordenados (posição, ação) para guardar o histórico dos movimentos
+        # rng é o gerador de números aleatórios do jogador (numpy.random.Generator)
         # O jogador sempre se considera internamente o jogador 1 (é irrelevante se ele é o X ou a O)
         self.knowledge = dict()
-        self.board = owg()
+        self.board = self.board_class()
         self.jogo = []
+        self.rng = np.random.default_rng(seed)
+
+    def __setstate__(self, estado):
+        # Jogadores gravados antes de terem gerador próprio (por exemplo os .pkl pré-treinados) ganham um novo
+        self.__dict__.update(estado)
+        if 'rng' not in estado:
+            self.rng = np.random.default_rng()
+
+    def semeia(self, seed = None):
+        '''
+        Reinicia o gerador de números aleatórios do jogador com a semente seed
+        '''
+        self.rng = np.random.default_rng(seed)
         
     def comunica(self, movimento, verbose = False):
         '''
@@ -32,21 +69,590 @@ class owg_player:
             print("Comunica", movimento, self.board.state)
 
 
-    def __inicializa(self, strpos):
+    def _posicao(self):
         '''
-        Método virtual, para ser sobrescrito pelos jogadores específicos
+        Retorna a chave de knowledge correspondente à posição atual do tabuleiro (a posição canônica,
+        se o jogador usa simetria)
         '''
-        pass
+        istate = self.board.istate
+        if self.simetria:
+            istate = int(CANONICO[istate])
+        elif not self.chave_inteira:
+            return self.board.sstate
+        return self._chave(istate)
     
-    def joga(self, verbose = False):
+    def _chave(self, pos):
+        '''
+        Converte uma posição (string sstate ou inteiro istate) para o formato de chave usado em knowledge
+        '''
+        if self.chave_inteira:
+            if isinstance(pos, str):
+                return sstate_para_istate(pos)
+            return pos
+        if isinstance(pos, str):
+            return pos
+        return istate_para_sstate(pos)
+    
+    def _canonica(self, pos):
+        '''
+        Retorna a chave de knowledge da posição pos (string ou inteiro) e a transformação t que leva o
+        tabuleiro real até ela (t = 0, a identidade, se o jogador não usa simetria)
+        '''
+        if not self.simetria:
+            return self._chave(pos), 0
+        if isinstance(pos, str):
+            pos = sstate_para_istate(pos)
+        c, t = canonica(pos)
+        return self._chave(c), t
+    
+    def _movimento(self, acao):
+        '''
+        Constrói a dupla (linha, coluna) do movimento no tabuleiro real correspondente à ação acao, dada nas
+        casas da chave da posição atual
+        '''
+        if self.simetria:
+            acao = int(PARA_REAL[TRANSFORMACAO[self.board.istate], acao])
+        return (acao // 3, acao % 3)
+    
+    def _acoes_reais(self, acoes, t):
+        '''
+        Converte as ações (casas da chave de knowledge) para as casas do tabuleiro real, dada a
+        transformação t retornada por _canonica
+        '''
+        if not self.simetria:
+            return acoes
+        return [int(PARA_REAL[t, a]) for a in acoes]
+    
+    def _acoes_possiveis(self, pos):
+        '''
+        Retorna a lista das ações possíveis (casas vazias) na posição pos, string ou inteiro
+        '''
+        if isinstance(pos, str):
+            pos = sstate_para_istate(pos)
+        return list(tabela().legais[pos])
+    
+    def _tatica(self, istate = None):
+        '''
+        Retorna a casa que completa uma linha (própria ou do oponente) na posição istate (por padrão a
+        posição atual do tabuleiro), ou None se não houver nenhuma. Ver owg_tabela.tabela_posicoes.tatica.
+        A casa é dada nas casas da chave da posição, como as ações de knowledge.
+        '''
+        if istate is None:
+            istate = self.board.istate
+        acao = tabela().tatica[istate]
+        if acao is not None and self.simetria:
+            acao = int(PARA_CANONICA[TRANSFORMACAO[istate], acao])
+        return acao
+    
+    def usa_chave_inteira(self, inteira = True):
+        '''
+        Passa a indexar knowledge pelos inteiros istate (inteira = True) ou pelas strings sstate
+        (inteira = False), convertendo as chaves já existentes. Serve também para converter os jogadores
+        pré-treinados, salvos com chaves string.
+        '''
+        self.chave_inteira = inteira
+        if isinstance(self.knowledge, conhecimento_denso):
+            # O conhecimento denso é indexado pelo id da posição; só muda o formato das chaves devolvidas
+            self.knowledge.chave_inteira = inteira
+        else:
+            self.knowledge = {self._chave(pos) : v for pos, v in self.knowledge.items()}
+        self.jogo = [(self._chave(pos), acao) for pos, acao in self.jogo]
+
+    def usa_simetria(self, simetria = True):
+        '''
+        Passa a usar (simetria = True) ou deixa de usar (simetria = False) as posições canônicas como chaves
+        de knowledge, convertendo o conhecimento já existente: ao ligar, as entradas das posições equivalentes
+        são somadas na da posição canônica (o que cada uma acumulou acima da priori); ao desligar, a entrada
+        de cada posição canônica é copiada para todas as posições equivalentes. Deve ser chamado entre
+        partidas (ao desligar, o histórico da partida em andamento é descartado).
+        '''
+        if bool(simetria) == bool(self.simetria):
+            return
+        campos = self.campos_conhecimento()
+        antigo = self.knowledge
+        jogo = [(sstate_para_istate(pos) if isinstance(pos, str) else pos, acao) for pos, acao in self.jogo]
+        self.simetria = simetria
+        if isinstance(antigo, conhecimento_denso):
+            self.knowledge = conhecimento_denso(antigo.priores, self.chave_inteira)
+        else:
+            self.knowledge = dict()
+
+        if simetria:
+            self.jogo = [(self._chave(int(CANONICO[pos])), int(PARA_CANONICA[TRANSFORMACAO[pos], acao]))
+                         for pos, acao in jogo]
+        else:
+            # A posição real de cada lance não fica guardada em jogo: a partida em andamento é descartada
+            self.jogo = []
+        if campos is None:
+            # Sem conhecimento aprendido: as entradas são recriadas quando necessário
+            return
+
+        for pos, valor in antigo.items():
+            istate = sstate_para_istate(pos) if isinstance(pos, str) else pos
+            if simetria:
+                destinos = [canonica(istate)]
+            else:
+                destinos = [(r, int(TRANSFORMACAO[r])) for r in imagens(istate)]
+            for destino, t in destinos:
+                chave = self._chave(destino)
+                if simetria:
+                    acoes = [int(PARA_CANONICA[t, a]) for a in valor[0]]
+                else:
+                    acoes = [int(PARA_REAL[t, a]) for a in valor[0]]
+                atual = self._entrada(chave)
+                for lista, v, p in zip(atual[1:], valor[1:], campos.values()):
+                    for a, x in zip(acoes, v):
+                        if simetria:
+                            lista[atual[0].index(a)] += x - p
+                        else:
+                            lista[atual[0].index(a)] = x
+                self.knowledge[chave] = atual
+
+    def usa_perfil(self, ligado = True):
+        '''
+        Liga (ligado = True) ou desliga o perfil por fase de joga (owg_perfil): com ele ligado, self.perfil
+        acumula o tempo e o número de chamadas de cada fase (verificação do resultado, chave da posição,
+        inicialização, tática, escolha, movimento, play e aprendizagem), e self.perfil.instantaneo() retorna
+        as contagens. Desligado, os métodos do jogador são os da classe, sem custo nenhum.
+
+        @returns
+
+        o perfil (None se desligado)
+        '''
+        import owg_perfil
+        owg_perfil.remove(self)
+        if ligado:
+            if self.perfil is None:
+                self.perfil = owg_perfil.perfil()
+            owg_perfil.instala(self, self.perfil)
+        else:
+            self.__dict__.pop('perfil', None)
+        return self.perfil
+
+    def metricas(self):
+        '''
+        Contadores do knowledge do jogador: posições, cobertura, posições e visitas pelo número do lance e
+        memória (ver owg_telemetria.metricas_jogador)
+        '''
+        from owg_telemetria import metricas_jogador
+        return metricas_jogador(self)
+
+    def hiperparametros(self):
+        '''
+        Retorna o dicionário dos parâmetros do construtor que definem o jogador (além de nome e seed), como
+        gravado por owg_arquivo.salva_jogador
+        '''
+        return {}
+
+    def campos_conhecimento(self):
+        '''
+        Retorna o dicionário campo : priori dos parâmetros guardados em knowledge, na ordem em que aparecem
+        nas tuplas (depois da lista de ações), ou None se o jogador não aprende
+        '''
+        return None
+
+    def usa_conhecimento_denso(self, denso = True):
+        '''
+        Passa a guardar knowledge num conhecimento_denso (arrays (n_decisoes, 9), ver owg_conhecimento), com
+        denso = True, ou de volta num dicionário comum, com denso = False. O conteúdo é convertido.
+        '''
+        if denso:
+            campos = self.campos_conhecimento()
+            if campos is None:
+                raise ValueError("Erro! {} não tem conhecimento para guardar".format(type(self).__name__))
+            if not isinstance(self.knowledge, conhecimento_denso):
+                self.knowledge = conhecimento_denso.de_dict(self.knowledge, campos, self.chave_inteira)
+        elif isinstance(self.knowledge, conhecimento_denso):
+            self.knowledge = self.knowledge.para_dict()
+
+    def amostra_beta(self, posicoes):
+        '''
+        Sorteia, com uma única chamada ao gerador, as probabilidades de sucesso de todas as ações em várias
+        posições de uma vez (Thompson sampling em lote), a partir dos parâmetros alfa e beta de knowledge. As
+        posições que o jogador nunca viu usam a priori.
+
+        @args
+
+        posicoes -- lista de chaves de knowledge (strings ou inteiros, já canônicas se o jogador usa simetria)
+
+        @returns
+
+        array (len(posicoes), 9) com as probabilidades sorteadas, e -inf nas casas ocupadas
+        '''
+        campos = self.campos_conhecimento()
+        if campos is None or 'alfa' not in campos:
+            raise ValueError("Erro! {} não usa o modelo Beta".format(type(self).__name__))
+        T = tabela()
+        istates = np.array([sstate_para_istate(p) if isinstance(p, str) else p for p in posicoes], dtype = np.int64)
+        if isinstance(self.knowledge, conhecimento_denso):
+            ids = T.decisao_ids[istates]
+            alfa = self.knowledge.valores('alfa', ids)
+            beta = self.knowledge.valores('beta', ids)
+        else:
+            alfa = np.full((len(posicoes), 9), campos['alfa'], dtype = np.float64)
+            beta = np.full((len(posicoes), 9), campos['beta'], dtype = np.float64)
+            for n, pos in enumerate(posicoes):
+                if pos in self.knowledge:
+                    acoes, al, be = self.knowledge[pos]
+                    alfa[n, acoes] = al
+                    beta[n, acoes] = be
+        probs = self.rng.beta(alfa, beta)
+        legal = (T.legais_mask[istates][:, None] >> np.arange(9)) & 1 == 1
+        probs[~legal] = -np.inf
+        return probs
+
+    def _credito(self, r):
+        '''
+        Regra de aprendizagem: retorna a lista de pares (campo, sinal) a somar, em cada lance da partida,
+        quando ela termina com o resultado r (do ponto de vista do jogador). Por padrão o jogador não aprende.
+        '''
+        return []
+
+    def _potencias_desconto(self, lista = False):
+        '''
+        Vetor p com p[k] = desconto**k, calculado uma única vez: numa partida de n lances o i-ésimo lance
+        (i = 0, ..., n - 1) recebe o peso p[n - i]. Jogadores sem desconto usam desconto = 1. Com lista = True,
+        os mesmos valores numa lista (para os laços em Python)
+        '''
+        desconto = getattr(self, 'desconto', 1)
+        cache = self.__dict__.get('_potencias')
+        if cache is None or len(cache) < 3 or cache[0] != desconto:
+            potencias = np.power(desconto, np.arange(10))
+            cache = (desconto, potencias, potencias.tolist())
+            self._potencias = cache
+        return cache[2] if lista else cache[1]
+
+    def aprende(self, jogo, r):
+        '''
+        Aplica a regra de aprendizagem (_credito) aos lances de jogo, uma lista de pares (posição, ação) como
+        self.jogo, para uma partida terminada com resultado r. Não faz nada se knowledge é somente para
+        leitura (por exemplo, mapeado em memória)
+        '''
+        regra = self._credito(r)
+        if not regra or not jogo:
+            return
+        knowledge = self.knowledge
+        if type(knowledge) is dict:
+            # Dicionário: soma direto em cada entrada, sem montar as listas de _soma (uma partida tem poucos
+            # lances, e este é o caminho de joga). Como em _soma, as posições alteradas vão para _alterou
+            indices = self.__dict__.get('_indices_campos')
+            if indices is None:
+                # Posição de cada campo nas tuplas de knowledge, calculada uma única vez
+                indices = self._indices_campos = {c : 1 + k for k, c in enumerate(self.campos_conhecimento())}
+            if getattr(self, 'desconto', 1) == 1:
+                for campo, sinal in regra:
+                    k = indices[campo]
+                    for pos, acao in jogo:
+                        entrada = knowledge.get(pos)
+                        if entrada is None:
+                            # Posição decidida por decide, que não grava em knowledge
+                            entrada = knowledge[pos] = self._priori(pos)
+                        entrada[k][entrada[0].index(acao)] += sinal
+                self._alterou([pos for pos, _ in jogo])
+                return
+            pesos = self._potencias_desconto(lista = True)[len(jogo):0:-1]
+            for campo, sinal in regra:
+                k = indices[campo]
+                for (pos, acao), p in zip(jogo, pesos):
+                    entrada = knowledge.get(pos)
+                    if entrada is None:
+                        entrada = knowledge[pos] = self._priori(pos)
+                    entrada[k][entrada[0].index(acao)] += sinal * p
+            self._alterou([pos for pos, _ in jogo])
+            return
+        if getattr(knowledge, 'somente_leitura', False):
+            return
+        pesos = self._potencias_desconto()[len(jogo):0:-1].tolist()
+        posicoes = [pos for pos, _ in jogo]
+        acoes = [acao for _, acao in jogo]
+        for campo, sinal in regra:
+            self._soma(campo, posicoes, acoes, [sinal * p for p in pesos])
+
+    def aprende_lote(self, jogos, resultados):
+        '''
+        Aplica a regra de aprendizagem a um lote de partidas terminadas. Os créditos de todas as partidas são
+        juntados e somados de uma vez em knowledge, por campo (no conhecimento denso, com uma única soma
+        indexada por posição e ação).
+
+        @args
+
+        jogos -- lista de trajetórias, cada uma uma lista de pares (posição, ação) como self.jogo
+        resultados -- resultado de cada partida do ponto de vista do jogador (1, 0 ou -1)
+        '''
+        campos = self.campos_conhecimento()
+        if campos is None or getattr(self.knowledge, 'somente_leitura', False):
+            return
+        potencias = self._potencias_desconto()
+        creditos = {c : ([], [], []) for c in campos}
+        for jogo, r in zip(jogos, resultados):
+            regra = self._credito(r)
+            if not regra or not jogo:
+                continue
+            pesos = potencias[len(jogo):0:-1].tolist()
+            for campo, sinal in regra:
+                posicoes, acoes, valores = creditos[campo]
+                posicoes.extend(pos for pos, _ in jogo)
+                acoes.extend(acao for _, acao in jogo)
+                valores.extend(sinal * p for p in pesos)
+        for campo, (posicoes, acoes, valores) in creditos.items():
+            if posicoes:
+                self._soma(campo, posicoes, acoes, valores)
+
+    def _soma(self, campo, posicoes, acoes, valores):
+        '''
+        Soma valores no campo de knowledge, nas entradas (posição, ação), e avisa _alterou
+        '''
+        if isinstance(self.knowledge, conhecimento_denso):
+            self.knowledge.soma(campo, self.knowledge.ids(posicoes), acoes, valores)
+        else:
+            k = 1 + list(self.campos_conhecimento()).index(campo)
+            for pos, acao, v in zip(posicoes, acoes, valores):
+                entrada = self.knowledge.get(pos)
+                if entrada is None:
+                    # Posição decidida por decide, que não grava em knowledge
+                    entrada = self.knowledge[pos] = self._priori(pos)
+                entrada[k][entrada[0].index(acao)] += v
+        self._alterou(posicoes)
+
+    def _alterou(self, posicoes):
+        '''
+        Chamado depois de toda alteração de knowledge pela aprendizagem (_soma, e a soma direta de aprende no
+        dicionário), com as chaves das posições alteradas. Método virtual, para os jogadores que guardam
+        valores calculados a partir de knowledge (por exemplo cientista_previdente)
+        '''
+        pass
+
+    def congela(self, amostras = 256, seed = None, amostras_busca = 1):
+        '''
+        Compila a política atual do jogador numa tabela e retorna o jogador congelado correspondente, que
+        joga com uma consulta à tabela por lance e não aprende (ver owg_congelado.congela)
+        '''
+        from owg_congelado import congela
+        return congela(self, amostras, seed, amostras_busca)
+
+    def _priori(self, pos):
+        '''
+        Retorna a entrada de knowledge de uma posição nunca vista: a tupla (acoes, campo1, campo2, ...) com a
+        priori de cada campo (ver campos_conhecimento), ou (acoes, probabilidades uniformes) para os
+        jogadores que não aprendem
+        '''
+        acoes = self._acoes_possiveis(pos)
+        campos = self.campos_conhecimento()
+        if campos is None:
+            return (acoes, [1/len(acoes)] * len(acoes))
+        return tuple([acoes] + [[p] * len(acoes) for p in campos.values()])
+
+    def _inicializa(self, strpos):
+        '''
+        Cria a entrada de knowledge da posição strpos com a priori (ver _priori).
+        
+        @args
+        
+        strpos -- uma string que representa a posição atual. A string tem nove posições, cada uma
+                    correspondendo a uma célula do tabuleiro (da esquerda pra direita, de cima pra baixo).
+                    '0' significa posição marcada pelo oponente, '1' significa posição marcada pelo próprio
+                    jogador, e '2' significa posição vazia.
+        '''
+        self.knowledge[strpos] = self._priori(strpos)
+
+    def _entrada(self, chave):
+        '''
+        Retorna a entrada de knowledge da posição chave, ou a priori se o jogador nunca a viu (sem gravá-la)
+        '''
+        entrada = self.knowledge.get(chave)
+        if entrada is None:
+            return self._priori(chave)
+        return entrada
+
+    def _escolhe(self, chave, istate):
         '''
-        Método virtual, para ser sobrescrito pelos jogadores específicos
+        Regra de decisão: retorna a ação (nas casas da chave de knowledge) a jogar na posição istate do
+        tabuleiro real, cuja chave é chave. Só lê knowledge (ver _entrada). Método virtual, para ser
+        sobrescrito pelos jogadores específicos
         '''
         pass
+
+    def _decide(self, posicao):
+        '''
+        Como decide, mas retorna (chave, acao, casa): a chave de knowledge da posição, a ação nas casas da
+        chave (o par (chave, acao) é o que vai para a trajetória) e a casa correspondente no tabuleiro real
+        '''
+        istate = sstate_para_istate(posicao) if isinstance(posicao, str) else int(posicao)
+        chave, t = self._canonica(istate)
+        acao = self._escolhe(chave, istate)
+        return chave, acao, int(PARA_REAL[t, acao])
+
+    def decide(self, posicao):
+        '''
+        Decide o lance na posição posicao sem usar nem alterar o estado de partida do jogador (board e
+        jogo) e sem gravar nada em knowledge: as posições nunca vistas usam a priori. Só o gerador de
+        números aleatórios avança. Um único jogador pode assim decidir por várias partidas ao mesmo tempo,
+        cada uma com sua sessao (ver nova_sessao), e aprender quando quiser com aprende(trajetoria, r).
+
+        @args
+
+        posicao -- posição do ponto de vista do jogador, que é sempre o '1' (string sstate ou inteiro istate)
+
+        @returns
+
+        a casa a jogar no tabuleiro real (3 * linha + coluna)
+        '''
+        return self._decide(posicao)[2]
+
+    def decide_many(self, posicoes):
+        '''
+        Versão em lote de decide: decide o lance em várias posições de uma vez, com as mesmas regras
+        aplicadas de forma vetorizada (owg_simulador.decide_lote): uma consulta a knowledge e um sorteio
+        para o lote inteiro. Também não altera o estado do jogador.
+
+        @args
+
+        posicoes -- lista de posições (strings ou inteiros) do ponto de vista do jogador, todas com a
+                    partida em andamento
+
+        @returns
+
+        array com a casa a jogar em cada posição
+        '''
+        from owg_simulador import decide_lote
+        istates = np.array([sstate_para_istate(p) if isinstance(p, str) else p for p in posicoes], dtype = np.int64)
+        _, _, casas = decide_lote(self, self._conhecimento_lote(istates), self.rng, istates)
+        return casas
+
+    def _conhecimento_lote(self, istates):
+        '''
+        Conhecimento denso para decide_many: o próprio knowledge, se já é um conhecimento_denso; senão um
+        conhecimento_denso só com as entradas das posições istates (a cópia não percorre knowledge inteiro)
+        '''
+        campos = self.campos_conhecimento()
+        if campos is None:
+            return None
+        if isinstance(self.knowledge, conhecimento_denso):
+            return self.knowledge
+        store = conhecimento_denso(campos, self.chave_inteira)
+        for istate in set(istates.tolist()):
+            chave = self._canonica(istate)[0]
+            entrada = self.knowledge.get(chave)
+            if entrada is not None:
+                store[chave] = entrada
+        return store
+
+    def nova_sessao(self):
+        '''
+        Retorna uma nova sessao (partida) deste jogador, a partir do tabuleiro vazio
+        '''
+        return sessao(self)
+
+    def joga(self, verbose = False):
+        '''
+        Dada a posição atual do tabuleiro, decide a ação (ver _escolhe) e joga. Aprende com o resultado
+        quando a partida termina.
+        '''
+        
+        # Primeiro verifica se jogo está rolando
+        r, _ = self.board.check_result()
+        if r is None:
+            # Está rolando
+            
+            # Recupera a chave (string ou inteiro) que representa a posição atual
+            strpos = self._posicao()
+            if verbose:
+                print(strpos)
+            if strpos not in self.knowledge.keys():
+                # Nunca viu essa posição
+                self._inicializa(strpos)
+
+            # Decide a ação, nas casas da chave
+            acao = self._escolhe(strpos, self.board.istate)
+
+            # Constrói a dupla que representa o movimento
+            movimento = self._movimento(acao)
+
+            # Joga e armazena
+            self.board.play(1, movimento)
+            self.jogo.append((strpos, acao))
+            
+            # Verifica se o jogo terminou com este lance; se terminou, aprende com o resultado
+            r, _ = self.board.check_result()
+            if r is not None:
+                self.aprende(self.jogo, r)
+
+            return movimento
+        else:
+            # O jogo terminou no lance do oponente: aprende com o resultado (uma vitória já foi registrada no
+            # lance que a produziu)
+            if r != 1:
+                self.aprende(self.jogo, r)
+            return None
     
     def reset(self):
         '''
         Reseta o estado do jogo atual
         '''
         self.board.reset()
-        self.jogo = []        
\ No newline at end of file
+        self.jogo = []
+
+
+class sessao:
+    '''
+    Classe sessao: estado de uma partida de um jogador que pode estar em várias partidas ao mesmo tempo.
+    Guarda só a posição (istate, do ponto de vista do jogador) e a trajetória jogo, com os mesmos pares
+    (posição, ação) de owg_player.jogo; as decisões vêm de jogador.decide, sem tocar board, jogo ou
+    knowledge do jogador. A aprendizagem é explícita: ao final, aprende() (ou jogador.aprende(s.jogo, r)).
+
+    @args
+
+    jogador -- o jogador (compartilhado entre as sessões)
+    istate -- posição inicial (por padrão o tabuleiro vazio)
+    '''
+    __slots__ = ('jogador', 'istate', 'jogo')
+
+    def __init__(self, jogador, istate = VAZIO):
+        self.jogador = jogador
+        self.istate = istate
+        self.jogo = []
+
+    def comunica(self, movimento):
+        '''
+        Registra o movimento (i, j) do oponente
+        '''
+        self.istate -= 2 * POT[self.__casa(movimento)]
+
+    def joga(self):
+        '''
+        Decide e registra o lance do jogador. Retorna o movimento (i, j), ou None se a partida já terminou
+        '''
+        if self.resultado() is not None:
+            return None
+        return self.registra(*self.jogador._decide(self.istate))
+
+    def registra(self, chave, acao, casa):
+        '''
+        Registra um lance do jogador decidido fora da sessão (por exemplo em lote, com decide_many): chave e
+        acao vão para a trajetória, casa é a casa jogada no tabuleiro real. Retorna o movimento (i, j)
+        '''
+        self.jogo.append((chave, acao))
+        self.istate -= POT[casa]
+        return (casa // 3, casa % 3)
+
+    def resultado(self):
+        '''
+        Resultado da partida do ponto de vista do jogador (1, 0 ou -1), ou None se ela está em andamento
+        '''
+        return tabela().resultado[self.istate][0]
+
+    def aprende(self):
+        '''
+        Aplica a regra de aprendizagem do jogador à trajetória da partida, que precisa ter terminado
+        '''
+        r = self.resultado()
+        if r is None:
+            raise ValueError("Erro! a partida ainda não terminou")
+        self.jogador.aprende(self.jogo, r)
+
+    def __casa(self, movimento):
+        i, j = movimento
+        k = 3 * i + j
+        if self.istate // POT[k] % 3 != 2:
+            raise ValueError("Erro! a casa {} já está ocupada".format(movimento))
+        return k
@@ -2,7 +2,11 @@
 import numpy as np
 
 from owg_board import owg
+from owg_mcts import arvore
+from owg_negamax import INVERTE
 from owg_player_base import owg_player
+from owg_simetria import CANONICO, TRANSFORMACAO, PARA_CANONICA, PARA_REAL
+from owg_tabela import POT, sstate_para_istate, tabela
 
 ##################################################################
 #    João Bobo - age aleatoriamente e não aprende com os erros   #
@@ -12,76 +16,32 @@ class jb (owg_player) :
     Classe jb: é o jogador que não aprende; decide cada movimento aleatoriamente para sempre
     '''
     
-    def __init__(self, nome = 'JB'):
+    def __init__(self, nome = 'JB', seed = None):
         self.nome = nome
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
         
-    def __inicializa(self, strpos):
-        '''
-        Cria o vetor de probabilidade uniforme para as ações possíveis a partir da posição strpos.
-        
-        @args
-        
-        strpos -- uma string que representa a posição atual. A string tem nove posições, cada uma
-                    correspondendo a uma célula do tabuleiro (da esquerda pra direita, de cima pra baixo).
-                    '0' significa posição marcada pelo oponente, '1' significa posição marcada pelo próprio
-                    jogador, e '2' significa posição vazia.
-        '''
-        # Cria o vetor de probabilidade uniforme para a dada posição
-        
-        # As ações possíveis são os quadrados vazios
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        
-        # Cria as probabilidades da uniforme
-        probs = [1/len(acoes)] * len(acoes)
-        self.knowledge[strpos] = (acoes, probs)
-    
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, rew = self.knowledge[strpos]    
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
     
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. 
+        Sorteia uma ação com as probabilidades (uniformes) da posição
         '''
+        # Obtém as ações possiveis e suas respectivas probabilidades de sucesso
+        acoes, probs = self._entrada(chave)
         
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            
-            # Recupera string que representa o estado atual
-            strpos = self.board.sstate
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                self.__inicializa(strpos)
-            # Obtém as ações possiveis e suas respectivas probabilidades de sucesso
-            acoes, probs = self.knowledge[strpos]
-            
-            # Sorteia uma ação
-            acao = np.random.choice(a = acoes, p = probs)
-            
-            # Constrói a dupla que representa o movimento
-            movimento = (int(acao / 3), acao % 3)
-            
-            # Joga e armazena o movimento
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            return movimento
-        else:
-            return None  
+        # Sorteia uma ação
+        return self.rng.choice(acoes, p = probs)
 
 
-        
 ########################################################################
 #    Míope - considera se o próximo movimento vai levar ao fim do jogo #
 ########################################################################
@@ -89,112 +49,39 @@ class miope(owg_player):
     ''' 
     Miope: olha se existe algum movimento vencedor na posição atual. Se tiver, joga. Caso contrário, sorteia aleatoriamente
     '''
-    def __init__(self, nome = 'Míope'):
+    def __init__(self, nome = 'Míope', seed = None):
 
         self.nome = nome
-        owg_player.__init__(self)
-        
-    def __inicializa(self, strpos):
-        '''
-        Cria o vetor de probabilidade uniforme para as ações possíveis a partir da posição strpos.
-        
-        @args
+        owg_player.__init__(self, seed)
         
-        strpos -- uma string que representa a posição atual. A string tem nove posições, cada uma
-                    correspondendo a uma célula do tabuleiro (da esquerda pra direita, de cima pra baixo).
-                    '0' significa posição marcada pelo oponente, '1' significa posição marcada pelo próprio
-                    jogador, e '2' significa posição vazia.
-        '''
-        # Cria o vetor de probabilidade uniforme para a dada posição
-        
-        # As ações possíveis são os quadrados vazios
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        
-        # Cria as probabilidades da uniforme
-        probs = [1/len(acoes)] * len(acoes)
-        self.knowledge[strpos] = (acoes, probs)
-    
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, rew = self.knowledge[strpos]    
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. 
+        Joga a ação que completa uma linha, se houver; caso contrário sorteia uma ação
         '''
-        
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            
-            # Recupera string que representa o estado atual
-            strpos = self.board.sstate
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                self.__inicializa(strpos)
-                
-            # Verifica se há alguma ação vencedora para si ou para o oponente
-            mov = None
-            for i in range(3):
-                # Verifica linhas 
-                linha = strpos[(3*i):((3*i+3))]
-                if linha in ['121', '020', '112', '002', '211', '200']:
-                    j = linha.find('2')
-                    mov = (i, j)
-                    winner = linha[abs(j-1)]
-                    break
-                # Verifica colunas
-                coluna = strpos[i:i+7:3]
-                if coluna in ['121', '020', '112', '002', '211', '200']:
-                    j = coluna.find('2')
-                    mov = (j, i)
-                    winner = coluna[abs(j-1)]
-                    break
-            # Verifica diagonais
-            diagp = strpos[0:9:4]
-            if diagp in ['121', '020', '112', '002', '211', '200']:
-                j = diagp.find('2')
-                mov = (j, j)
-                winner = diagp[abs(j-1)]
-            diags = strpos[2:7:2]
-            if diags in ['121', '020', '112', '002', '211', '200']:
-                j = diags.find('2')
-                mov = (j, 2-j)
-                winner = diags[abs(j-1)]
-            
-            if mov is not None:
-                # Existe um movimento vencedor nessa posição. Joga esse movimento.
-                movimento = mov
-                acao = 3*mov[0] + mov[1]
-            else:                
+        # Verifica se há alguma ação vencedora para si ou para o oponente (consulta a tabela de posições)
+        acao = self._tatica(istate)
+        if acao is not None:
+            # Existe um movimento vencedor nessa posição. Joga esse movimento.
+            return acao
 
-                # Obtém as ações possiveis e suas respectivas probabilidades de sucesso
-                acoes, probs = self.knowledge[strpos]
+        # Obtém as ações possiveis e suas respectivas probabilidades de sucesso
+        acoes, probs = self._entrada(chave)
+
+        # Sorteia uma ação
+        return self.rng.choice(acoes, p = probs)
 
-                # Sorteia uma ação
-                acao = np.random.choice(a = acoes, p = probs)
 
-                # Constrói a dupla que representa o movimento
-                movimento = (int(acao / 3), acao % 3)
-            
-            # Joga e armazena o movimento
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            return movimento
-        else:
-            return None  
-    
-        
 ##############################################################################################
 #    epsilon_edson - implementa a estratégia \epsilon-greedy: joga o movimento que parece    #
 #              ótimo com probabilidade 1 - \epsilon, e joga aleatoriamente com probabilidade #
@@ -204,106 +91,60 @@ class epsilon_edson(owg_player):
     ''' 
     epsilon_edson - implementa a estratégia \epsilon-greedy
     '''
-    def __init__(self, desconto = 1, epsilon = .1, nome = 'Epsilon Edson'):
+    def __init__(self, desconto = 1, epsilon = .1, nome = 'Epsilon Edson', seed = None):
         '''
         @args
         
         desconto -- fator de desconto para a recompensa
         epsilon -- probabilidade de realizar um movimento exploratório
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         self.e = epsilon
         self.nome = nome
         self.desconto = desconto
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
+        
+    def hiperparametros(self):
+        return {'desconto' : self.desconto, 'epsilon' : self.e}
+        
+    def campos_conhecimento(self):
+        return {'rec' : 0.}
+        
+    def _credito(self, r):
+        # Recompensa +1 na vitória e -1 na derrota, descontada (ver _potencias_desconto)
+        if r == 1:
+            return [('rec', 1)]
+        if r == -1:
+            return [('rec', -1)]
+        return []
         
-    def __inicializa(self, strpos):
-        ''' 
-        Cria o vetor de recompensa para a dada posição
-        '''
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        rec = [0] * len(acoes)
-        self.knowledge[strpos] = (acoes, rec)
-
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes,rew = self.knowledge[strpos]    
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado.
+        Com probabilidade epsilon explora (sorteia uma ação); caso contrário joga a de máxima recompensa estimada
         '''
+        # Recupera as ações possíveis e as recompensas estimadas
+        acoes, rec = self._entrada(chave)
         
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            
-            # Recupera a string que representa a posição atual
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                self.__inicializa(strpos)
-
-            # Recupera as ações possíveis e as recompensas estimadas
-            acoes, rec = self.knowledge[strpos]
-            
-            # Decide se vai explorar ou exploitar
-            u = np.random.uniform()
-            if u < self.e:
-                # Explora: sorteia ação uniformemente
-                acao = np.random.choice(a = acoes)
-            else:
-                # Exploita: ação com máxima recompensa estimada
-                acao = acoes[np.argmax(rec)]
-            
-            # Constrói a dupla que define a ação
-            movimento = (int(acao / 3), acao % 3)
+        # Decide se vai explorar ou exploitar
+        u = self.rng.random()
+        if u < self.e:
+            # Explora: sorteia ação uniformemente
+            return self.rng.choice(acoes)
+        # Exploita: ação com máxima recompensa estimada
+        return acoes[np.argmax(rec)]
+
 
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                if r == 1:
-                    # Ganhei!
-                    # Distribui as recompensas, i.e., soma 1 aos alfas correspondentes a cada movimento
-                    # utilizado na partida
-                    n = len(self.jogo)
-                    for i in range(n):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, r = self.knowledge[pos]
-                        r[a.index(acao)] += 1*self.desconto**(n-i)
-                        self.knowledge[pos] = (a, r)
-
-            return movimento
-        else:
-            if r == -1:
-                # Perdi :-/
-                # Distribui os castigos, i.e., soma 1 aos betas correspondentes a cada movimento
-                # utilizado na partida
-                n = len(self.jogo)
-                for i in range(n):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, r = self.knowledge[pos]
-                    r[a.index(acao)] -= 1*self.desconto**(n-i)
-                    self.knowledge[pos] = (a, r)
-                    
-            return None    
-                      
-        
 #############################################################################################
 #    Cientista sovina - usa o modelo probabilístico mas é ganancioso para escolher a ação   #
 #############################################################################################
@@ -312,100 +153,56 @@ class cientista_sovina(owg_player):
     Cientista sovina: usa o modelo probabilístico para aprender e atualizar as probabilidades, mas 
     é ganacioso na hora de decidir a ação (sempre escolhe a que tem maior probabilidade esperada de sucesso)
     '''
-    def __init__(self, a = 1, b = 1, nome = 'Cientista sovina'):
+    def __init__(self, a = 1, b = 1, nome = 'Cientista sovina', seed = None):
         '''
         @args
         
         a, b -- hiperparâmetros iniciais da priori Beta
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         self.a = a
         self.b = b
         self.nome = nome
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b}
+        
+    def campos_conhecimento(self):
+        return {'alfa' : self.a, 'beta' : self.b}
+        
+    def _credito(self, r):
+        # Soma 1 no alfa de cada lance da partida na vitória, e no beta na derrota
+        if r == 1:
+            return [('alfa', 1)]
+        if r == -1:
+            return [('beta', 1)]
+        return []
         
-    def __inicializa(self, strpos):
-        ''' 
-        Cria o vetor de probabilidade uniforme para a dada posição
-        '''
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        alfa = [self.a] * len(acoes)
-        beta = [self.b] * len(acoes)
-        self.knowledge[strpos] = (acoes, alfa, beta)
-
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, alfa, beta = self.knowledge[strpos]    
         rew = [a/(a+b) for a, b in zip(alfa,beta)]
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado.
+        Escolhe a ação com maior probabilidade esperada de sucesso
         '''
+        # Recupera as ações possíveis e seus respectivos parâmetros
+        acoes, alfa, beta = self._entrada(chave)
         
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            
-            # Recupera a string que representa a posição atual
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                self.__inicializa(strpos)
-
-            # Recupera as ações possíveis e seus respectivos parâmetros
-            acoes, alfa, beta = self.knowledge[strpos]
-            
-            # Calcula a probabilidade esperada de sucesso para cada posição
-            probs = [param[0] / (param[0] + param[1]) for param in zip(alfa, beta)]
-            # Escolhe a ação com maior prob esperada de sucesso
-            acao = acoes[np.argmax(probs)]
-            
-            # Constrói a dupla que define a ação
-            movimento = (int(acao / 3), acao % 3)
+        # Calcula a probabilidade esperada de sucesso para cada posição
+        probs = [param[0] / (param[0] + param[1]) for param in zip(alfa, beta)]
+        # Escolhe a ação com maior prob esperada de sucesso
+        return acoes[np.argmax(probs)]
 
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                if r == 1:
-                    # Ganhei!
-                    # Distribui as recompensas, i.e., soma 1 aos alfas correspondentes a cada movimento
-                    # utilizado na partida
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        al[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)
-
-            return movimento
-        else:
-            if r == -1:
-                # Perdi :-/
-                # Distribui os castigos, i.e., soma 1 aos betas correspondentes a cada movimento
-                # utilizado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    be[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)
-                    
-            return None    
-        
 
 ############################################################################################
 #    Cientista        - usa o modelo probabilístico e equilibra exploração e exploitação   #
@@ -416,108 +213,60 @@ class cientista(owg_player):
         e atualizar as probabilidades.
         Sorteia a ação, conforme probabilidades de sucesso, para equilibrar exploration e exploitation.
     '''
-    def __init__(self, a = 1, b = 1, nome = 'Cientista'):
+    def __init__(self, a = 1, b = 1, nome = 'Cientista', seed = None):
         '''
         @args 
         
         a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         
         self.a = a
         self.b = b
         self.nome = nome
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b}
+        
+    def campos_conhecimento(self):
+        return {'alfa' : self.a, 'beta' : self.b}
+        
+    def _credito(self, r):
+        # Soma 1 no alfa de cada lance da partida na vitória, e no beta na derrota
+        if r == 1:
+            return [('alfa', 1)]
+        if r == -1:
+            return [('beta', 1)]
+        return []
         
-    def __inicializa(self, strpos):
-        '''
-        Cria o vetor de probabilidade uniforme para a dada posição, e cria a lista de alfas e betas
-        ''' 
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        alfa = [self.a] * len(acoes)
-        beta = [self.b] * len(acoes)
-        self.knowledge[strpos] = (acoes, alfa, beta)
-
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, alfa, beta = self.knowledge[strpos]    
         rew = [a/(a+b) for a, b in zip(alfa,beta)]
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado
+        Thompson sampling: sorteia as probabilidades de sucesso e escolhe a ação com o maior valor sorteado
         '''
-
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            # Recupera a string que representa a posição
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                # Inicializa da prior
-                self.__inicializa(strpos)
-
-            # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
-            acoes, alfa, beta = self.knowledge[strpos]
-            
-            # Verifica se alguma ação do adversário leva à vitória
-            
-            
-            # Sorteia as probabilidades de sucesso da Beta
-            probs = [np.random.beta(a = param[0], b = param[1]) for param in zip(alfa, beta)]
-            
-            # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
-            acao = acoes[np.argmax(probs)]
-
-            # Constrói o par que representa o movimento
-            movimento = (int(acao / 3), acao % 3)
-
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                # Terminou o jogo
-                if r == 1:
-                    # Ganhei!
-                    # Distribui as recompensas, i.e., soma 1 no alfa correspondente a cada movimento
-                    # executado na partida
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        al[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)
-
-            return movimento
-        else:
-            if r == -1:
-                # Perdi :-/
-                # Distribui os castigos, i.e., soma 1 no beta correspondente a cada movimento
-                # executado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    be[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)
-                    
-            return None        
-                       
+        # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
+        acoes, alfa, beta = self._entrada(chave)
         
+        # Sorteia as probabilidades de sucesso da Beta com o gerador do jogador (para poucas ações, chamadas
+        # escalares são mais rápidas que uma chamada vetorizada; ver amostra_beta para muitas posições)
+        probs = [self.rng.beta(a, b) for a, b in zip(alfa, beta)]
         
+        # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
+        return acoes[np.argmax(probs)]
+
+
 ###############################################################################################
 #    Cientista cauteloso - usa o modelo probabilístico, equilibra exploração e exploitação   #
 #      e sempre verifica se o oponente tem um movimento vitorioso na próxima jogada           #
@@ -528,138 +277,66 @@ class cientista_cauteloso(owg_player):
         e atualizar as probabilidades. Também verifica, a cada lance, se o oponente tem algum movimento vencedor
         Sorteia a ação, conforme probabilidades de sucesso, para equilibrar exploration e exploitation.
     '''
-    def __init__(self, a = 1, b = 1, nome = 'Cientista cauteloso'):
+    def __init__(self, a = 1, b = 1, nome = 'Cientista cauteloso', seed = None):
         '''
         @args 
         
         a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         
         self.a = a
         self.b = b
         self.nome = nome
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b}
+        
+    def campos_conhecimento(self):
+        return {'alfa' : self.a, 'beta' : self.b}
+        
+    def _credito(self, r):
+        # Soma 1 no alfa de cada lance da partida na vitória, e no beta na derrota
+        if r == 1:
+            return [('alfa', 1)]
+        if r == -1:
+            return [('beta', 1)]
+        return []
         
-    def __inicializa(self, strpos):
-        '''
-        Cria o vetor de probabilidade uniforme para a dada posição, e cria a lista de alfas e betas
-        ''' 
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        alfa = [self.a] * len(acoes)
-        beta = [self.b] * len(acoes)
-        self.knowledge[strpos] = (acoes, alfa, beta)
-
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, alfa, beta = self.knowledge[strpos]    
         rew = [a/(a+b) for a, b in zip(alfa,beta)]
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado
+        Joga a ação que completa uma linha, se houver; caso contrário usa Thompson sampling
         '''
+        # Verifica se há alguma ação vencedora para si ou para o oponente (consulta a tabela de posições)
+        acao = self._tatica(istate)
+        if acao is not None:
+            # Existe um movimento vencedor nessa posição. Joga esse movimento.
+            return acao
 
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            # Recupera a string que representa a posição
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                # Inicializa da prior
-                self.__inicializa(strpos)
-
-            # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
-            acoes, alfa, beta = self.knowledge[strpos]
-            
-            # Verifica se há alguma ação vencedora para si ou para o oponente
-            mov = None
-            for i in range(3):
-                # Verifica linhas 
-                linha = strpos[(3*i):((3*i+3))]
-                if linha in ['121', '020', '112', '002', '211', '200']:
-                    j = linha.find('2')
-                    mov = (i, j)
-                    winner = linha[abs(j-1)]
-                    break
-                # Verifica colunas
-                coluna = strpos[i:i+7:3]
-                if coluna in ['121', '020', '112', '002', '211', '200']:
-                    j = coluna.find('2')
-                    mov = (j, i)
-                    winner = coluna[abs(j-1)]
-                    break
-            # Verifica diagonais
-            diagp = strpos[0:9:4]
-            if diagp in ['121', '020', '112', '002', '211', '200']:
-                j = diagp.find('2')
-                mov = (j, j)
-                winner = diagp[abs(j-1)]
-            diags = strpos[2:7:2]
-            if diags in ['121', '020', '112', '002', '211', '200']:
-                j = diags.find('2')
-                mov = (j, 2-j)
-                winner = diags[abs(j-1)]
-            
-            if mov is not None:
-                # Existe um movimento vencedor nessa posição. Joga esse movimento.
-                movimento = mov
-                acao = 3*mov[0] + mov[1]
-            else:
-                # Sorteia as probabilidades de sucesso da Beta
-                probs = [np.random.beta(a = param[0], b = param[1]) for param in zip(alfa, beta)]
+        # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
+        acoes, alfa, beta = self._entrada(chave)
 
-                # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
-                acao = acoes[np.argmax(probs)]
+        # Sorteia as probabilidades de sucesso da Beta com o gerador do jogador (para poucas ações, chamadas
+        # escalares são mais rápidas que uma chamada vetorizada; ver amostra_beta para muitas posições)
+        probs = [self.rng.beta(a, b) for a, b in zip(alfa, beta)]
+
+        # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
+        return acoes[np.argmax(probs)]
 
-                # Constrói o par que representa o movimento
-                movimento = (int(acao / 3), acao % 3)
 
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                # Terminou o jogo
-                if r == 1:
-                    # Ganhei!
-                    # Distribui as recompensas, i.e., soma 1 no alfa correspondente a cada movimento
-                    # executado na partida
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        al[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)
-
-            return movimento
-        else:
-            if r == -1:
-                # Perdi :-/
-                # Distribui os castigos, i.e., soma 1 no beta correspondente a cada movimento
-                # executado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    be[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)
-                    
-            return None                
-             
-        
 ################################################################################################
 #    Cientista conciliador - usa o modelo probabilístico, equilibra exploração e exploitação   #
 #       e sempre verifica se o oponente tem um movimento vitorioso na próxima jogada           #
@@ -669,111 +346,35 @@ class cientista_conciliador(cientista):
     ''' 
     Cientista conciliador: mesma coisa que o cientista, mas com objetivo de empatar
     '''
-    def __init__(self, a = 1, b = 1, nome = 'Cientista conciliador'):
+    def __init__(self, a = 1, b = 1, nome = 'Cientista conciliador', seed = None):
         '''
         @args 
         
         a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         
-        cientista.__init__(self, a, b, nome)
+        cientista.__init__(self, a, b, nome, seed)
+        
+    def _credito(self, r):
+        # O objetivo é empatar: soma 1 no alfa no empate, e no beta em qualquer outro resultado
+        if r == 0:
+            return [('alfa', 1)]
+        return [('beta', 1)]
         
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, alfa, beta = self.knowledge[strpos]    
         rew = [a/(a+b) for a, b in zip(alfa,beta)]
-        return acoes, rew
-    
-    def joga(self, verbose = False):
-        '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado
-        '''
+        return self._acoes_reais(acoes, t), rew
 
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            # Recupera a string que representa a posição
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                # Inicializa da prior
-                self.__inicializa(strpos)
-
-            # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
-            acoes, alfa, beta = self.knowledge[strpos]
-            
-            # Sorteia as probabilidades de sucesso da Beta
-            probs = [np.random.beta(a = param[0], b = param[1]) for param in zip(alfa, beta)]
-
-            # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
-            acao = acoes[np.argmax(probs)]
 
-            # Constrói o par que representa o movimento
-            movimento = (int(acao / 3), acao % 3)
-
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                # Terminou o jogo
-                if r == 0:
-                    # Empatou!
-                    # Distribui as recompensas, i.e., soma 1 no alfa correspondente a cada movimento
-                    # executado na partida
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        al[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)
-                else:
-                    # Ganhei :-/
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        be[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)                        
-
-            return movimento
-        else:
-            if r == 0:
-                # Empatou
-                # Distribui as recompensas, i.e., soma 1 no alfa correspondente a cada movimento
-                # executado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    al[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)                
-            else:
-                # Não empatou
-                # Distribui os castigos, i.e., soma 1 no beta correspondente a cada movimento
-                # executado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    be[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)
-                    
-            return None
-                       
-            
-            
 ###############################################################################################
 #    Cientista esperto - usa o modelo probabilístico, equilibra exploração e exploitação,     #
 #      sempre verifica se o oponente tem um movimento vitorioso na próxima jogada, e          #
@@ -786,133 +387,359 @@ class cientista_esperto(owg_player):
         Aplica recompensa à posição inversa (i.e. aprende com os erros do oponente.
         Sorteia a ação, conforme probabilidades de sucesso, para equilibrar exploration e exploitation.
     '''
-    def __init__(self, a = 1, b = 1, nome = 'Cientista cauteloso'):
+    def __init__(self, a = 1, b = 1, nome = 'Cientista cauteloso', seed = None):
         '''
         @args 
         
         a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        seed -- semente do gerador de números aleatórios do jogador
         '''
         
         self.a = a
         self.b = b
         self.nome = nome
-        owg_player.__init__(self)
+        owg_player.__init__(self, seed)
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b}
+        
+    def campos_conhecimento(self):
+        return {'alfa' : self.a, 'beta' : self.b}
+        
+    def _credito(self, r):
+        # Soma 1 no alfa de cada lance da partida na vitória, e no beta na derrota
+        if r == 1:
+            return [('alfa', 1)]
+        if r == -1:
+            return [('beta', 1)]
+        return []
         
-    def __inicializa(self, strpos):
-        '''
-        Cria o vetor de probabilidade uniforme para a dada posição, e cria a lista de alfas e betas
-        ''' 
-        acoes = [i for i in range(len(strpos)) if strpos[i] == '2']
-        alfa = [self.a] * len(acoes)
-        beta = [self.b] * len(acoes)
-        self.knowledge[strpos] = (acoes, alfa, beta)
-
     def avalia_posicao(self, strpos):
+        strpos, t = self._canonica(strpos)
         if strpos not in self.knowledge.keys():
             # Nunca viu essa posição
             # Inicializa da prior
-            self.__inicializa(strpos)
+            self._inicializa(strpos)
 
         # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
         acoes, alfa, beta = self.knowledge[strpos]    
         rew = [a/(a+b) for a, b in zip(alfa,beta)]
-        return acoes, rew
+        return self._acoes_reais(acoes, t), rew
         
-    def joga(self, verbose = False):
+    def _escolhe(self, chave, istate):
         '''
-        Dada a posição atual do tabuleiro, decide a ação. Aprende com o resultado
+        Joga a ação que completa uma linha, se houver; caso contrário usa Thompson sampling
         '''
+        # Verifica se há alguma ação vencedora para si ou para o oponente (consulta a tabela de posições)
+        acao = self._tatica(istate)
+        if acao is not None:
+            # Existe um movimento vencedor nessa posição. Joga esse movimento.
+            return acao
 
-        # Primeiro verifica se jogo está rolando
-        r, _ = self.board.check_result()
-        if r is None:
-            # Está rolando
-            # Recupera a string que representa a posição
-            strpos = self.board.sstate
-            
-            if verbose:
-                print(strpos)
-            if strpos not in self.knowledge.keys():
-                # Nunca viu essa posição
-                # Inicializa da prior
-                self.__inicializa(strpos)
-
-            # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
-            acoes, alfa, beta = self.knowledge[strpos]
-            
-            # Verifica se há alguma ação vencedora para si ou para o oponente
-            mov = None
-            for i in range(3):
-                # Verifica linhas 
-                linha = strpos[(3*i):((3*i+3))]
-                if linha in ['121', '020', '112', '002', '211', '200']:
-                    j = linha.find('2')
-                    mov = (i, j)
-                    winner = linha[abs(j-1)]
-                    break
-                # Verifica colunas
-                coluna = strpos[i:i+7:3]
-                if coluna in ['121', '020', '112', '002', '211', '200']:
-                    j = coluna.find('2')
-                    mov = (j, i)
-                    winner = coluna[abs(j-1)]
-                    break
-            # Verifica diagonais
-            diagp = strpos[0:9:4]
-            if diagp in ['121', '020', '112', '002', '211', '200']:
-                j = diagp.find('2')
-                mov = (j, j)
-                winner = diagp[abs(j-1)]
-            diags = strpos[2:7:2]
-            if diags in ['121', '020', '112', '002', '211', '200']:
-                j = diags.find('2')
-                mov = (j, 2-j)
-                winner = diags[abs(j-1)]
-            
-            if mov is not None:
-                # Existe um movimento vencedor nessa posição. Joga esse movimento.
-                movimento = mov
-                acao = 3*mov[0] + mov[1]
-            else:
-                # Sorteia as probabilidades de sucesso da Beta
-                probs = [np.random.beta(a = param[0], b = param[1]) for param in zip(alfa, beta)]
+        # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
+        acoes, alfa, beta = self._entrada(chave)
 
-                # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
-                acao = acoes[np.argmax(probs)]
+        # Sorteia as probabilidades de sucesso da Beta com o gerador do jogador (para poucas ações, chamadas
+        # escalares são mais rápidas que uma chamada vetorizada; ver amostra_beta para muitas posições)
+        probs = [self.rng.beta(a, b) for a, b in zip(alfa, beta)]
 
-                # Constrói o par que representa o movimento
-                movimento = (int(acao / 3), acao % 3)
+        # Sorteia a ação conforme as probabilidades de sucesso sorteadas no passo anterior
+        return acoes[np.argmax(probs)]
 
-            # Joga e armazena
-            self.board.play(1, movimento)
-            self.jogo.append((strpos, acao))
-            
-            # Verifica se ganhou o jogo
-            r, _ = self.board.check_result()
-            if r is not None:
-                # Terminou o jogo
-                if r == 1:
-                    # Ganhei!
-                    # Distribui as recompensas, i.e., soma 1 no alfa correspondente a cada movimento
-                    # executado na partida
-                    for i in range(len(self.jogo)):
-                        pos = self.jogo[i][0]
-                        acao = self.jogo[i][1]
-                        a, al, be = self.knowledge[pos]
-                        al[a.index(acao)] += 1
-                        self.knowledge[pos] = (a, al, be)
-
-            return movimento
-        else:
-            if r == -1:
-                # Perdi :-/
-                # Distribui os castigos, i.e., soma 1 no beta correspondente a cada movimento
-                # executado na partida
-                for i in range(len(self.jogo)):
-                    pos = self.jogo[i][0]
-                    acao = self.jogo[i][1]
-                    a, al, be = self.knowledge[pos]
-                    be[a.index(acao)] += 1
-                    self.knowledge[pos] = (a, al, be)
-                    
-            return None  
\ No newline at end of file
+
+###############################################################################################
+#    Cientista previdente - usa o modelo probabilístico e busca alguns lances à frente,       #
+#      avaliando as posições do horizonte com as médias a posteriori do próprio knowledge     #
+###############################################################################################
+class cientista_previdente(cientista):
+    ''' 
+    Cientista previdente: aprende como o cientista, mas decide com uma busca minimax de profundidade lances
+        (contando o próprio), em que as posições do horizonte valem a maior média a posteriori a/(a+b) das
+        suas ações (a probabilidade de vitória estimada para quem tem a vez, também para o oponente, visto
+        do ponto de vista dele). Vitória vale 1 e empate 1/2. Na raiz, cada ação vale o resultado da busca
+        mais ruido vezes o desvio do sorteio da Beta em relação à média (Thompson sampling em torno do valor
+        da busca, com peso pequeno para que o sorteio não troque uma vitória, um empate ou uma derrota que a
+        busca encontrou); com profundidade 0 é o próprio cientista.
+        
+        Com profundidade 2 o jogador faz sempre a vitória imediata ou o bloqueio forçado, quando há, como a
+        varredura de um lance à frente do cientista cauteloso (ver confere_previdente). Com profundidade 9 a
+        busca chega ao fim de todas as partidas e o jogador não perde para o perfeito. Nas profundidades
+        intermediárias ele pode adiar uma vitória que a busca já vê como garantida, que vale o mesmo.
+        
+        Os valores das subárvores ficam memorizados entre os lances e as partidas; quando knowledge é
+        atualizado, só são descartados os valores que dependem das posições alteradas.
+    '''
+    # Padrão dos jogadores gravados antes de ruido existir
+    ruido = .1
+    
+    def __init__(self, a = 1, b = 1, profundidade = 2, ruido = .1, nome = 'Cientista previdente', seed = None):
+        '''
+        @args 
+        
+        a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        profundidade -- número de lances da busca, contando o próprio
+        ruido -- peso do desvio do sorteio da Beta somado ao valor da busca na raiz (menor que 1/2, a menor
+                 diferença entre vitória, empate e derrota, para que o sorteio não desfaça o que a busca achou)
+        seed -- semente do gerador de números aleatórios do jogador
+        '''
+        cientista.__init__(self, a, b, nome, seed)
+        self.profundidade = profundidade
+        self.ruido = ruido
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b, 'profundidade' : self.profundidade, 'ruido' : self.ruido}
+        
+    def __getstate__(self):
+        # Os valores memorizados não são gravados
+        estado = dict(self.__dict__)
+        for campo in ('_memo', '_memo_de', '_alteradas'):
+            estado.pop(campo, None)
+        return estado
+        
+    def decide_many(self, posicoes):
+        # A busca não tem versão vetorizada: decide uma posição de cada vez
+        return np.array([self.decide(p) for p in posicoes], dtype = np.int64)
+        
+    def _alterou(self, posicoes):
+        # Guarda as posições alteradas, para descartar os valores memorizados que dependem delas
+        self.__dict__.setdefault('_alteradas', set()).update(posicoes)
+        
+    def _escolhe(self, chave, istate):
+        '''
+        Soma a cada ação o valor da busca e o desvio do sorteio da Beta em relação à média
+        '''
+        # Obtém as ações para aquela posição, e os respectivos parâmetros da Beta
+        acoes, alfa, beta = self._entrada(chave)
+        if self.profundidade < 1:
+            probs = [self.rng.beta(a, b) for a, b in zip(alfa, beta)]
+            return acoes[np.argmax(probs)]
+        
+        # A busca é feita na posição da chave (a canônica, com simetria), onde estão as ações
+        self.__prepara_memo()
+        raiz = int(CANONICO[istate]) if self.simetria else istate
+        probs = []
+        for acao, a, b in zip(acoes, alfa, beta):
+            filho = raiz - POT[acao]
+            r = tabela().resultado_array[filho]
+            if r != 2:
+                # O lance termina o jogo: valor exato, sem sorteio
+                probs.append(1. if r == 1 else .5)
+            else:
+                v = 1. - self.__valor(int(INVERTE[filho]), self.profundidade - 1)
+                probs.append(v + self.ruido * (self.rng.beta(a, b) - a / (a + b)))
+        return acoes[np.argmax(probs)]
+        
+    def __valor(self, istate, d):
+        # Valor da posição istate para quem tem a vez, com d lances de busca (memorizado)
+        chave = int(CANONICO[istate]) if self.simetria else istate
+        v = self._memo.get((chave, d))
+        if v is None:
+            if d == 0:
+                _, alfa, beta = self._entrada(self._chave(chave))
+                v = max(a / (a + b) for a, b in zip(alfa, beta))
+            else:
+                v = 0.
+                for casa in tabela().legais[istate]:
+                    filho = istate - POT[casa]
+                    r = tabela().resultado_array[filho]
+                    if r != 2:
+                        w = 1. if r == 1 else .5
+                    else:
+                        w = 1. - self.__valor(int(INVERTE[filho]), d - 1)
+                    if w > v:
+                        v = w
+            self._memo[(chave, d)] = v
+        return v
+        
+    def confere_memo(self):
+        '''
+        Confere os valores memorizados: descarta os que dependem das posições alteradas (como antes de um
+        lance) e compara os que restam com uma busca nova, sem memória
+
+        @returns
+
+        número de valores memorizados diferentes dos da busca nova (0 se a memória está correta)
+        '''
+        self.__prepara_memo()
+        memo = self._memo
+        self._memo = dict()
+        try:
+            erradas = sum(1 for (chave, d), v in memo.items() if self.__valor(chave, d) != v)
+        finally:
+            self._memo = memo
+        return erradas
+        
+    def __prepara_memo(self):
+        '''
+        Descarta os valores memorizados que dependem das posições alteradas desde o último lance: V(q, d)
+        depende das posições d lances abaixo de q. Se knowledge foi trocado, descarta tudo.
+        '''
+        alteradas = self.__dict__.get('_alteradas', set())
+        if self.__dict__.get('_memo_de') is not self.knowledge:
+            self._memo = dict()
+            self._memo_de = self.knowledge
+        elif alteradas:
+            T = tabela()
+            nivel = {sstate_para_istate(p) if isinstance(p, str) else p for p in alteradas}
+            for d in range(self.profundidade):
+                for q in nivel:
+                    self._memo.pop((q, d), None)
+                # Pais: posições de onde se chega a q com um lance de cada lado
+                pais = set()
+                for q in nivel:
+                    c = int(INVERTE[q])
+                    for k in range(9):
+                        if c // POT[k] % 3 == 1 and T.decisao_ids[c + POT[k]] >= 0:
+                            pais.add(int(CANONICO[c + POT[k]]) if self.simetria else c + POT[k])
+                nivel = pais
+        self._alteradas = set()
+
+
+###############################################################################################
+#    Cientista MCTS - busca em árvore Monte Carlo, com as contagens alfa/beta do próprio      #
+#      knowledge como priori das estatísticas de cada lance                                   #
+###############################################################################################
+class cientista_mcts(cientista):
+    ''' 
+    Cientista MCTS: aprende como o cientista, mas decide com uma busca em árvore Monte Carlo (owg_mcts). A
+        estatística de cada lance de cada nó é uma Beta cuja priori são as contagens alfa/beta de knowledge
+        para aquela posição (vista por quem tem a vez nela, também para o oponente), somadas às vitórias e
+        derrotas das simulações; os lances são escolhidos por Thompson sampling. As simulações terminam as
+        partidas com lances sorteados, em lotes. Joga o lance mais simulado da raiz.
+        
+        A árvore acompanha a partida (joga e comunica): a subárvore do lance jogado é aproveitada no lance
+        seguinte. decide, decide_many e as sessões buscam cada um numa árvore nova, sem tocar na da partida.
+    '''
+    def __init__(self, a = 1, b = 1, simulacoes = 800, tempo = None, lote = 64, forca_priori = 50,
+                 nome = 'Cientista MCTS', seed = None):
+        '''
+        @args 
+        
+        a, b -- números positivos, os parâmetros iniciais para cada priori Beta sobre as probabilidades de sucesso
+        simulacoes -- número de simulações por lance (None para limitar só pelo tempo)
+        tempo -- tempo máximo de busca por lance, em segundos (None para limitar só pelas simulações)
+        lote -- número de simulações feitas de uma vez
+        forca_priori -- máximo de alfa + beta da priori de cada lance: contagens maiores são reduzidas na
+                        mesma proporção, para que as simulações ainda pesem
+        seed -- semente do gerador de números aleatórios do jogador
+        '''
+        cientista.__init__(self, a, b, nome, seed)
+        self.simulacoes = simulacoes
+        self.tempo = tempo
+        self.lote = lote
+        self.forca_priori = forca_priori
+        
+    def hiperparametros(self):
+        return {'a' : self.a, 'b' : self.b, 'simulacoes' : self.simulacoes, 'tempo' : self.tempo,
+                'lote' : self.lote, 'forca_priori' : self.forca_priori}
+        
+    def __getstate__(self):
+        # A árvore não é gravada
+        estado = dict(self.__dict__)
+        estado.pop('_arvore', None)
+        return estado
+        
+    def decide_many(self, posicoes):
+        # A busca não tem versão vetorizada: decide uma posição de cada vez
+        return np.array([self.decide(p) for p in posicoes], dtype = np.int64)
+        
+    def __arvore(self):
+        arv = self.__dict__.get('_arvore')
+        if arv is None or arv.rng is not self.rng:
+            arv = self._arvore = arvore(self.__priori, self.rng, self.lote)
+        arv.lote = self.lote
+        return arv
+        
+    def __priori(self, istate):
+        # Priori (alfa, beta) de cada casa da posição istate, a partir de knowledge
+        chave, t = self._canonica(istate)
+        acoes, alfa, beta = self._entrada(chave)
+        al = np.ones(9)
+        be = np.ones(9)
+        casas = [int(PARA_REAL[t, a]) for a in acoes] if self.simetria else acoes
+        al[casas] = alfa
+        be[casas] = beta
+        fator = np.minimum(1., self.forca_priori / (al + be))
+        return al * fator, be * fator
+        
+    def __busca(self, arv, istate):
+        # Busca na árvore arv a partir da posição istate; retorna o lance mais simulado, no tabuleiro real
+        arv.posiciona(istate)
+        arv.busca(self.simulacoes, self.tempo)
+        return arv.melhor()
+        
+    def _escolhe(self, chave, istate):
+        '''
+        Busca a partir da posição istate, na árvore da partida, e retorna o lance mais simulado (nas casas da
+        chave)
+        '''
+        arv = self.__arvore()
+        casa = self.__busca(arv, istate)
+        arv.avanca(casa)
+        if self.simetria:
+            return int(PARA_CANONICA[TRANSFORMACAO[istate], casa])
+        return casa
+        
+    def _decide(self, posicao):
+        # decide não usa a árvore da partida (joga): cada chamada busca numa árvore própria, descartada ao
+        # final, para que partidas (sessões) simultâneas do mesmo jogador não interfiram umas nas outras
+        istate = sstate_para_istate(posicao) if isinstance(posicao, str) else int(posicao)
+        chave, t = self._canonica(istate)
+        casa = self.__busca(arvore(self.__priori, self.rng, self.lote), istate)
+        acao = int(PARA_CANONICA[t, casa]) if self.simetria else casa
+        return chave, acao, casa
+        
+    def comunica(self, movimento, verbose = False):
+        owg_player.comunica(self, movimento, verbose)
+        arv = self.__dict__.get('_arvore')
+        if arv is not None:
+            arv.avanca(3 * movimento[0] + movimento[1])
+            
+    def reset(self):
+        owg_player.reset(self)
+        arv = self.__dict__.get('_arvore')
+        if arv is not None:
+            arv.raiz = None
+
+
+def confere_previdente(jogos = 50, profundidade = 3, seed = 0):
+    '''
+    Confere a memória do cientista previdente: treina contra jb, com knowledge em dicionário e denso, com e
+    sem simetria, e compara os valores memorizados com uma busca nova (cientista_previdente.confere_memo).
+    Com profundidade 2, confere também que o jogador treinado faz as vitórias e os bloqueios forçados em
+    todas as posições de decisão.
+    '''
+    from owg_treino import train
+    for denso in (False, True):
+        for simetria in (False, True):
+            p = cientista_previdente(profundidade = profundidade, seed = seed)
+            p.usa_simetria(simetria)
+            if denso:
+                p.usa_conhecimento_denso()
+            train(p, jb(seed = seed + 1), jogos, verbose = False)
+            erradas = p.confere_memo()
+            if erradas:
+                raise ValueError("Erro! {} de {} valores memorizados desatualizados (denso = {}, simetria = {})".format(
+                    erradas, len(p._memo), denso, simetria))
+            if profundidade == 2:
+                erradas = _lances_forcados(p)
+                if erradas:
+                    raise ValueError("Erro! {} vitórias ou bloqueios forçados não jogados".format(erradas))
+
+
+def _lances_forcados(p):
+    # Número de posições de decisão com uma vitória imediata, ou com um único bloqueio forçado, em que p
+    # decide outro lance
+    T = tabela()
+    erradas = 0
+    for istate in T.decisao_istates.tolist():
+        forcados = T.vencedoras[istate] or (T.bloqueios[istate] if len(T.bloqueios[istate]) == 1 else ())
+        if forcados and p.decide(istate) not in forcados:
+            erradas += 1
+    return erradas
+
+
+if __name__ == '__main__':
+    confere_previdente()
+    confere_previdente(profundidade = 2)
+    print("Cientista previdente conferido")
@@ -0,0 +1,224 @@
+# Registro de partidas: arquivo binário só de acréscimo, uma partida em 8 bytes, lido por mapeamento em memória
+
+import os
+
+import numpy as np
+
+from owg_simetria import PARA_CANONICA
+from owg_tabela import POT, VAZIO
+
+# Cabeçalho do arquivo: identificação e versão do formato; incrementar a versão sempre que o formato mudar
+MAGICO = b'OWGREG01'
+
+# Cada partida é um inteiro de 64 bits (little-endian):
+#   bits 4k a 4k+3 (k = 0, ..., 8) -- casa do k-ésimo lance (3 * linha + coluna), ou 15 se não houve lance
+#   bits 36 a 39 -- número de lances
+#   bit 40 -- quem começou: 0 se p1, 1 se p2
+#   bits 41 e 42 -- resultado do ponto de vista de p1, mais 1 (0 derrota, 1 empate, 2 vitória)
+_SEM_LANCE = 15
+_DESLOCAMENTOS = np.arange(9, dtype = np.uint64) * np.uint64(4)
+
+
+def codifica(lances, primeiro, resultado):
+    '''
+    Codifica um lote de partidas
+
+    @args
+
+    lances -- array (N, 9) com as casas jogadas em ordem, e -1 depois do último lance
+    primeiro -- array (N) com quem começou cada partida (0 para p1, 1 para p2)
+    resultado -- array (N) com o resultado do ponto de vista de p1 (1, 0 ou -1)
+
+    @returns
+
+    array (N) de uint64, um registro por partida
+    '''
+    lances = np.asarray(lances, dtype = np.int64)
+    n = (lances >= 0).sum(axis = 1)
+    casas = np.where(lances >= 0, lances, _SEM_LANCE).astype(np.uint64)
+    reg = np.bitwise_or.reduce(casas << _DESLOCAMENTOS, axis = 1)
+    reg |= n.astype(np.uint64) << np.uint64(36)
+    reg |= np.asarray(primeiro, dtype = np.uint64) << np.uint64(40)
+    reg |= (np.asarray(resultado, dtype = np.int64) + 1).astype(np.uint64) << np.uint64(41)
+    return reg
+
+
+def decodifica(registros):
+    '''
+    Decodifica um lote de registros (ver codifica)
+
+    @returns
+
+    lances (N, 9) int8 com -1 depois do último lance, n (N) número de lances, primeiro (N) e resultado (N)
+    '''
+    reg = np.asarray(registros, dtype = np.uint64)
+    casas = ((reg[:, None] >> _DESLOCAMENTOS) & np.uint64(15)).astype(np.int8)
+    casas[casas == _SEM_LANCE] = -1
+    n = ((reg >> np.uint64(36)) & np.uint64(15)).astype(np.int8)
+    primeiro = ((reg >> np.uint64(40)) & np.uint64(1)).astype(np.int8)
+    resultado = ((reg >> np.uint64(41)) & np.uint64(3)).astype(np.int8) - 1
+    return casas, n, primeiro, resultado
+
+
+class gravador:
+    '''
+    Classe gravador: acrescenta partidas ao final de um arquivo de registro (criado, com o cabeçalho, se não
+    existir). As partidas ficam num buffer e vão para o disco a cada buffer partidas, em descarrega ou em
+    fecha; um arquivo interrompido no meio de uma gravação perde no máximo o registro incompleto do final,
+    que o leitor ignora.
+
+    Pode ser usado com with:
+
+        with gravador('partidas.owgr') as g:
+            train(p1, p2, n, registro = g)
+
+    @args
+
+    arquivo -- caminho do arquivo
+    buffer -- número de partidas guardadas em memória antes de gravar
+    '''
+    def __init__(self, arquivo, buffer = 65536):
+        self.arquivo = arquivo
+        self.buffer = buffer
+        self.pendentes = []
+        self.n_pendentes = 0
+        self.n_gravadas = 0
+        novo = not os.path.exists(arquivo) or os.path.getsize(arquivo) == 0
+        if not novo:
+            with open(arquivo, 'rb') as arq:
+                if arq.read(len(MAGICO)) != MAGICO:
+                    raise ValueError("Erro! {} não é um registro de partidas desta versão".format(arquivo))
+        self.arq = open(arquivo, 'ab')
+        if novo:
+            self.arq.write(MAGICO)
+        else:
+            # Descarta um registro incompleto deixado por uma gravação interrompida
+            excesso = (os.path.getsize(arquivo) - len(MAGICO)) % 8
+            if excesso:
+                self.arq.truncate(os.path.getsize(arquivo) - excesso)
+
+    def registra(self, lances, primeiro, resultado):
+        '''
+        Registra uma partida
+
+        @args
+
+        lances -- lista das casas jogadas, em ordem (3 * linha + coluna)
+        primeiro -- quem começou (0 para p1, 1 para p2)
+        resultado -- resultado do ponto de vista de p1 (1, 0 ou -1)
+        '''
+        linha = list(lances) + [-1] * (9 - len(lances))
+        self.registra_lote(np.array([linha]), [primeiro], [resultado])
+
+    def registra_lote(self, lances, primeiro, resultado):
+        '''
+        Registra um lote de partidas (ver codifica)
+        '''
+        reg = codifica(lances, primeiro, resultado)
+        self.pendentes.append(reg)
+        self.n_pendentes += len(reg)
+        if self.n_pendentes >= self.buffer:
+            self.descarrega()
+
+    def descarrega(self):
+        '''
+        Grava no arquivo as partidas do buffer
+        '''
+        if not self.pendentes:
+            return
+        self.arq.write(np.concatenate(self.pendentes).astype('<u8').tobytes())
+        self.arq.flush()
+        self.n_gravadas += self.n_pendentes
+        self.pendentes = []
+        self.n_pendentes = 0
+
+    def fecha(self):
+        '''
+        Grava o buffer e fecha o arquivo
+        '''
+        if self.arq is not None:
+            self.descarrega()
+            self.arq.close()
+            self.arq = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fecha()
+
+
+def abre(arquivo):
+    '''
+    Abre um arquivo de registro mapeado em memória, somente para leitura (o sistema lê do disco só as
+    páginas acessadas)
+
+    @returns
+
+    array (número de partidas) de uint64 com os registros (ver codifica e decodifica)
+    '''
+    with open(arquivo, 'rb') as arq:
+        if arq.read(len(MAGICO)) != MAGICO:
+            raise ValueError("Erro! {} não é um registro de partidas desta versão".format(arquivo))
+    n = (os.path.getsize(arquivo) - len(MAGICO)) // 8
+    if n == 0:
+        return np.zeros(0, dtype = '<u8')
+    return np.memmap(arquivo, dtype = '<u8', mode = 'r', offset = len(MAGICO), shape = (n,))
+
+
+def itera(arquivo, bloco = 1 << 20):
+    '''
+    Percorre o arquivo de registro em blocos de bloco partidas, decodificados (ver decodifica)
+
+    @returns
+
+    gerador de (lances, n, primeiro, resultado), um por bloco
+    '''
+    reg = abre(arquivo)
+    for inicio in range(0, len(reg), bloco):
+        yield decodifica(reg[inicio:inicio + bloco])
+
+
+def trajetorias(p, lances, n, primeiro, resultado, lado = 0):
+    '''
+    Reconstrói, a partir de partidas registradas, as trajetórias do jogador do lado lado (0 para p1, 1 para
+    p2) no formato de p.jogo (pares (chave de knowledge, ação), ver owg_player), e os resultados do ponto de
+    vista dele, para p.aprende_lote
+
+    @returns
+
+    jogos, resultados
+    '''
+    jogos = []
+    resultados = []
+    for casas, k, pr, r in zip(lances.tolist(), n.tolist(), primeiro.tolist(), resultado.tolist()):
+        istate = VAZIO
+        jogo = []
+        for m, casa in enumerate(casas[:k]):
+            if (m % 2 == 0) == (pr == lado):
+                # Lance do jogador: a posição antes dele vai para a trajetória
+                chave, t = p._canonica(istate)
+                jogo.append((chave, int(PARA_CANONICA[t, casa]) if p.simetria else casa))
+                istate -= POT[casa]
+            else:
+                istate -= 2 * POT[casa]
+        jogos.append(jogo)
+        resultados.append(r if lado == 0 else -r)
+    return jogos, resultados
+
+
+def reaprende(p, arquivo, lado = 0, bloco = 1 << 16):
+    '''
+    Treina o jogador p com as partidas do arquivo de registro, como se ele tivesse jogado do lado lado:
+    aplica a regra de aprendizagem do jogador (aprende_lote) a cada bloco de partidas
+
+    @returns
+
+    número de partidas
+    '''
+    total = 0
+    for lances, n, primeiro, resultado in itera(arquivo, bloco):
+        jogos, resultados = trajetorias(p, lances, n, primeiro, resultado, lado)
+        p.aprende_lote(jogos, resultados)
+        total += len(jogos)
+    return total
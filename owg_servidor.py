@@ -0,0 +1,426 @@
+# Servidor de partidas: asyncio, protocolo de linhas JSON, jogadores congelados decidindo em lote
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from owg_arquivo import carrega_jogador
+from owg_player_base import sessao
+
+# Jogadores servidos por padrão (arquivos .npz de owg_arquivo, no diretório do projeto)
+AGENTES = ['cientista_1MM.npz', 'cientista_cauteloso_1MM.npz', 'epsilon_edson_1MM.npz']
+
+
+def carrega_agentes(arquivos = AGENTES, amostras = 256, seed = None):
+    '''
+    Lê os jogadores treinados e os congela (owg_congelado), para servir cada lance com uma consulta à tabela
+
+    @args
+
+    arquivos -- arquivos .npz gravados por owg_arquivo.salva_jogador (procurados também no diretório do
+                projeto)
+    amostras -- número de amostras por posição dos jogadores que sorteiam (ver owg_congelado.congela)
+    seed -- semente
+
+    @returns
+
+    dicionário nome da classe : jogador congelado
+    '''
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    agentes = dict()
+    for arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            arquivo = os.path.join(diretorio, arquivo)
+        p = carrega_jogador(arquivo, seed = seed)
+        agentes[type(p).__name__] = p.congela(amostras, seed)
+    return agentes
+
+
+class lote_decisoes:
+    '''
+    Classe lote_decisoes: junta os pedidos de lance de todas as sessões de um agente e os decide de uma vez,
+    com decide_many. O primeiro pedido de um lote abre uma janela de espera segundos; o lote é decidido ao
+    fim da janela ou assim que junta maximo pedidos.
+
+    @args
+
+    agente -- jogador (congelado) com decide_many
+    espera -- duração da janela, em segundos
+    maximo -- número máximo de pedidos num lote
+    '''
+    def __init__(self, agente, espera = 0.001, maximo = 1024):
+        self.agente = agente
+        self.espera = espera
+        self.maximo = maximo
+        self.pedidos = []
+        self.timer = None
+        self.n_lotes = 0
+        self.n_pedidos = 0
+
+    def decide(self, istate):
+        '''
+        Pede o lance na posição istate (do ponto de vista do agente). Retorna um future com a casa
+        '''
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self.pedidos.append((istate, futuro))
+        if len(self.pedidos) >= self.maximo:
+            self.despacha()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.espera, self.despacha)
+        return futuro
+
+    def despacha(self):
+        '''
+        Decide todos os pedidos pendentes com uma chamada a decide_many
+        '''
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pedidos, self.pedidos = self.pedidos, []
+        if not pedidos:
+            return
+        casas = self.agente.decide_many([istate for istate, _ in pedidos]).tolist()
+        for (_, futuro), casa in zip(pedidos, casas):
+            if not futuro.done():
+                futuro.set_result(casa)
+        self.n_lotes += 1
+        self.n_pedidos += len(pedidos)
+
+
+class servidor:
+    '''
+    Classe servidor: atende partidas contra os agentes por TCP ou socket Unix, com um protocolo de linhas
+    JSON. Cada conexão pode ter várias partidas (sessões) em andamento; os pedidos são atendidos fora de
+    ordem e cada resposta repete o campo ref do pedido. Os lances de todas as sessões de um mesmo agente são
+    decididos em lote (lote_decisoes).
+
+    Pedidos (movimentos são pares [linha, coluna]; resultado é do ponto de vista do cliente: 1, 0, -1, ou
+    null com a partida em andamento):
+        {"op": "nova", "agente": "cientista", "agente_comeca": true}
+            -> {"sessao": id, "movimento": lance do agente ou null, "resultado": null}
+        {"op": "joga", "sessao": id, "movimento": [i, j]}
+            -> {"sessao": id, "movimento": resposta do agente ou null, "resultado": ...}
+        {"op": "encerra", "sessao": id} -> {"sessao": id}
+        {"op": "estatisticas"} -> ver estatisticas
+    Pedidos inválidos recebem {"erro": mensagem}. Uma conexão só joga e encerra as próprias sessões, e não
+    encerra uma sessão com um lance do agente em andamento. As sessões terminadas, encerradas ou de conexões
+    fechadas são descartadas.
+
+    @args
+
+    agentes -- dicionário nome : jogador congelado (ver carrega_agentes)
+    espera, maximo -- parâmetros de lote_decisoes
+    janela -- número de lances mais recentes usados nos percentis de latência
+    '''
+    def __init__(self, agentes, espera = 0.001, maximo = 1024, janela = 100000):
+        self.agentes = agentes
+        self.lotes = {nome : lote_decisoes(p, espera, maximo) for nome, p in agentes.items()}
+        self.sessoes = dict()
+        self.ocupadas = set()
+        self.ids = itertools.count(1)
+        self.latencias = collections.deque(maxlen = janela)
+        self.n_lances = 0
+        self.n_partidas = 0
+
+    async def inicia(self, host = '127.0.0.1', porta = 0, unix = None):
+        '''
+        Abre o servidor em host:porta (porta 0 escolhe uma livre) ou no socket Unix unix. Retorna o
+        asyncio.Server
+        '''
+        if unix is not None:
+            return await asyncio.start_unix_server(self.atende, path = unix)
+        return await asyncio.start_server(self.atende, host, porta)
+
+    async def atende(self, reader, writer):
+        '''
+        Atende uma conexão: cada linha recebida é processada numa tarefa própria
+        '''
+        minhas = set()
+        tarefas = set()
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                tarefa = asyncio.ensure_future(self.__responde(linha, writer, minhas, time.perf_counter()))
+                tarefas.add(tarefa)
+                tarefa.add_done_callback(tarefas.discard)
+            if tarefas:
+                await asyncio.gather(*tarefas, return_exceptions = True)
+        except ConnectionError:
+            pass
+        finally:
+            for sid in minhas:
+                self.sessoes.pop(sid, None)
+                self.ocupadas.discard(sid)
+            writer.close()
+
+    async def __responde(self, linha, writer, minhas, inicio):
+        ref = None
+        try:
+            pedido = json.loads(linha)
+            if not isinstance(pedido, dict):
+                raise ValueError("Erro! o pedido deve ser um objeto JSON")
+            ref = pedido.get('ref')
+            resposta = await self.processa(pedido, minhas)
+        except (ValueError, KeyError, TypeError) as e:
+            resposta = {'erro' : str(e)}
+        if ref is not None:
+            resposta['ref'] = ref
+        if writer.is_closing():
+            return
+        writer.write((json.dumps(resposta) + '\n').encode())
+        if 'movimento' in resposta:
+            self.latencias.append(time.perf_counter() - inicio)
+        await writer.drain()
+
+    async def processa(self, pedido, minhas = None):
+        '''
+        Processa um pedido (dicionário do protocolo) e retorna a resposta
+        '''
+        op = pedido.get('op')
+        if op == 'nova':
+            nome = pedido.get('agente')
+            if nome not in self.agentes:
+                raise ValueError("Erro! agente desconhecido: {} (disponíveis: {})".format(nome, sorted(self.agentes)))
+            sid = next(self.ids)
+            self.sessoes[sid] = (sessao(self.agentes[nome]), nome)
+            self.n_partidas += 1
+            if minhas is not None:
+                minhas.add(sid)
+            movimento = None
+            if pedido.get('agente_comeca', False):
+                movimento = await self.__lance_agente(sid)
+            return {'sessao' : sid, 'movimento' : movimento, 'resultado' : None}
+        if op == 'joga':
+            sid = self.__sessao(pedido, minhas)
+            if sid in self.ocupadas:
+                raise ValueError("Erro! a sessão {} já tem um lance em andamento".format(sid))
+            s, _ = self.sessoes[sid]
+            movimento = pedido.get('movimento')
+            if not isinstance(movimento, list) or len(movimento) != 2 or \
+                    not all(isinstance(x, int) and not isinstance(x, bool) and 0 <= x < 3 for x in movimento):
+                raise ValueError("Erro! movimento inválido: {}".format(movimento))
+            if s.resultado() is not None:
+                raise ValueError("Erro! a partida já terminou")
+            s.comunica(tuple(movimento))
+            resposta = None
+            if s.resultado() is None:
+                resposta = await self.__lance_agente(sid)
+            return {'sessao' : sid, 'movimento' : resposta, 'resultado' : self.__termina(sid, minhas)}
+        if op == 'encerra':
+            sid = self.__sessao(pedido, minhas)
+            if sid in self.ocupadas:
+                raise ValueError("Erro! a sessão {} tem um lance em andamento".format(sid))
+            del self.sessoes[sid]
+            if minhas is not None:
+                minhas.discard(sid)
+            return {'sessao' : sid}
+        if op == 'estatisticas':
+            return self.estatisticas()
+        raise ValueError("Erro! operação desconhecida: {}".format(op))
+
+    def __sessao(self, pedido, minhas):
+        # Id da sessão do pedido, que precisa existir e ser da conexão (minhas; None nas chamadas diretas)
+        sid = pedido.get('sessao')
+        if sid not in self.sessoes or (minhas is not None and sid not in minhas):
+            raise ValueError("Erro! sessão inexistente: {}".format(sid))
+        return sid
+
+    async def __lance_agente(self, sid):
+        s, nome = self.sessoes[sid]
+        self.ocupadas.add(sid)
+        try:
+            casa = await self.lotes[nome].decide(s.istate)
+        finally:
+            self.ocupadas.discard(sid)
+        self.n_lances += 1
+        return list(s.registra(s.istate, casa, casa))
+
+    def __termina(self, sid, minhas):
+        # Resultado do ponto de vista do cliente; a sessão terminada é descartada (pode já ter sido, se a
+        # conexão caiu durante o lance do agente)
+        if sid not in self.sessoes:
+            return None
+        r = self.sessoes[sid][0].resultado()
+        if r is None:
+            return None
+        del self.sessoes[sid]
+        if minhas is not None:
+            minhas.discard(sid)
+        return -r
+
+    def estatisticas(self):
+        '''
+        Retorna o dicionário com o número de sessões abertas, partidas, lances e lotes, o tamanho médio dos
+        lotes e os percentis 50 e 99 da latência dos pedidos nova e joga (do pedido recebido à resposta
+        escrita), em ms
+        '''
+        n_lotes = sum(l.n_lotes for l in self.lotes.values())
+        n_pedidos = sum(l.n_pedidos for l in self.lotes.values())
+        if self.latencias:
+            p50, p99 = np.percentile(np.array(self.latencias), [50, 99]) * 1000
+        else:
+            p50 = p99 = None
+        return {'sessoes' : len(self.sessoes), 'partidas' : self.n_partidas, 'lances' : self.n_lances,
+                'lotes' : n_lotes, 'lote_medio' : n_pedidos / n_lotes if n_lotes else None,
+                'p50_ms' : p50, 'p99_ms' : p99}
+
+    async def relatorio(self, intervalo):
+        '''
+        Imprime as estatísticas a cada intervalo segundos
+        '''
+        while True:
+            await asyncio.sleep(intervalo)
+            e = self.estatisticas()
+            if e['p50_ms'] is not None:
+                print("{} sessões, {} lances, lote médio {:.1f}, latência p50 {:.2f} ms, p99 {:.2f} ms".format(
+                    e['sessoes'], e['lances'], e['lote_medio'], e['p50_ms'], e['p99_ms']))
+
+
+class cliente:
+    '''
+    Classe cliente: cliente mínimo do protocolo, para testes e carga. Várias partidas podem estar em
+    andamento na mesma conexão; as respostas são casadas com os pedidos pelo campo ref.
+    '''
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.refs = itertools.count()
+        self.pendentes = dict()
+        self.leitor = asyncio.ensure_future(self.__le())
+
+    @classmethod
+    async def conecta(cls, host = '127.0.0.1', porta = None, unix = None):
+        if unix is not None:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, porta)
+        return cls(reader, writer)
+
+    async def __le(self):
+        while True:
+            linha = await self.reader.readline()
+            if not linha:
+                break
+            resposta = json.loads(linha)
+            futuro = self.pendentes.pop(resposta.pop('ref', None), None)
+            if futuro is not None and not futuro.done():
+                futuro.set_result(resposta)
+        for futuro in self.pendentes.values():
+            if not futuro.done():
+                futuro.set_exception(ConnectionError("Erro! conexão fechada pelo servidor"))
+
+    async def pede(self, **pedido):
+        '''
+        Envia o pedido (campos do protocolo como argumentos nomeados) e espera a resposta
+        '''
+        ref = next(self.refs)
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes[ref] = futuro
+        pedido['ref'] = ref
+        self.writer.write((json.dumps(pedido) + '\n').encode())
+        await self.writer.drain()
+        return await futuro
+
+    async def fecha(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.leitor.cancel()
+
+
+async def carga(n_sessoes = 1000, n_conexoes = 10, agente = 'cientista', seed = None, **endereco):
+    '''
+    Joga n_sessoes partidas simultâneas contra o agente, distribuídas em n_conexoes conexões, com lances
+    sorteados do lado do cliente (o agente começa nas partidas pares)
+
+    @args
+
+    endereco -- host e porta, ou unix (ver cliente.conecta)
+
+    @returns
+
+    dicionário com as vitórias, empates e derrotas do cliente, e as estatísticas do servidor ao final
+    '''
+    rng = np.random.default_rng(seed)
+    clientes = [await cliente.conecta(**endereco) for _ in range(n_conexoes)]
+
+    async def partida(c, k):
+        livres = set(range(9))
+        r = await c.pede(op = 'nova', agente = agente, agente_comeca = k % 2 == 0)
+        sid = r['sessao']
+        while r.get('resultado') is None:
+            if 'erro' in r:
+                raise ValueError(r['erro'])
+            if r['movimento'] is not None:
+                livres.discard(3 * r['movimento'][0] + r['movimento'][1])
+            casa = int(rng.choice(sorted(livres)))
+            livres.discard(casa)
+            r = await c.pede(op = 'joga', sessao = sid, movimento = [casa // 3, casa % 3])
+        return r['resultado']
+
+    resultados = await asyncio.gather(*[partida(clientes[k % n_conexoes], k) for k in range(n_sessoes)])
+    estatisticas = await clientes[0].pede(op = 'estatisticas')
+    for c in clientes:
+        await c.fecha()
+    return {'vitorias' : resultados.count(1), 'empates' : resultados.count(0),
+            'derrotas' : resultados.count(-1), 'servidor' : estatisticas}
+
+
+async def testa(agentes, n_sessoes = 1000, n_conexoes = 10, agente = 'cientista', seed = None, **opcoes):
+    '''
+    Sobe um servidor local numa porta livre e roda carga contra ele. Retorna o resultado de carga
+    '''
+    srv = servidor(agentes, **opcoes)
+    aberto = await srv.inicia()
+    porta = aberto.sockets[0].getsockname()[1]
+    try:
+        return await carga(n_sessoes, n_conexoes, agente, seed, porta = porta)
+    finally:
+        aberto.close()
+        await aberto.wait_closed()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Servidor de partidas contra os jogadores treinados')
+    parser.add_argument('--agentes', nargs = '+', default = AGENTES, help = 'arquivos .npz dos jogadores')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--porta', type = int, default = 8765)
+    parser.add_argument('--unix', help = 'caminho de um socket Unix (em vez de TCP)')
+    parser.add_argument('--espera', type = float, default = 0.001, help = 'janela de cada lote, em segundos')
+    parser.add_argument('--lote', type = int, default = 1024, help = 'número máximo de lances num lote')
+    parser.add_argument('--relatorio', type = float, default = 10, help = 'intervalo do relatório, em segundos')
+    parser.add_argument('--teste', type = int, metavar = 'N', help = 'joga N partidas com um cliente local e termina')
+    parser.add_argument('--seed', type = int)
+    args = parser.parse_args(argv)
+
+    agentes = carrega_agentes(args.agentes, seed = args.seed)
+    opcoes = dict(espera = args.espera, maximo = args.lote)
+    if args.teste:
+        res = asyncio.run(testa(agentes, args.teste, seed = args.seed, agente = next(iter(agentes)), **opcoes))
+        print(json.dumps(res))
+        return
+
+    async def serve():
+        srv = servidor(agentes, **opcoes)
+        aberto = await srv.inicia(args.host, args.porta, args.unix)
+        print("Servindo {} em {}".format(', '.join(agentes), args.unix or '{}:{}'.format(args.host, args.porta)))
+        relatorio = asyncio.ensure_future(srv.relatorio(args.relatorio))
+        try:
+            async with aberto:
+                await aberto.serve_forever()
+        finally:
+            relatorio.cancel()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Simetrias do tabuleiro: as 8 rotações e reflexões do quadrado (grupo diedral)
+
+import numpy as np
+
+from owg_tabela import POT, N_CODIGOS
+
+# Cada transformação é uma permutação das casas: a casa k do tabuleiro transformado recebe o conteúdo da
+# casa TRANSFORMACOES[t][k] do tabuleiro original. A transformação 0 é a identidade.
+_IDENTIDADE = list(range(9))
+_GIRO = [6, 3, 0, 7, 4, 1, 8, 5, 2]         # rotação de 90 graus no sentido horário
+_ESPELHO = [2, 1, 0, 5, 4, 3, 8, 7, 6]      # reflexão em torno da coluna do meio
+
+
+def _compoe(p, q):
+    # Aplica q e depois p
+    return [q[p[k]] for k in range(9)]
+
+
+TRANSFORMACOES = []
+_p = _IDENTIDADE
+for _ in range(4):
+    TRANSFORMACOES.append(_p)
+    TRANSFORMACOES.append(_compoe(_ESPELHO, _p))
+    _p = _compoe(_GIRO, _p)
+
+# PARA_REAL[t, k]: casa do tabuleiro original correspondente à casa k do tabuleiro transformado por t.
+# PARA_CANONICA[t, c]: casa do tabuleiro transformado por t correspondente à casa c do original.
+PARA_REAL = np.array(TRANSFORMACOES, dtype = np.int64)
+PARA_CANONICA = np.argsort(PARA_REAL, axis = 1)
+
+
+def _calcula():
+    '''
+    Calcula, para todos os códigos, a posição canônica (o menor istate entre as 8 imagens) e a
+    transformação que leva a posição até ela
+    '''
+    digitos = np.arange(N_CODIGOS)[:, None] // np.array(POT) % 3
+    imagens = np.stack([digitos[:, p] @ np.array(POT) for p in TRANSFORMACOES])
+    transformacao = np.argmin(imagens, axis = 0)
+    canonico = imagens[transformacao, np.arange(N_CODIGOS)]
+    return canonico.astype(np.int32), transformacao.astype(np.int8)
+
+
+# CANONICO[istate]: istate da posição canônica; TRANSFORMACAO[istate]: índice t da transformação
+CANONICO, TRANSFORMACAO = _calcula()
+
+
+def canonica(istate):
+    '''
+    Retorna (istate canônico, t) da posição istate: a forma canônica é a imagem de istate pela
+    transformação TRANSFORMACOES[t]
+    '''
+    return int(CANONICO[istate]), int(TRANSFORMACAO[istate])
+
+
+def para_canonica(acao, t):
+    '''
+    Converte uma casa do tabuleiro real na casa correspondente da posição canônica
+    '''
+    return int(PARA_CANONICA[t, acao])
+
+
+def para_real(acao, t):
+    '''
+    Converte uma casa da posição canônica na casa correspondente do tabuleiro real
+    '''
+    return int(PARA_REAL[t, acao])
+
+
+def imagens(istate):
+    '''
+    Retorna o conjunto das posições (istates) equivalentes a istate por simetria, incluindo ela mesma
+    '''
+    s = [istate // p % 3 for p in POT]
+    return {sum(s[p[k]] * POT[k] for k in range(9)) for p in TRANSFORMACOES}
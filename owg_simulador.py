@@ -0,0 +1,280 @@
+# Simulador vetorizado: muitos jogos em paralelo, um lance por vez
+
+import numpy as np
+
+from owg_conhecimento import conhecimento_denso
+from owg_negamax import perfeito, solucao
+from owg_simetria import CANONICO, TRANSFORMACAO, PARA_CANONICA, PARA_REAL
+from owg_tabela import POT, VAZIO, LINHAS, tabela
+from owg_players import jb, miope, epsilon_edson, cientista_sovina, cientista, cientista_cauteloso, \
+    cientista_conciliador, cientista_esperto, cientista_previdente, cientista_mcts
+
+# Regra de decisão de cada classe de jogador: 'aleatorio', 'epsilon', 'media' (a/(a+b)), 'thompson' ou 'otimo'
+# (solução exata, owg_negamax); tatica indica se antes consulta a varredura de um lance à frente. None indica
+# uma regra sem versão vetorizada (as buscas de cientista_previdente e cientista_mcts). A regra de
+# aprendizagem é a do próprio jogador (owg_player._credito), aplicada em lote.
+REGRAS = {
+    jb : ('aleatorio', False),
+    miope : ('aleatorio', True),
+    epsilon_edson : ('epsilon', False),
+    cientista_sovina : ('media', False),
+    cientista : ('thompson', False),
+    cientista_cauteloso : ('thompson', True),
+    cientista_conciliador : ('thompson', False),
+    cientista_esperto : ('thompson', True),
+    perfeito : ('otimo', False),
+    cientista_previdente : None,
+    cientista_mcts : None,
+}
+
+_LINHAS = np.array(LINHAS)
+_POT = np.array(POT, dtype = np.int64)
+
+
+def regras(p):
+    '''
+    Retorna (decisão, tática) do jogador p, procurando a classe mais específica em REGRAS
+    '''
+    for classe in type(p).__mro__:
+        if classe in REGRAS:
+            if REGRAS[classe] is None:
+                raise ValueError("Erro! a regra de decisão de {} não tem versão vetorizada".format(type(p).__name__))
+            return REGRAS[classe]
+    raise ValueError("Erro! o simulador não conhece a classe {}".format(type(p).__name__))
+
+
+def conhecimento(p):
+    '''
+    Retorna o conhecimento do jogador p como um conhecimento_denso (owg_conhecimento): o próprio knowledge,
+    se o jogador já usa o armazenamento denso, ou uma cópia dele em arrays. Retorna None se p não aprende.
+    '''
+    campos = p.campos_conhecimento()
+    if campos is None:
+        return None
+    if isinstance(p.knowledge, conhecimento_denso):
+        return p.knowledge
+    return conhecimento_denso.de_dict(p.knowledge, campos, p.chave_inteira)
+
+
+def devolve_conhecimento(p, denso):
+    '''
+    Escreve de volta no knowledge do jogador p as posições visitadas de denso (ver conhecimento). Nada a
+    fazer se denso é o próprio knowledge do jogador.
+    '''
+    if denso is None or denso is p.knowledge:
+        return
+    denso.chave_inteira = p.chave_inteira
+    p.knowledge.update(denso)
+
+
+def decide_lote(p, denso, rng, chaves):
+    '''
+    Decide o lance do jogador p em cada uma das posições chaves (array de istates do ponto de vista dele,
+    com a partida em andamento), com a regra de decisão de p (ver regras) aplicada em lote sobre o
+    conhecimento denso (ver conhecimento) e sorteios do gerador rng. Usada pelo simulador e por owg_player.decide_many.
+
+    @returns
+
+    ids, acao_chave, acao -- id da posição de knowledge (a canônica, se o jogador usa simetria), a ação
+    nas casas dessa posição (a que é aprendida) e a casa correspondente no tabuleiro real
+    '''
+    T = tabela()
+    decisao, tatica = regras(p)
+    simetria = p.simetria
+    n = len(chaves)
+    if simetria:
+        transf = TRANSFORMACAO[chaves]
+        ids = T.decisao_ids[CANONICO[chaves]]
+    else:
+        ids = T.decisao_ids[chaves]
+    legal = T.decisao_legal[ids]
+
+    if decisao == 'aleatorio':
+        valor = rng.random((n, 9))
+    elif decisao == 'media':
+        alfa = denso.valores('alfa', ids)
+        valor = alfa / (alfa + denso.valores('beta', ids))
+    elif decisao == 'thompson':
+        valor = rng.beta(denso.valores('alfa', ids), denso.valores('beta', ids))
+    elif decisao == 'epsilon':
+        valor = denso.valores('rec', ids)
+        explora = rng.random(n) < p.e
+        valor[explora] = rng.random((explora.sum(), 9))
+    elif decisao == 'otimo':
+        # Valor exato de cada lance, com um sorteio menor que 1 para desempatar entre os ótimos
+        valor = solucao().lances[ids] + rng.random((n, 9)) / 2
+        explora = rng.random(n) < p.erro
+        valor[explora] = rng.random((explora.sum(), 9))
+    valor[~legal] = -np.inf
+    acao = np.argmax(valor, axis = 1)
+
+    if simetria:
+        real = PARA_REAL[transf, acao]
+    else:
+        real = acao
+    if tatica:
+        # A varredura é feita no tabuleiro real
+        t = T.tatica_array[chaves]
+        real = np.where(t >= 0, t, real)
+        if simetria:
+            acao = np.where(t >= 0, PARA_CANONICA[transf, np.maximum(t, 0)], acao)
+        else:
+            acao = real
+    return ids, acao, real
+
+
+class simulador:
+    '''
+    Classe simulador: joga N partidas entre dois jogadores ao mesmo tempo, em lockstep. Os tabuleiros ficam
+    num array (N, 9) (2 = casa vazia, 1 = marca de p1, 0 = marca de p2), cada passo avança um lance em todas
+    as partidas em andamento, e o fim de jogo é detectado para o lote todo com as 8 linhas vencedoras.
+
+    As regras de decisão e de aprendizagem são as mesmas das classes de owg_players, aplicadas em lote
+    sobre o conhecimento denso de cada jogador (ver conhecimento): se o knowledge do jogador já é um
+    conhecimento_denso, ele é atualizado diretamente; senão, o simulador trabalha numa cópia, escrita de
+    volta por exporta. Duas diferenças:
+        - o conhecimento é atualizado ao final de cada lote, e não ao final de cada partida: as partidas
+          de um mesmo lote decidem com o mesmo conhecimento;
+        - os dois jogadores sempre aprendem com o resultado (no laço do notebook, quem perde sem ser
+          chamado de novo para joga não registra a derrota).
+    Se p1 e p2 são o mesmo objeto, os dois lados compartilham (e atualizam) o mesmo conhecimento. Jogadores
+    com simetria (usa_simetria) decidem e aprendem nas posições canônicas, como em joga.
+    '''
+    def __init__(self, p1, p2, seed = None):
+        '''
+        @args
+
+        p1, p2 -- jogadores (objetos das classes de owg_players)
+        seed -- semente do gerador de números aleatórios
+        '''
+        self.jogadores = [p1, p2]
+        self.regras = [regras(p1), regras(p2)]
+        d1 = conhecimento(p1)
+        d2 = d1 if p2 is p1 else conhecimento(p2)
+        self.denso = [d1, d2]
+        self.rng = np.random.default_rng(seed)
+        # Número de partidas já jogadas, para alternar quem começa como no notebook, e de lances
+        self.n_jogos = 0
+        self.n_movimentos = 0
+
+    def __decide(self, lado, chaves):
+        '''
+        Decide o lance do jogador lado em cada uma das posições chaves (ver decide_lote)
+        '''
+        return decide_lote(self.jogadores[lado], self.denso[lado], self.rng, chaves)
+
+    def __aprende(self, lado, ids, acoes, n_mov, r):
+        '''
+        Aplica a regra de aprendizagem do jogador lado às partidas terminadas, todas de uma vez
+
+        @args
+
+        ids, acoes -- arrays (N, 5) com o id da posição e a ação de cada lance do jogador
+        n_mov -- número de lances do jogador em cada partida
+        r -- resultado de cada partida do ponto de vista do jogador
+        '''
+        p = self.jogadores[lado]
+        denso = self.denso[lado]
+        if denso is None or denso.somente_leitura:
+            return
+        valido = np.arange(ids.shape[1])[None, :] < n_mov[:, None]
+        ii = ids[valido]
+        aa = acoes[valido]
+        rr = np.broadcast_to(r[:, None], ids.shape)[valido]
+        # Peso de cada lance: o i-ésimo de n lances recebe desconto**(n - i) (1 sem desconto)
+        peso = p._potencias_desconto()[(n_mov[:, None] - np.arange(ids.shape[1])[None, :])[valido]]
+        for resultado in (1, 0, -1):
+            sel = rr == resultado
+            if not sel.any():
+                continue
+            for campo, sinal in p._credito(resultado):
+                denso.soma(campo, ii[sel], aa[sel], sinal * peso[sel])
+        denso.visitado[ii] = True
+
+    def roda(self, n_jogos):
+        '''
+        Joga n_jogos partidas, todas ao mesmo tempo, e aplica o aprendizado ao final. As casas jogadas em
+        cada partida, em ordem, ficam em self.lances (array (n_jogos, 9), -1 depois do último lance) e quem
+        começou cada uma (0 para p1, 1 para p2) em self.primeiro, até a próxima chamada.
+
+        @returns
+
+        array com o resultado de cada partida do ponto de vista de p1 (1 vitória, 0 empate, -1 derrota)
+        '''
+        N = n_jogos
+        tab = np.full((N, 9), 2, dtype = np.int8)
+        # Chave de cada partida do ponto de vista de cada lado: p1 joga com 1, p2 com 0, e cada um se vê como 1
+        chaves = np.full((N, 2), VAZIO, dtype = np.int64)
+        # Lado da vez: p1 (0) começa as partidas de índice par, como no notebook
+        vez = ((np.arange(N) + self.n_jogos) % 2).astype(np.int8)
+        marca = np.array([1, 0], dtype = np.int8)
+
+        ids = np.zeros((N, 2, 5), dtype = np.int64)
+        acoes = np.zeros((N, 2, 5), dtype = np.int64)
+        n_mov = np.zeros((N, 2), dtype = np.int64)
+        lances = np.full((N, 9), -1, dtype = np.int8)
+        primeiro = vez.copy()
+        resultado = np.zeros(N, dtype = np.int8)
+        ativo = np.arange(N)
+
+        while len(ativo) > 0:
+            for lado in (0, 1):
+                sel = ativo[vez[ativo] == lado]
+                if len(sel) == 0:
+                    continue
+                id_chave, acao_chave, acao = self.__decide(lado, chaves[sel, lado])
+                k = n_mov[sel, lado]
+                lances[sel, n_mov[sel, 0] + n_mov[sel, 1]] = acao
+                ids[sel, lado, k] = id_chave
+                acoes[sel, lado, k] = acao_chave
+                n_mov[sel, lado] += 1
+                tab[sel, acao] = marca[lado]
+                chaves[sel, lado] -= _POT[acao]
+                chaves[sel, 1 - lado] -= 2 * _POT[acao]
+
+            # Fim de jogo: alguma linha com três marcas iguais, ou tabuleiro cheio
+            linhas = tab[ativo][:, _LINHAS]
+            venceu1 = np.all(linhas == 1, axis = 2).any(axis = 1)
+            venceu2 = np.all(linhas == 0, axis = 2).any(axis = 1)
+            cheio = ~np.any(tab[ativo] == 2, axis = 1)
+            resultado[ativo] = np.where(venceu1, 1, np.where(venceu2, -1, 0))
+            acabou = venceu1 | venceu2 | cheio
+            vez[ativo] = 1 - vez[ativo]
+            ativo = ativo[~acabou]
+
+        self.__aprende(0, ids[:, 0], acoes[:, 0], n_mov[:, 0], resultado)
+        self.__aprende(1, ids[:, 1], acoes[:, 1], n_mov[:, 1], -resultado)
+        self.n_jogos += N
+        self.n_movimentos += int(n_mov.sum())
+        self.lances = lances
+        self.primeiro = primeiro
+        return resultado
+
+    def exporta(self):
+        '''
+        Escreve o conhecimento acumulado de volta no knowledge dos jogadores
+        '''
+        devolve_conhecimento(self.jogadores[0], self.denso[0])
+        if self.jogadores[1] is not self.jogadores[0]:
+            devolve_conhecimento(self.jogadores[1], self.denso[1])
+
+
+def simula(p1, p2, n_jogos, lote = 4096, seed = None):
+    '''
+    Treina p1 contra p2 por n_jogos partidas usando o simulador vetorizado, em lotes de lote partidas,
+    e escreve o conhecimento final de volta nos jogadores.
+
+    @returns
+
+    vitorias, empates, derrotas -- contagens do ponto de vista de p1
+    '''
+    sim = simulador(p1, p2, seed)
+    contagem = np.zeros(3, dtype = np.int64)
+    feitos = 0
+    while feitos < n_jogos:
+        n = min(lote, n_jogos - feitos)
+        r = sim.roda(n)
+        contagem += np.bincount(r + 1, minlength = 3)
+        feitos += n
+    sim.exporta()
+    return int(contagem[2]), int(contagem[1]), int(contagem[0])
@@ -0,0 +1,314 @@
+# Tabela do espaço de estados do jogo da velha
+
+import os
+import tempfile
+import zipfile
+from functools import lru_cache
+
+import numpy as np
+
+# Codificação das posições: a casa k = 3*linha + coluna é o dígito de peso 3**(8-k) de um inteiro em base 3,
+# com 0 = O, 1 = X e 2 = casa vazia. A string sstate é a representação desse inteiro com nove dígitos.
+POT = [3**(8 - k) for k in range(9)]
+
+# istate do tabuleiro vazio ('222222222')
+VAZIO = 3**9 - 1
+
+# Número de códigos possíveis (inclusive posições inalcançáveis)
+N_CODIGOS = 3**9
+
+# Linhas vencedoras, na mesma ordem em que owg_core.check_result sempre as verificou.
+# Cada entrada é (máscara de bits das casas, jogador, resultado, motivo); a casa k é o bit 1 << k.
+VITORIAS = []
+for _i in range(3):
+    VITORIAS.append((0b111 << 3*_i, 1, 1, (3, _i)))
+for _i in range(3):
+    VITORIAS.append((0b111 << 3*_i, 0, -1, (3, _i)))
+for _j in range(3):
+    VITORIAS.append((0b1001001 << _j, 1, 1, (_j, 3)))
+for _j in range(3):
+    VITORIAS.append((0b1001001 << _j, 0, -1, (_j, 3)))
+VITORIAS.append((0b100010001, 0, -1, (-3, -3)))
+VITORIAS.append((0b100010001, 1, 1, (-3, -3)))
+VITORIAS.append((0b001010100, 0, -1, (3, 3)))
+VITORIAS.append((0b001010100, 1, 1, (3, 3)))
+
+# As 8 linhas (sem repetição), como listas de casas
+LINHAS = [[k for k in range(9) if m >> k & 1] for (m, jog, _, _) in VITORIAS if jog == 1]
+
+# Motivos possíveis, na ordem usada para gravar a tabela em disco
+MOTIVOS = [(3, 0), (3, 1), (3, 2), (0, 3), (1, 3), (2, 3), (-3, -3), (3, 3)]
+
+# Versão do formato do arquivo de cache; incrementar sempre que o conteúdo da tabela mudar
+VERSAO = 1
+
+
+@lru_cache(maxsize = None)
+def istate_para_sstate(istate):
+    '''
+    Converte a posição codificada como inteiro (istate) na string de nove dígitos (sstate)
+    '''
+    s = ''
+    for p in POT:
+        s += '012'[istate // p % 3]
+    return s
+
+
+def sstate_para_istate(sstate):
+    '''
+    Converte a string de nove dígitos (sstate) no inteiro correspondente (istate)
+    '''
+    return int(sstate, 3)
+
+
+def _resultado(sstate):
+    '''
+    Resultado da posição, com o mesmo contrato de owg_core.check_result
+    '''
+    for (m, jog, r, motivo) in VITORIAS:
+        if all(sstate[k] == str(jog) for k in range(9) if m >> k & 1):
+            return r, motivo
+    if '2' in sstate:
+        return None, None
+    return 0, None
+
+
+def _tatica(sstate):
+    '''
+    Varredura de um lance à frente usada por miope e pelos cientistas cauteloso e esperto: procura uma
+    linha com duas marcas iguais e uma casa vazia, e retorna a casa vazia (ou None). A ordem da varredura
+    (e portanto a casa escolhida quando há mais de uma) é a mesma do código original dos jogadores.
+    '''
+    padroes = ['121', '020', '112', '002', '211', '200']
+    mov = None
+    for i in range(3):
+        # Verifica linhas
+        linha = sstate[(3*i):((3*i+3))]
+        if linha in padroes:
+            j = linha.find('2')
+            mov = (i, j)
+            break
+        # Verifica colunas
+        coluna = sstate[i:i+7:3]
+        if coluna in padroes:
+            j = coluna.find('2')
+            mov = (j, i)
+            break
+    # Verifica diagonais
+    diagp = sstate[0:9:4]
+    if diagp in padroes:
+        j = diagp.find('2')
+        mov = (j, j)
+    diags = sstate[2:7:2]
+    if diags in padroes:
+        j = diags.find('2')
+        mov = (j, 2-j)
+    if mov is None:
+        return None
+    return 3*mov[0] + mov[1]
+
+
+def _ameacas(sstate, jogador):
+    '''
+    Casas vazias que completam uma linha do jogador ('0' ou '1') se ele jogar nelas
+    '''
+    casas = set()
+    for linha in LINHAS:
+        valores = [sstate[k] for k in linha]
+        if valores.count(jogador) == 2 and valores.count('2') == 1:
+            casas.add(linha[valores.index('2')])
+    return tuple(sorted(casas))
+
+
+def _alcancaveis():
+    '''
+    Enumera as posições alcançáveis a partir do tabuleiro vazio, com qualquer um dos jogadores começando.
+    Retorna o conjunto dos istates.
+    '''
+    vistos = {VAZIO}
+    fronteira = [VAZIO]
+    while fronteira:
+        nova = []
+        for istate in fronteira:
+            s = istate_para_sstate(istate)
+            if _resultado(s)[0] is not None:
+                continue
+            n0 = s.count('0')
+            n1 = s.count('1')
+            # Quem pode jogar: com contagens iguais, qualquer um (depende de quem começou)
+            jogadores = [j for j in (0, 1) if (j == 0 and n0 <= n1) or (j == 1 and n1 <= n0)]
+            for k in range(9):
+                if s[k] == '2':
+                    for j in jogadores:
+                        prox = istate + (j - 2) * POT[k]
+                        if prox not in vistos:
+                            vistos.add(prox)
+                            nova.append(prox)
+        fronteira = nova
+    return vistos
+
+
+def _mascara(casas):
+    m = 0
+    for k in casas:
+        m |= 1 << k
+    return m
+
+
+# Casas correspondentes a cada máscara de 9 bits
+_CASAS = [tuple(k for k in range(9) if m >> k & 1) for m in range(512)]
+
+
+def _calcula():
+    '''
+    Calcula a tabela completa e retorna o dicionário de arrays no formato do arquivo de cache
+    '''
+    istates = np.array(sorted(_alcancaveis()), dtype = np.int32)
+    legais = np.zeros(N_CODIGOS, dtype = np.uint16)
+    resultado = np.zeros(N_CODIGOS, dtype = np.int8)
+    motivo = np.zeros(N_CODIGOS, dtype = np.int8)
+    vence = np.zeros(N_CODIGOS, dtype = np.uint16)
+    bloqueia = np.zeros(N_CODIGOS, dtype = np.uint16)
+    tatica = np.zeros(N_CODIGOS, dtype = np.int8)
+    for istate in range(N_CODIGOS):
+        s = istate_para_sstate(istate)
+        legais[istate] = _mascara(k for k in range(9) if s[k] == '2')
+        r, mot = _resultado(s)
+        # Resultado em disco: 2 para jogo em andamento
+        resultado[istate] = 2 if r is None else r
+        motivo[istate] = -1 if mot is None else MOTIVOS.index(mot)
+        vence[istate] = _mascara(_ameacas(s, '1'))
+        bloqueia[istate] = _mascara(_ameacas(s, '0'))
+        t = _tatica(s)
+        tatica[istate] = -1 if t is None else t
+    return dict(versao = np.array(VERSAO), istates = istates, legais = legais, resultado = resultado,
+                motivo = motivo, vence = vence, bloqueia = bloqueia, tatica = tatica)
+
+
+def diretorio_cache():
+    '''
+    Diretório onde ficam os arquivos gerados (tabela, soluções). Pode ser definido pela variável de
+    ambiente OWG_CACHE; o padrão é ~/.cache/owg
+    '''
+    return os.environ.get('OWG_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'owg'))
+
+
+def le_cache(arquivo, versao):
+    '''
+    Lê um arquivo .npz do cache e retorna o dicionário nome : array, ou None se o arquivo não existe, é de
+    outra versão, ou está corrompido ou ilegível (nesses casos quem chama recalcula)
+    '''
+    if not os.path.exists(arquivo):
+        return None
+    try:
+        with np.load(arquivo) as npz:
+            if int(npz['versao']) != versao:
+                return None
+            return {k : npz[k] for k in npz.files}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def grava_cache(arquivo, **arrays):
+    '''
+    Grava os arrays num arquivo .npz do cache, atomicamente: o arquivo é escrito num temporário no mesmo
+    diretório e só então renomeado (os.replace), para que um processo que abre o cache ao mesmo tempo (por
+    exemplo os de owg_paralelo) nunca leia um arquivo pela metade. Sem permissão para gravar, não faz nada.
+    '''
+    try:
+        diretorio = os.path.dirname(arquivo) or '.'
+        os.makedirs(diretorio, exist_ok = True)
+        fd, tmp = tempfile.mkstemp(dir = diretorio, suffix = '.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as arq:
+            np.savez(arq, **arrays)
+        # mkstemp cria o arquivo só para o dono; o cache fica legível como um arquivo comum
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, arquivo)
+    except OSError:
+        # Sem espaço ou sem permissão: segue com os dados em memória
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+class tabela_posicoes:
+    '''
+    Classe tabela_posicoes: tudo o que se precisa saber sobre cada posição, calculado uma única vez.
+    As listas são indexadas diretamente pelo istate da posição (consulta O(1)):
+
+    legais -- tupla com as casas vazias
+    resultado -- par (resultado, motivo), com o mesmo contrato de owg_core.check_result
+    vencedoras -- tupla com as casas em que o jogador 1 vence imediatamente
+    bloqueios -- tupla com as casas em que o jogador 0 venceria (bloqueios forçados para o jogador 1)
+    tatica -- casa escolhida pela varredura de um lance à frente de miope / cientista_cauteloso, ou None
+    ids -- índice da posição entre as alcançáveis (0, ..., n_posicoes - 1), ou -1 se inalcançável
+
+    istates é o array com o istate de cada posição alcançável, na ordem dos ids.
+
+    As posições de decisão são as alcançáveis em que o jogo não acabou e é a vez do jogador 1, ou seja, as
+    posições que um jogador (que sempre se vê como o jogador 1) encontra ao decidir um lance. São elas que
+    aparecem em knowledge; decisao_ids, decisao_istates e n_decisoes fazem o mesmo papel de ids, istates e
+    n_posicoes para elas, e decisao_legal é a máscara (n_decisoes, 9) das casas vazias.
+    '''
+    def __init__(self, dados):
+        self.istates = dados['istates']
+        self.n_posicoes = len(self.istates)
+        self.ids = np.full(N_CODIGOS, -1, dtype = np.int32)
+        self.ids[self.istates] = np.arange(self.n_posicoes, dtype = np.int32)
+
+        self.legais = [_CASAS[m] for m in dados['legais'].tolist()]
+        motivos = [MOTIVOS[m] if m >= 0 else None for m in dados['motivo'].tolist()]
+        self.resultado = [(None if r == 2 else r, m) for r, m in zip(dados['resultado'].tolist(), motivos)]
+        self.vencedoras = [_CASAS[m] for m in dados['vence'].tolist()]
+        self.bloqueios = [_CASAS[m] for m in dados['bloqueia'].tolist()]
+        self.tatica = [None if t < 0 else t for t in dados['tatica'].tolist()]
+
+        # Versões em array, para uso vetorizado
+        self.legais_mask = dados['legais']
+        self.resultado_array = dados['resultado']
+        self.tatica_array = dados['tatica']
+
+        # Posições de decisão: jogo em andamento e no máximo tantas marcas do jogador 1 quanto do 0
+        digitos = self.istates[:, None] // np.array(POT) % 3
+        n0 = (digitos == 0).sum(axis = 1)
+        n1 = (digitos == 1).sum(axis = 1)
+        decisao = (self.resultado_array[self.istates] == 2) & (n1 <= n0)
+        self.decisao_istates = self.istates[decisao]
+        self.n_decisoes = len(self.decisao_istates)
+        self.decisao_ids = np.full(N_CODIGOS, -1, dtype = np.int32)
+        self.decisao_ids[self.decisao_istates] = np.arange(self.n_decisoes, dtype = np.int32)
+        self.decisao_legal = (self.legais_mask[self.decisao_istates][:, None] >> np.arange(9)) & 1 == 1
+
+
+def carrega_tabela(arquivo = None):
+    '''
+    Carrega a tabela do arquivo de cache; se o arquivo não existir (ou for de outra versão, ou estiver
+    corrompido), calcula a tabela e tenta gravá-la (ver grava_cache).
+
+    @args
+
+    arquivo -- caminho do arquivo .npz. Se None, usa tabela_v<VERSAO>.npz em diretorio_cache()
+    '''
+    if arquivo is None:
+        arquivo = os.path.join(diretorio_cache(), 'tabela_v{}.npz'.format(VERSAO))
+    dados = le_cache(arquivo, VERSAO)
+    if dados is None:
+        dados = _calcula()
+        grava_cache(arquivo, **dados)
+    return tabela_posicoes(dados)
+
+
+_TABELA = None
+
+def tabela():
+    '''
+    Retorna a tabela de posições do processo, carregando-a na primeira chamada
+    '''
+    global _TABELA
+    if _TABELA is None:
+        _TABELA = carrega_tabela()
+    return _TABELA
@@ -0,0 +1,238 @@
+# Telemetria do treino: contadores do knowledge dos jogadores e do laço de treinamento, em JSON ou Prometheus
+
+import collections
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from owg_conhecimento import conhecimento_denso
+from owg_simetria import CANONICO
+from owg_tabela import sstate_para_istate, tabela
+
+
+def _jogadas(istates):
+    # Número do lance (casas ocupadas) de cada posição
+    mascaras = tabela().legais_mask[np.asarray(istates, dtype = np.int64)]
+    return 9 - np.array([bin(m).count('1') for m in mascaras.tolist()], dtype = np.int64)
+
+
+def _memoria_processo():
+    '''
+    Memória residente do processo, em bytes (pico, se o sistema não informa a atual), ou None
+    '''
+    try:
+        with open('/proc/self/statm') as arq:
+            return int(arq.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def metricas_jogador(p, knowledge = None):
+    '''
+    Contadores do conhecimento do jogador p
+
+    @args
+
+    p -- jogador
+    knowledge -- conhecimento a medir, se não for o do próprio jogador (por exemplo o conhecimento denso do
+                 simulador durante um treino vetorizado)
+
+    @returns
+
+    dicionário com posicoes (posições em knowledge), cobertura (fração das posições de decisão, ou das
+    canônicas se o jogador usa simetria), posicoes_por_jogada e visitas_por_jogada (listas de 9 contagens,
+    pelo número do lance da posição; as visitas são a soma dos campos acima da priori, ou seja, os lances
+    que receberam crédito, e só existem para os jogadores com o modelo Beta) e bytes (memória dos arrays do
+    conhecimento denso, ou o tamanho de knowledge serializado com pickle). Vazio se p não aprende.
+    '''
+    campos = p.campos_conhecimento()
+    if campos is None:
+        return dict()
+    T = tabela()
+    knowledge = p.knowledge if knowledge is None else knowledge
+    beta = 'alfa' in campos and 'beta' in campos
+    posicoes = np.zeros(9, dtype = np.int64)
+    visitas = np.zeros(9)
+    if isinstance(knowledge, conhecimento_denso):
+        ids = np.flatnonzero(knowledge.visitado)
+        jogada = _jogadas(T.decisao_istates[ids])
+        posicoes += np.bincount(jogada, minlength = 9)
+        if beta:
+            n = (knowledge.dados['alfa'][ids] + knowledge.dados['beta'][ids]).sum(axis = 1)
+            visitas += np.bincount(jogada, weights = n, minlength = 9)
+        tamanho = knowledge.nbytes()
+    else:
+        chaves = list(knowledge.keys())
+        jogada = _jogadas([sstate_para_istate(c) if isinstance(c, str) else c for c in chaves]) if chaves else []
+        posicoes += np.bincount(jogada, minlength = 9)
+        if beta:
+            a, b = campos['alfa'], campos['beta']
+            for c, j in zip(chaves, jogada):
+                _, alfa, bet = knowledge[c][:3]
+                visitas[j] += sum(alfa) + sum(bet) - (a + b) * len(alfa)
+        tamanho = len(pickle.dumps(knowledge, protocol = pickle.HIGHEST_PROTOCOL))
+    total = len(np.unique(CANONICO[T.decisao_istates])) if p.simetria else T.n_decisoes
+    res = {'posicoes' : int(posicoes.sum()), 'cobertura' : float(posicoes.sum()) / total,
+           'posicoes_por_jogada' : posicoes.tolist(), 'bytes' : int(tamanho)}
+    if beta:
+        res['visitas_por_jogada'] = visitas.tolist()
+    return res
+
+
+class telemetria:
+    '''
+    Classe telemetria: a cada chamada de registra (o laço de treinamento chama a cada relatório, ver
+    owg_treino.train) calcula os contadores do treino e dos jogadores e os grava em arquivo, para um coletor
+    local:
+
+    - formato 'json': uma linha JSON por registro, acrescentada ao arquivo
+    - formato 'prometheus': o arquivo é reescrito a cada registro no formato de texto do Prometheus (para o
+      coletor de arquivos de texto do node_exporter, por exemplo)
+
+    Contadores do treino: jogos, movimentos, jogos_por_s e movimentos_por_s (desde o registro anterior),
+    taxas de vitória, empate e derrota de p1 nas últimas janela partidas (aproximadas pelos registros) e a
+    memória do processo. De cada jogador que aprende: os de metricas_jogador, e posicoes_novas_por_10k (novas
+    posições em knowledge por 10 mil partidas, desde o registro anterior).
+
+    @args
+
+    arquivo -- arquivo de saída (None para só calcular)
+    formato -- 'json' ou 'prometheus'
+    janela -- número de partidas da janela das taxas
+    '''
+    FORMATOS = ('json', 'prometheus')
+
+    def __init__(self, arquivo = None, formato = 'json', janela = 10000):
+        if formato not in self.FORMATOS:
+            raise ValueError("Erro! formato de telemetria desconhecido: {}".format(formato))
+        self.arquivo = arquivo
+        self.formato = formato
+        self.janela = janela
+        self.historico = collections.deque()
+        self.anterior = None
+
+    def __janela(self, estado):
+        # Taxas nas últimas janela partidas, a partir das contagens acumuladas de cada registro
+        atual = (estado['jogos'], estado['vitorias'], estado['empates'], estado['derrotas'])
+        self.historico.append(atual)
+        while len(self.historico) > 1 and self.historico[1][0] <= atual[0] - self.janela:
+            self.historico.popleft()
+        inicio = self.historico[0] if len(self.historico) > 1 and self.historico[0][0] <= atual[0] - self.janela \
+            else (0, 0, 0, 0)
+        n = atual[0] - inicio[0]
+        if n <= 0:
+            return {'vitoria' : 0., 'empate' : 0., 'derrota' : 0.}
+        return {r : (atual[k] - inicio[k]) / n for k, r in ((1, 'vitoria'), (2, 'empate'), (3, 'derrota'))}
+
+    def registra(self, estado, jogadores, conhecimentos = None):
+        '''
+        Calcula e grava os contadores
+
+        @args
+
+        estado -- dicionário do estado do treino (jogos, movimentos, vitorias, empates, derrotas, segundos),
+                  como em owg_treino.train
+        jogadores -- lista [p1, p2]; se p2 é p1, o jogador aparece uma vez só
+        conhecimentos -- conhecimento de cada jogador, se não for o próprio knowledge (treino vetorizado)
+
+        @returns
+
+        o dicionário dos contadores
+        '''
+        conhecimentos = [None] * len(jogadores) if conhecimentos is None else conhecimentos
+        anterior = self.anterior
+        dj = estado['jogos'] - (anterior['jogos'] if anterior else 0)
+        ds = estado['segundos'] - (anterior['segundos'] if anterior else 0.)
+        dm = estado['movimentos'] - (anterior['movimentos'] if anterior else 0)
+        metricas = {
+            'tempo' : time.time(),
+            'jogos' : estado['jogos'],
+            'movimentos' : estado['movimentos'],
+            'segundos' : estado['segundos'],
+            'jogos_por_s' : dj / ds if ds > 0 else 0.,
+            'movimentos_por_s' : dm / ds if ds > 0 else 0.,
+            'taxas' : self.__janela(estado),
+            'memoria_processo' : _memoria_processo(),
+            'jogadores' : dict(),
+        }
+        vistos = []
+        for nome, p, k in zip(('p1', 'p2'), jogadores, conhecimentos):
+            if any(p is q for q in vistos):
+                continue
+            vistos.append(p)
+            m = metricas_jogador(p, k)
+            if not m:
+                continue
+            m['classe'] = type(p).__name__
+            antes = anterior['jogadores'].get(nome) if anterior else None
+            m['posicoes_novas_por_10k'] = (m['posicoes'] - (antes['posicoes'] if antes else 0)) / dj * 10000 \
+                if dj > 0 else 0.
+            metricas['jogadores'][nome] = m
+        self.anterior = metricas
+        if self.arquivo is not None:
+            self.grava(metricas)
+        return metricas
+
+    def grava(self, metricas):
+        '''
+        Grava os contadores no arquivo, no formato da telemetria
+        '''
+        if self.formato == 'json':
+            with open(self.arquivo, 'a') as arq:
+                arq.write(json.dumps(metricas) + '\n')
+            return
+        # Prometheus: reescreve o arquivo inteiro, por um temporário, para o coletor nunca ler um arquivo pela metade
+        tmp = self.arquivo + '.tmp'
+        with open(tmp, 'w') as arq:
+            arq.write(prometheus(metricas))
+        os.replace(tmp, self.arquivo)
+
+
+def prometheus(metricas):
+    '''
+    Converte os contadores de telemetria.registra para o formato de texto do Prometheus
+    '''
+    linhas = []
+
+    def metrica(nome, tipo, ajuda, valores):
+        linhas.append('# HELP owg_{} {}'.format(nome, ajuda))
+        linhas.append('# TYPE owg_{} {}'.format(nome, tipo))
+        for rotulos, v in valores:
+            if v is None:
+                continue
+            r = ','.join('{}="{}"'.format(k, x) for k, x in rotulos.items())
+            linhas.append('owg_{}{} {}'.format(nome, '{' + r + '}' if r else '', repr(float(v))))
+
+    metrica('jogos_total', 'counter', 'Partidas jogadas', [({}, metricas['jogos'])])
+    metrica('movimentos_total', 'counter', 'Lances jogados', [({}, metricas['movimentos'])])
+    metrica('treino_segundos_total', 'counter', 'Tempo de treino', [({}, metricas['segundos'])])
+    metrica('jogos_por_segundo', 'gauge', 'Partidas por segundo desde o registro anterior',
+            [({}, metricas['jogos_por_s'])])
+    metrica('movimentos_por_segundo', 'gauge', 'Lances por segundo desde o registro anterior',
+            [({}, metricas['movimentos_por_s'])])
+    metrica('taxa_resultado', 'gauge', 'Fração dos resultados de p1 na janela de partidas',
+            [({'resultado' : r}, v) for r, v in metricas['taxas'].items()])
+    metrica('memoria_processo_bytes', 'gauge', 'Memória residente do processo',
+            [({}, metricas['memoria_processo'])])
+    jog = metricas['jogadores']
+    rot = {nome : {'jogador' : nome, 'classe' : m['classe']} for nome, m in jog.items()}
+    metrica('posicoes', 'gauge', 'Posições em knowledge', [(rot[n], m['posicoes']) for n, m in jog.items()])
+    metrica('cobertura', 'gauge', 'Fração das posições de decisão em knowledge',
+            [(rot[n], m['cobertura']) for n, m in jog.items()])
+    metrica('posicoes_novas_por_10k', 'gauge', 'Novas posições em knowledge por 10 mil partidas',
+            [(rot[n], m['posicoes_novas_por_10k']) for n, m in jog.items()])
+    metrica('conhecimento_bytes', 'gauge', 'Tamanho do knowledge', [(rot[n], m['bytes']) for n, m in jog.items()])
+    metrica('posicoes_por_jogada', 'gauge', 'Posições em knowledge pelo número do lance',
+            [(dict(rot[n], jogada = j), v) for n, m in jog.items() for j, v in enumerate(m['posicoes_por_jogada'])])
+    metrica('visitas_por_jogada', 'gauge', 'Lances com crédito em knowledge pelo número do lance',
+            [(dict(rot[n], jogada = j), v) for n, m in jog.items() if 'visitas_por_jogada' in m
+             for j, v in enumerate(m['visitas_por_jogada'])])
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,281 @@
+# Treinamento por self-learning: função train e linha de comando
+
+import argparse
+import os
+import pickle
+import time
+
+import owg_players
+
+
+def partida(p1, p2, lances = None):
+    '''
+    Joga uma partida completa entre p1 e p2, com p1 começando. Se lances é uma lista, as casas jogadas
+    (3 * linha + coluna) são acrescentadas a ela, em ordem.
+
+    A partida termina quando o jogador da vez devolve None em joga; essa última chamada é a que avisa
+    esse jogador do fim do jogo (é nela que quem perdeu registra a derrota).
+
+    @returns
+
+    r, movimentos -- resultado do ponto de vista de p1 (1, 0 ou -1) e número de lances da partida
+    '''
+    vez, outro = p1, p2
+    movimentos = 0
+    movimento = vez.joga()
+    while movimento is not None:
+        movimentos += 1
+        if lances is not None:
+            lances.append(3 * movimento[0] + movimento[1])
+        outro.comunica(movimento)
+        vez, outro = outro, vez
+        movimento = vez.joga()
+    r, _ = p1.board.check_result()
+    return r, movimentos
+
+
+def salva_checkpoint(arquivo, p1, p2, estado):
+    '''
+    Grava os jogadores e o estado do treinamento. A gravação é feita num arquivo temporário e depois
+    renomeada, para que uma interrupção no meio não corrompa o checkpoint anterior.
+    '''
+    tmp = arquivo + '.tmp'
+    with open(tmp, 'wb') as arq:
+        pickle.dump({'p1' : p1, 'p2' : p2, 'estado' : estado}, arq)
+    os.replace(tmp, arquivo)
+
+
+def carrega_checkpoint(arquivo):
+    '''
+    Lê um checkpoint gravado por salva_checkpoint
+
+    @returns
+
+    p1, p2, estado
+    '''
+    with open(arquivo, 'rb') as arq:
+        dados = pickle.load(arq)
+    return dados['p1'], dados['p2'], dados['estado']
+
+
+def train(p1, p2, n_games, checkpoint = None, intervalo_checkpoint = None, intervalo_relatorio = 10000,
+          vetorizado = False, lote = 4096, seed = None, estado = None, verbose = True, telemetria = None,
+          estatisticas = None, registro = None):
+    '''
+    Treina p1 contra p2 por n_games partidas, alternando quem começa (p1 começa as partidas pares),
+    como no laço do notebook.
+
+    @args
+
+    p1, p2 -- jogadores; p2 pode ser o próprio p1 apenas no modo vetorizado
+    n_games -- número total de partidas (contando as já jogadas, se estado vier de um checkpoint)
+    checkpoint -- arquivo onde gravar os checkpoints (None para não gravar)
+    intervalo_checkpoint -- grava um checkpoint a cada intervalo_checkpoint partidas (e ao final)
+    intervalo_relatorio -- imprime o progresso a cada intervalo_relatorio partidas
+    vetorizado -- se True, joga com o simulador vetorizado (owg_simulador) em lotes de lote partidas
+    seed -- semente do simulador vetorizado
+    estado -- estado de um treinamento anterior, para continuar de onde parou (ver retoma)
+    verbose -- imprime o progresso
+    telemetria -- objeto owg_telemetria.telemetria, que registra os contadores a cada relatório
+    estatisticas -- objeto owg_estatisticas.estatisticas, que recebe o resultado de cada partida (para as
+                    taxas numa janela e os gráficos, com memória constante)
+    registro -- objeto owg_registro.gravador, que grava as partidas no registro binário de partidas
+
+    @returns
+
+    dicionário com as contagens (vitorias, empates, derrotas do ponto de vista de p1), o número de
+    partidas e de lances, o tempo e as taxas jogos_por_s e movimentos_por_s; se algum jogador tem o perfil
+    ligado (usa_perfil), também perfil: lista com o instantâneo do perfil de p1 e de p2 (None se desligado)
+    '''
+    if estado is None:
+        estado = {'jogos' : 0, 'vitorias' : 0, 'empates' : 0, 'derrotas' : 0, 'movimentos' : 0, 'segundos' : 0.}
+    if p2 is p1 and not vetorizado:
+        raise ValueError("Erro! no modo objeto p1 e p2 precisam ser jogadores diferentes")
+
+    sim = None
+    if vetorizado:
+        from owg_simulador import simulador
+        sim = simulador(p1, p2, seed)
+        sim.n_jogos = estado['jogos']
+
+    inicio = estado['jogos']
+    movimentos_inicio = estado['movimentos']
+    t0 = time.perf_counter()
+    segundos0 = estado['segundos']
+    ultimo_checkpoint = inicio
+    ultimo_relatorio = inicio
+    jogos_relatorio = inicio
+    movimentos_relatorio = estado['movimentos']
+    t_relatorio = t0
+
+    def relatorio():
+        nonlocal jogos_relatorio, movimentos_relatorio, t_relatorio
+        agora = time.perf_counter()
+        dt = agora - t_relatorio
+        if verbose and dt > 0:
+            print("{:>10} jogos | {:8.0f} jogos/s | {:9.0f} movimentos/s | V {:.3f} E {:.3f} D {:.3f}".format(
+                estado['jogos'], (estado['jogos'] - jogos_relatorio) / dt,
+                (estado['movimentos'] - movimentos_relatorio) / dt, estado['vitorias'] / estado['jogos'],
+                estado['empates'] / estado['jogos'], estado['derrotas'] / estado['jogos']), flush = True)
+        jogos_relatorio = estado['jogos']
+        movimentos_relatorio = estado['movimentos']
+        t_relatorio = agora
+        if telemetria is not None:
+            telemetria.registra(estado, [p1, p2], None if sim is None else sim.denso)
+
+    while estado['jogos'] < n_games:
+        if sim is not None:
+            n = min(lote, n_games - estado['jogos'])
+            if checkpoint is not None and intervalo_checkpoint:
+                n = min(n, ultimo_checkpoint + intervalo_checkpoint - estado['jogos'])
+            movimentos = sim.n_movimentos
+            r = sim.roda(n)
+            if estatisticas is not None:
+                estatisticas.registra_lote(r)
+            if registro is not None:
+                registro.registra_lote(sim.lances, sim.primeiro, r)
+            estado['vitorias'] += int((r == 1).sum())
+            estado['empates'] += int((r == 0).sum())
+            estado['derrotas'] += int((r == -1).sum())
+            estado['movimentos'] += sim.n_movimentos - movimentos
+            estado['jogos'] += n
+        else:
+            lances = None if registro is None else []
+            if estado['jogos'] % 2 == 0:
+                r, movimentos = partida(p1, p2, lances)
+            else:
+                r, movimentos = partida(p2, p1, lances)
+                r = -r
+            if registro is not None:
+                registro.registra(lances, estado['jogos'] % 2, r)
+            if estatisticas is not None:
+                estatisticas.registra(r)
+            if r == 1:
+                estado['vitorias'] += 1
+            elif r == -1:
+                estado['derrotas'] += 1
+            else:
+                estado['empates'] += 1
+            estado['movimentos'] += movimentos
+            estado['jogos'] += 1
+            p1.reset()
+            p2.reset()
+
+        estado['segundos'] = segundos0 + time.perf_counter() - t0
+        if intervalo_relatorio and estado['jogos'] - ultimo_relatorio >= intervalo_relatorio:
+            relatorio()
+            ultimo_relatorio = estado['jogos']
+        if checkpoint is not None and intervalo_checkpoint and estado['jogos'] - ultimo_checkpoint >= intervalo_checkpoint:
+            if sim is not None:
+                sim.exporta()
+            if registro is not None:
+                # O registro em disco acompanha o checkpoint
+                registro.descarrega()
+            salva_checkpoint(checkpoint, p1, p2, estado)
+            ultimo_checkpoint = estado['jogos']
+
+    if sim is not None:
+        sim.exporta()
+    if registro is not None:
+        registro.descarrega()
+    if checkpoint is not None:
+        salva_checkpoint(checkpoint, p1, p2, estado)
+    if estado['jogos'] != jogos_relatorio:
+        relatorio()
+
+    dt = estado['segundos'] - segundos0
+    res = dict(estado)
+    res['jogos_por_s'] = (estado['jogos'] - inicio) / dt if dt > 0 else 0.
+    res['movimentos_por_s'] = (estado['movimentos'] - movimentos_inicio) / dt if dt > 0 else 0.
+    if p1.perfil is not None or p2.perfil is not None:
+        res['perfil'] = [None if p.perfil is None else p.perfil.instantaneo() for p in (p1, p2)]
+    return res
+
+
+def retoma(checkpoint, n_games, **kwargs):
+    '''
+    Continua um treinamento a partir do checkpoint, até completar n_games partidas no total
+
+    @returns
+
+    p1, p2, e o dicionário retornado por train
+    '''
+    p1, p2, estado = carrega_checkpoint(checkpoint)
+    res = train(p1, p2, n_games, checkpoint = checkpoint, estado = estado, **kwargs)
+    return p1, p2, res
+
+
+def _jogador(descricao):
+    '''
+    Cria um jogador a partir de uma descrição 'classe' ou 'classe:param=valor,param=valor', por exemplo
+    'epsilon_edson:desconto=0.9,epsilon=0.5'
+    '''
+    nome, _, params = descricao.partition(':')
+    classe = getattr(owg_players, nome, None)
+    if classe is None or not isinstance(classe, type):
+        raise ValueError("Erro! jogador desconhecido: {}".format(nome))
+    kwargs = dict()
+    for par in filter(None, params.split(',')):
+        k, _, v = par.partition('=')
+        if k == 'nome':
+            kwargs[k] = v
+        else:
+            # Inteiros (seed, profundidade, simulacoes, ...) continuam inteiros; o resto é float
+            try:
+                kwargs[k] = int(v)
+            except ValueError:
+                kwargs[k] = float(v)
+    return classe(**kwargs)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Treina dois jogadores do jogo da velha por self-learning')
+    parser.add_argument('p1', nargs = '?', help = "jogador 1, como 'cientista' ou 'epsilon_edson:desconto=0.9,epsilon=0.5'")
+    parser.add_argument('p2', nargs = '?', help = 'jogador 2 (se omitido, p1 joga contra si mesmo; exige --vetorizado)')
+    parser.add_argument('-n', '--jogos', type = int, default = 1000000, help = 'número total de partidas')
+    parser.add_argument('--checkpoint', help = 'arquivo de checkpoint')
+    parser.add_argument('--intervalo-checkpoint', type = int, default = 100000)
+    parser.add_argument('--intervalo-relatorio', type = int, default = 10000)
+    parser.add_argument('--retoma', action = 'store_true', help = 'continua a partir do checkpoint, se existir')
+    parser.add_argument('--vetorizado', action = 'store_true', help = 'usa o simulador vetorizado')
+    parser.add_argument('--lote', type = int, default = 4096)
+    parser.add_argument('--seed', type = int)
+    parser.add_argument('--telemetria', help = 'arquivo onde gravar a telemetria a cada relatório')
+    parser.add_argument('--formato-telemetria', choices = ['json', 'prometheus'], default = 'json',
+                        help = 'linhas JSON acrescentadas ao arquivo, ou arquivo de texto do Prometheus')
+    parser.add_argument('--registro', help = 'arquivo do registro binário de partidas (owg_registro), acrescentado')
+    parser.add_argument('--saida', nargs = '+', default = [], help = 'arquivos .pkl (pickle) ou .npz (owg_arquivo) onde gravar p1 (e p2) ao final')
+    args = parser.parse_args(argv)
+
+    opcoes = dict(intervalo_checkpoint = args.intervalo_checkpoint, intervalo_relatorio = args.intervalo_relatorio,
+                  vetorizado = args.vetorizado, lote = args.lote, seed = args.seed)
+    if args.registro:
+        from owg_registro import gravador
+        opcoes['registro'] = gravador(args.registro)
+    if args.telemetria:
+        from owg_telemetria import telemetria
+        opcoes['telemetria'] = telemetria(args.telemetria, args.formato_telemetria)
+    if args.retoma and args.checkpoint and os.path.exists(args.checkpoint):
+        p1, p2, res = retoma(args.checkpoint, args.jogos, **opcoes)
+    else:
+        if args.p1 is None:
+            parser.error('informe o jogador p1 (ou --retoma com um checkpoint existente)')
+        p1 = _jogador(args.p1)
+        p2 = _jogador(args.p2) if args.p2 else p1
+        res = train(p1, p2, args.jogos, checkpoint = args.checkpoint, **opcoes)
+    if args.registro:
+        opcoes['registro'].fecha()
+
+    print("{} jogos em {:.1f} s: {:.0f} jogos/s, {:.0f} movimentos/s".format(
+        res['jogos'], res['segundos'], res['jogos_por_s'], res['movimentos_por_s']))
+    for p, arquivo in zip([p1, p2], args.saida):
+        if arquivo.endswith('.npz'):
+            from owg_arquivo import salva_jogador
+            salva_jogador(p, arquivo)
+        else:
+            with open(arquivo, 'wb') as arq:
+                pickle.dump(p, arq)
+
+
+if __name__ == '__main__':
+    main()